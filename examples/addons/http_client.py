@@ -1,3 +1,4 @@
+import asyncio
 import urllib.request
 
 functions = {}
@@ -7,4 +8,9 @@ def fetch_len(url):
         data = r.read()
         return len(data)
 
+async def fetch_len_async(url):
+    # awaited concurrently by TemplateRuntime.render_async
+    return await asyncio.to_thread(fetch_len, url)
+
 functions['fetch_len'] = fetch_len
+functions['fetch_len_async'] = fetch_len_async
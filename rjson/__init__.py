@@ -1,10 +1,18 @@
 """rjson package - small template runtime helpers and runtime API"""
-from .helpers import functions, load_addon, load_addons
+from .helpers import functions, load_addon, load_addons, load_addon_lazy
+from .helpers import functions as _default_functions
 from .helpers import load_addons_from_dir, teardown_addons
+from .helpers import cacheable, function_cache_stats
 from .template_runtime import TemplateRuntime
-import yaml
+from .template_cache import ExpressionCache, expression_cache
+from .template_compiler import CompiledTemplate, compile_template
+from .template_batch import render_many
+from .template_files import compile_file, DiskCache, TemplateRegistry
+from .template_stats import RenderStats
+from .template_errors import TemplateRenderError
+from .template_session import RenderSession
+from .template_budget import RenderBudget, BudgetExceeded
 import json
-import os
 
 
 def render_string(s, context=None):
@@ -17,25 +25,72 @@ def render_template_obj(obj, context=None):
 	return rt.render(obj)
 
 
-def load_and_render_yaml(path, context=None):
-	with open(path, "r", encoding="utf-8") as f:
-		tpl = yaml.safe_load(f)
-	return render_template_obj(tpl, context=context)
+def iter_render(template, context=None, functions=None, *, separators=None, ensure_ascii=True, default=None):
+	"""Render a template and yield its JSON encoding in chunks.
+
+	`"".join(iter_render(t, c))` equals `json.dumps(render_template_obj(t, c))`
+	(with the same `separators`/`ensure_ascii`/`default`), but large generated
+	lists are encoded item by item instead of being built in memory first.
+	"""
+	rt = TemplateRuntime(context or {}, _default_functions if functions is None else functions)
+	encoder = json.JSONEncoder(separators=separators, ensure_ascii=ensure_ascii, default=default)
+	return rt.iter_render(template, encoder)
+
+
+def render_lazy(template, context=None, functions=None):
+	"""Render a template into proxies that render each dict key / list item on first access.
+
+	`render_lazy(t, c).materialize()` equals `render_template_obj(t, c)`
+	(see `rjson.template_lazy`).
+	"""
+	rt = TemplateRuntime(context or {}, _default_functions if functions is None else functions)
+	return rt.render_lazy(template)
+
+
+def render_to_stream(template, fp, context=None, functions=None, *, buffer_size=65536, **kwargs):
+	"""Render a template as JSON into the text file object `fp`.
+
+	Chunks from `iter_render` are buffered and written roughly `buffer_size`
+	characters at a time. Returns the number of characters written.
+	"""
+	buf = []
+	pending = 0
+	written = 0
+	for chunk in iter_render(template, context, functions, **kwargs):
+		buf.append(chunk)
+		pending += len(chunk)
+		if pending >= buffer_size:
+			fp.write("".join(buf))
+			written += pending
+			buf.clear()
+			pending = 0
+	if buf:
+		fp.write("".join(buf))
+		written += pending
+	return written
+
+
+def load_and_render_yaml(path, context=None, cache_dir=None, registry=None):
+	"""Load a YAML template file and render it.
+
+	Same as `load_and_render_file`: the file is compiled once per content
+	(per change, with a `TemplateRegistry`) instead of parsed on every call.
+	A .json path is parsed as JSON, which YAML would read the same way.
+	"""
+	return load_and_render_file(path, context, cache_dir, registry)
 
 
-def load_and_render_file(path, context=None):
+def load_and_render_file(path, context=None, cache_dir=None, registry=None):
 	"""Load a YAML or JSON template file and render it.
 
 	If the extension is .json the file is parsed as JSON, otherwise YAML is used.
+	With `cache_dir`, the compiled template is kept on disk (see
+	`rjson.template_files`) so later processes skip parsing the same file.
+	With a `TemplateRegistry`, the file is only read again when it changed.
 	"""
-	path = os.fspath(path)
-	_, ext = os.path.splitext(path)
-	with open(path, "r", encoding="utf-8") as f:
-		if ext.lower() == ".json":
-			tpl = json.load(f)
-		else:
-			tpl = yaml.safe_load(f)
-	return render_template_obj(tpl, context=context)
+	if registry is not None:
+		return render_template_obj(registry.get(path), context=context)
+	return render_template_obj(compile_file(path, cache_dir), context=context)
 
 
 def main_cli(argv=None):
@@ -59,6 +114,25 @@ __all__ = [
     "load_addon",
     "load_addons",
 	"load_addons_from_dir",
+	"load_addon_lazy",
 	"load_and_render_file",
 	"teardown_addons",
+	"ExpressionCache",
+	"expression_cache",
+	"compile_template",
+	"CompiledTemplate",
+	"compile_file",
+	"DiskCache",
+	"TemplateRegistry",
+	"RenderSession",
+	"iter_render",
+	"render_to_stream",
+	"render_lazy",
+	"render_many",
+	"cacheable",
+	"function_cache_stats",
+	"RenderStats",
+	"RenderBudget",
+	"BudgetExceeded",
+	"TemplateRenderError",
 ]
@@ -0,0 +1,331 @@
+"""Benchmark suite: `python -m rjson.bench`.
+
+Micro-benchmarks time the pipeline stages on their own
+(`TemplateLexer.tokenize`, `TemplateParser.parse_template`,
+`TemplateEvaluator.evaluate` and the closure backend); end-to-end workloads
+render whole templates shaped like `examples/templates` while one size
+parameter grows (nesting depth, `_repeat` width, context size, number of
+function calls). Results are printed as JSON; scaling families also get an
+empirical complexity curve (the exponent of a power-law fit).
+
+    python -m rjson.bench -o base.json          # run everything
+    python -m rjson.bench --quick -k repeat     # smaller sizes, filtered
+    python -m rjson.bench compare base.json new.json --threshold 0.1
+
+`compare` lists benchmarks whose median time grew by more than the
+threshold (or whose complexity exponent grew) and exits with status 1 if
+there are any.
+"""
+import argparse
+import json
+import math
+import platform
+import re
+import sys
+import time
+from importlib import metadata
+
+from .template_lexer import TemplateLexer
+from .template_parser import TemplateParser
+from .template_evaluator import TemplateEvaluator
+from .template_closures import compile_ast
+from .template_compiler import compile_template
+
+# helpers with the shapes of examples/addons (kept here so runs are deterministic)
+FUNCTIONS = {
+    "shout": lambda s: str(s).upper() + "!",
+    "repeat": lambda s, n: str(s) * int(n),
+    "upper_join": lambda sep, items: sep.join([str(x).upper() for x in items]),
+    "sum_list": lambda lst: sum(float(x) for x in lst),
+}
+
+EXPRESSIONS = {
+    "arith": "$(a.b * 2 + c[0] - (d / 3)) >= 10 ? 'yes' : 'no'",
+    "calls": "$upper_join('-', [$shout($user.name), $repeat('-', 3), $sum_list([1, 2, 3.5])])",
+    "text": "Hello $user.name; messages: $count; score: $score%",
+}
+
+EXPRESSION_CONTEXT = {
+    "a": {"b": 7}, "c": [1, 2, 3], "d": 9,
+    "user": {"name": "ada"}, "count": 3, "score": 42,
+}
+
+SIZES = {
+    "nesting": [2, 4, 8, 16, 32],
+    "repeat": [10, 100, 1000, 10000, 100000],
+    "context": [10, 1000, 100000],
+    "calls": [1, 10, 100],
+}
+QUICK_SIZES = {
+    "nesting": [2, 4, 8, 16],
+    "repeat": [10, 100, 1000, 10000],
+    "context": [10, 1000, 10000],
+    "calls": [1, 10, 100],
+}
+
+
+# ---------- workloads ----------
+
+def _micro(bench, expressions):
+    for name, source in expressions.items():
+        tokens = TemplateLexer(source).tokenize()
+        ast = TemplateParser(tokens).parse_template()
+        fn = compile_ast(ast)
+        bench(f"lexer.{name}", lambda s=source: TemplateLexer(s).tokenize())
+        bench(f"parser.{name}", lambda t=tokens: TemplateParser(t).parse_template())
+        bench(f"evaluator.{name}",
+              lambda a=ast: TemplateEvaluator(EXPRESSION_CONTEXT, FUNCTIONS).evaluate(a))
+        bench(f"closures.{name}", lambda f=fn: f(EXPRESSION_CONTEXT, FUNCTIONS))
+
+
+def nested_template(depth):
+    """`depth` nested dicts, each with a `_set`, an expression reading it and the complex_template report."""
+    node = {"leaf": "$shout($level)"}
+    for level in range(depth, 0, -1):
+        node = {
+            "_set.level": level,
+            "title": "$'level ' + level",
+            "report": {
+                "total": "$sum_list([1, 2, $level])",
+                "note": "$upper_join('-', ['a', 'b', 'c'])",
+            },
+            "child": node,
+        }
+    return node
+
+
+def repeat_template(n):
+    return {
+        "items": {
+            "_repeat": n,
+            "id": "$_index",
+            "name": "$shout('item')",
+            "value": "$_index * 2 + 1",
+            "last": "$_index == _repeat - 1",
+        },
+    }
+
+
+def context_template():
+    return {
+        "_set.total": "$sum_list([$k0, $k1, $k2])",
+        "greeting": "$shout($user.name)",
+        "picked": "$k1 + total",
+        "rows": {"_repeat": 10, "v": "$k0 + _index"},
+    }
+
+
+def large_context(n):
+    context = {f"k{i}": i for i in range(n)}
+    context["user"] = {"name": "ada", "tags": list(range(min(n, 1000)))}
+    return context
+
+
+def calls_template(n):
+    parts = ", ".join("$shout('x')" for _ in range(n))
+    return {
+        "joined": f"$upper_join('-', [{parts}])",
+        "repeated": f"$repeat('-', {n})",
+        "total": "$sum_list([" + ", ".join(str(i) for i in range(n)) + "])",
+    }
+
+
+def _end_to_end(bench, sizes):
+    for depth in sizes["nesting"]:
+        template = compile_template(nested_template(depth))
+        bench(f"e2e.nesting.{depth}", lambda t=template: t.render({}, FUNCTIONS), "nesting", depth)
+    for n in sizes["repeat"]:
+        template = compile_template(repeat_template(n))
+        bench(f"e2e.repeat.{n}", lambda t=template: t.render({}, FUNCTIONS), "repeat", n)
+    template = compile_template(context_template())
+    for n in sizes["context"]:
+        context = large_context(n)
+        bench(f"e2e.context.{n}", lambda c=context: template.render(c, FUNCTIONS), "context", n)
+    for n in sizes["calls"]:
+        template = compile_template(calls_template(n))
+        bench(f"e2e.calls.{n}", lambda t=template: t.render({}, FUNCTIONS), "calls", n)
+
+
+# ---------- timing ----------
+
+def measure(fn, min_time=0.05, repeat=5):
+    """Time `fn()`; return (seconds per call for each sample, calls per sample)."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        # aim just past min_time, growing at most tenfold per step
+        number *= 10 if elapsed <= 0 else max(2, min(10, math.ceil(min_time / elapsed * 1.1)))
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples, number
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def complexity(points):
+    """Fit t = a * n**b to [(n, t), ...]; return (b, label)."""
+    xs = [math.log(n) for n, _ in points]
+    ys = [math.log(t) for _, t in points]
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    if var == 0:
+        return 0.0, "O(1)"
+    b = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var
+    for exponent, label in ((0, "O(1)"), (1, "O(n)"), (2, "O(n^2)")):
+        if abs(b - exponent) < 0.25:
+            return b, label
+    return b, f"O(n^{b:.2f})"
+
+
+def run(quick=False, pattern=None, min_time=None, repeat=None):
+    """Run the suite; return the JSON-serialisable report."""
+    min_time = min_time if min_time is not None else (0.02 if quick else 0.1)
+    repeat = repeat or (3 if quick else 5)
+    selected = re.compile(pattern) if pattern else None
+    results = {}
+    families = {}
+
+    def bench(name, fn, family=None, size=None):
+        if selected is not None and not selected.search(name):
+            return
+        samples, number = measure(fn, min_time, repeat)
+        results[name] = {
+            "median": _median(samples),
+            "min": min(samples),
+            "samples": samples,
+            "number": number,
+        }
+        if family is not None:
+            results[name]["family"] = family
+            results[name]["size"] = size
+            families.setdefault(family, []).append((size, results[name]["median"]))
+
+    _micro(bench, EXPRESSIONS)
+    _end_to_end(bench, QUICK_SIZES if quick else SIZES)
+
+    curves = {}
+    for family, points in families.items():
+        if len(points) < 2:
+            continue
+        exponent, label = complexity(points)
+        curves[family] = {"points": points, "exponent": exponent, "label": label}
+    return {"meta": _meta(quick), "results": results, "curves": curves}
+
+
+def _meta(quick):
+    try:
+        version = metadata.version("rjson")
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        "rjson": version,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "quick": quick,
+    }
+
+
+# ---------- comparison ----------
+
+def compare(base, new, threshold=0.1):
+    """Compare two reports; return a dict of slowdowns, speedups and complexity changes."""
+    slower, faster = [], []
+    for name, result in new["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            continue
+        ratio = result["median"] / old["median"]
+        row = {"name": name, "base": old["median"], "new": result["median"], "ratio": ratio}
+        if ratio > 1 + threshold:
+            slower.append(row)
+        elif ratio < 1 / (1 + threshold):
+            faster.append(row)
+    curves = []
+    for family, curve in new.get("curves", {}).items():
+        old = base.get("curves", {}).get(family)
+        if old is None:
+            continue
+        row = {"family": family, "base": old["label"], "new": curve["label"],
+               "base_exponent": old["exponent"], "new_exponent": curve["exponent"],
+               "regressed": curve["exponent"] - old["exponent"] > 0.25}
+        curves.append(row)
+    return {"slower": slower, "faster": faster, "curves": curves, "threshold": threshold}
+
+
+def _format_comparison(report):
+    lines = []
+    for title, rows in (("slower", report["slower"]), ("faster", report["faster"])):
+        if rows:
+            lines.append(f"{title}:")
+            for row in sorted(rows, key=lambda r: -abs(math.log(r["ratio"]))):
+                lines.append(f"  {row['name']:<28} {_fmt(row['base'])} -> {_fmt(row['new'])}  x{row['ratio']:.2f}")
+    for row in report["curves"]:
+        mark = "  REGRESSED" if row["regressed"] else ""
+        lines.append(f"curve {row['family']:<10} {row['base']} (b={row['base_exponent']:.2f}) -> "
+                     f"{row['new']} (b={row['new_exponent']:.2f}){mark}")
+    if not report["slower"] and not any(row["regressed"] for row in report["curves"]):
+        lines.append(f"no slowdowns above {report['threshold']:.0%}")
+    return "\n".join(lines)
+
+
+def _fmt(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(prog="python -m rjson.bench compare")
+        parser.add_argument("base")
+        parser.add_argument("new")
+        parser.add_argument("--threshold", type=float, default=0.1,
+                            help="relative slowdown that is reported (default 0.1 = 10%%)")
+        parser.add_argument("--json", action="store_true", help="print the comparison as JSON")
+        args = parser.parse_args(argv[1:])
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        report = compare(base, new, args.threshold)
+        print(json.dumps(report, indent=2) if args.json else _format_comparison(report))
+        regressed = report["slower"] or any(row["regressed"] for row in report["curves"])
+        return 1 if regressed else 0
+
+    parser = argparse.ArgumentParser(prog="python -m rjson.bench")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("-k", "--filter", help="only run benchmarks whose name matches this regex")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and shorter samples")
+    parser.add_argument("--min-time", type=float, help="minimum seconds per sample")
+    parser.add_argument("--repeat", type=int, help="samples per benchmark")
+    args = parser.parse_args(argv)
+    report = run(args.quick, args.filter, args.min_time, args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""Optional built-in function libraries.
+
+Nothing here is registered by default (the core `functions` table stays
+empty). Each module exposes a `functions` dict and a `register(funcs)`, so it
+can be merged like an addon:
+
+    from rjson import functions
+    from rjson.builtins import numeric
+    numeric.register(functions)
+"""
@@ -0,0 +1,360 @@
+"""Aggregate and elementwise numeric functions: sum, mean, min, max, percentile, range, cumsum, dot.
+
+Elements are coerced like template arithmetic (`coerce_numeric`: numeric
+strings are parsed, None and unparsable values count as 0; bools count as
+0/1). Arguments can be lists, tuples, `_repeat` output or NumPy arrays.
+
+Results are defined by the pure-Python implementation and are the same
+with or without NumPy: integer sums are exact, float sums are correctly
+rounded (`math.fsum`), `cumsum` adds left to right. Lists and tuples of
+plain ints and floats are used as they are (one C-level type scan, then the
+built-in `sum`/`min`/`max`/`accumulate`); only other elements are coerced
+one by one. NumPy is only used for steps whose result it reproduces bit for
+bit -- selecting minima/maxima and order statistics, `arange`-style ranges,
+elementwise products, left-to-right cumulative sums and int64 sums that
+cannot overflow -- on int/float/bool arrays passed in (without converting
+them to lists), and to partition large lists for `percentile`.
+"""
+import math
+from itertools import accumulate
+
+from ..template_evaluator import coerce_numeric
+
+# below this many elements converting to an array costs more than it saves
+NUMPY_MIN_SIZE = 64
+
+# imported by _numpy() the first time a list is long enough to convert, so
+# registering these functions does not pay for it; arrays passed in mean it
+# is loaded already
+numpy = None
+_numpy_missing = False
+
+_INT64_MAX = 2 ** 63 - 1
+
+INT, FLOAT, MIXED = "int", "float", "mixed"
+
+
+_PLAIN_KINDS = {
+    frozenset((int,)): INT,
+    frozenset((float,)): FLOAT,
+    frozenset((int, float)): MIXED,
+}
+
+
+def _numpy():
+    """The numpy module, imported on first use; None if it is not installed."""
+    global numpy, _numpy_missing
+    if numpy is None and not _numpy_missing:
+        try:
+            import numpy as module
+        except ImportError:  # pure-Python fallback
+            _numpy_missing = True
+        else:
+            numpy = module
+    return numpy
+
+
+def _is_array(values):
+    # the name check first: nothing but NumPy itself makes ndarrays
+    return type(values).__name__ == "ndarray" and _numpy() is not None and type(values) is numpy.ndarray
+
+
+def _numeric_array(xs):
+    """A NumPy array as a flat int64/float64 array (bools count 0/1), or None if it holds anything else."""
+    kind = xs.dtype.kind
+    if kind == "f":
+        return xs.ravel().astype(numpy.float64, copy=False)
+    if kind == "b" or kind == "i":
+        return xs.ravel().astype(numpy.int64, copy=False)
+    if kind == "u" and (not xs.size or xs.max() <= _INT64_MAX):
+        return xs.ravel().astype(numpy.int64)
+    return None
+
+
+def _values(xs):
+    """Elements of `xs` and their kind (INT, FLOAT or MIXED).
+
+    The elements are an int64/float64 array for numeric NumPy input, `xs`
+    itself for a list or tuple of plain ints/floats, and otherwise a list of
+    coerced elements.
+    """
+    if xs is None:
+        return [], INT
+    if _is_array(xs):
+        if not xs.size:
+            return [], INT
+        array = _numeric_array(xs)
+        if array is not None:
+            return array, INT if array.dtype.kind == "i" else FLOAT
+        xs = xs.ravel().tolist()
+    elif hasattr(xs, "ravel") and hasattr(xs, "tolist"):
+        # array-likes: one C-level conversion to Python scalars
+        xs = xs.ravel().tolist()
+    elif isinstance(xs, (str, bytes, dict)) or not hasattr(xs, "__iter__"):
+        xs = [xs]
+    if type(xs) is list or type(xs) is tuple:
+        kind = _PLAIN_KINDS.get(frozenset(map(type, xs)))
+        if kind is not None:
+            return xs, kind
+        if not xs:
+            return xs, INT
+    values = []
+    append = values.append
+    has_int = has_float = False
+    for x in xs:
+        t = type(x)
+        if t is int:
+            has_int = True
+        elif t is float:
+            has_float = True
+        else:
+            if hasattr(x, "__index__") and not isinstance(x, float):
+                # bools and integer scalars such as numpy.int64
+                x = x.__index__()
+            else:
+                x = coerce_numeric(x)
+            if isinstance(x, bool) or type(x) is int:
+                x = int(x)
+                has_int = True
+            else:
+                x = float(x)
+                has_float = True
+        append(x)
+    if has_float:
+        return values, MIXED if has_int else FLOAT
+    return values, INT
+
+
+def _array(values, kind):
+    """`values` as an int64/float64 array when NumPy can hold them exactly, else None."""
+    if _is_array(values):
+        return values
+    if len(values) < NUMPY_MIN_SIZE or kind == MIXED or _numpy() is None:
+        return None
+    if kind == FLOAT:
+        return numpy.array(values, dtype=numpy.float64)
+    if max(values) > _INT64_MAX or min(values) < -_INT64_MAX:
+        return None
+    return numpy.array(values, dtype=numpy.int64)
+
+
+def _list(values):
+    return values.tolist() if _is_array(values) else values
+
+
+def _has_nan(values, kind):
+    if kind == INT:
+        return False
+    if _is_array(values):
+        return bool(numpy.isnan(values).any())
+    try:
+        # NaN propagates through the C-level sum; only then look for it
+        total = sum(values)
+    except OverflowError:
+        total = math.nan
+    return total != total and any(v != v for v in values)
+
+
+def _plain_sum(xs):
+    """Sum of a list or tuple of plain ints/bools/floats with the built-in `sum`, or None.
+
+    An int total means every element was an int or bool (exact); a float
+    total means only ints, bools and floats were added, and is recomputed
+    correctly rounded. Anything else goes through `_values`.
+    """
+    if type(xs) is not list and type(xs) is not tuple:
+        return None
+    try:
+        total = sum(xs)
+    except (TypeError, OverflowError):
+        return None
+    t = type(total)
+    if t is int:
+        return total
+    if t is float:
+        return _fsum(xs)
+    return None
+
+
+def _fsum(values):
+    try:
+        return math.fsum(values)
+    except OverflowError:
+        # partial sums overflowed; the plain sum is as good as it gets
+        return sum(values)
+    except ValueError:
+        # inf + -inf
+        return math.nan
+
+
+def sum_(xs):
+    """Exact integer sum, or the correctly rounded float sum if any element is a float."""
+    total = _plain_sum(xs)
+    if total is not None:
+        return total
+    return _total(*_values(xs))
+
+
+def _total(values, kind):
+    if kind == INT:
+        if _is_array(values) and _int_total_fits(values, len(values)):
+            return int(values.sum())
+        return sum(_list(values))
+    return _fsum(_list(values))
+
+
+def mean(xs):
+    total = _plain_sum(xs)
+    if total is not None:
+        if not xs:
+            raise ValueError("mean() of an empty list")
+        return total / len(xs)
+    values, kind = _values(xs)
+    if not len(values):
+        raise ValueError("mean() of an empty list")
+    return _total(values, kind) / len(values)
+
+
+def _extreme(xs, name, pick):
+    values, kind = _values(xs)
+    if not len(values):
+        raise ValueError(f"{name}() of an empty list")
+    if _has_nan(values, kind):
+        return math.nan
+    if _is_array(values):
+        # the first extreme element, as the built-in returns
+        return values[int(getattr(numpy, "arg" + name)(values))].item()
+    return pick(values)
+
+
+def min_(xs):
+    """Smallest element (NaN if any element is NaN)."""
+    return _extreme(xs, "min", min)
+
+
+def max_(xs):
+    """Largest element (NaN if any element is NaN)."""
+    return _extreme(xs, "max", max)
+
+
+def percentile(xs, q):
+    """The q-th percentile (0..100) with linear interpolation between the closest ranks.
+
+    An exact rank returns that element itself; otherwise `a + (b - a) * t`.
+    """
+    values, kind = _values(xs)
+    if not len(values):
+        raise ValueError("percentile() of an empty list")
+    q = coerce_numeric(q)
+    if not 0 <= q <= 100:
+        raise ValueError(f"percentile must be between 0 and 100, got {q}")
+    if _has_nan(values, kind):
+        return math.nan
+    h = (len(values) - 1) * q / 100
+    lo = math.floor(h)
+    hi = min(lo + 1, len(values) - 1)
+    array = _array(values, kind)
+    if array is not None:
+        ranks = numpy.partition(array, (lo, hi))
+        a, b = ranks[lo].item(), ranks[hi].item()
+    else:
+        ordered = sorted(_list(values))
+        a, b = ordered[lo], ordered[hi]
+    if kind != INT:
+        # equal elements may come out of a partition in any order: 0.0 and -0.0 must not differ
+        a += 0.0
+        b += 0.0
+    t = h - lo
+    if t == 0:
+        return a
+    return a + (b - a) * t
+
+
+def range_(start, stop=None, step=1):
+    """Like `range()`, also for float bounds: `start + i * step` while below `stop` (above, for a negative step)."""
+    if stop is None:
+        start, stop = 0, start
+    start, stop, step = (_scalar(v) for v in (start, stop, step))
+    if step == 0:
+        raise ValueError("range() step must not be zero")
+    if type(start) is int and type(stop) is int and type(step) is int:
+        return list(range(start, stop, step))
+    n = max(0, math.ceil((stop - start) / step))
+    if type(start) is int and type(step) is int:
+        return list(range(start, start + n * step, step))
+    if n >= NUMPY_MIN_SIZE and _numpy() is not None:
+        return (numpy.arange(n, dtype=numpy.float64) * float(step) + float(start)).tolist()
+    return [start + i * step for i in range(n)]
+
+
+def _scalar(value):
+    value = coerce_numeric(value)
+    return int(value) if isinstance(value, bool) else value
+
+
+def cumsum(xs):
+    """Running totals, added left to right (exact for integers)."""
+    values, kind = _values(xs)
+    if _is_array(values) and (kind == FLOAT or _int_total_fits(values, len(values))):
+        with numpy.errstate(all="ignore"):
+            return numpy.cumsum(values).tolist()
+    # for lists, accumulate is cheaper than converting to an array and back
+    return list(accumulate(_list(values)))
+
+
+def dot(xs, ys):
+    """Sum of the elementwise products: exact for integers, correctly rounded for floats."""
+    a, kind_a = _values(xs)
+    b, kind_b = _values(ys)
+    if _is_array(a) != _is_array(b):
+        # an array and a list: compute as lists
+        a, b = _list(a), _list(b)
+    if len(a) != len(b):
+        raise ValueError(f"dot() of lists of different lengths ({len(a)} and {len(b)})")
+    if kind_a == INT and kind_b == INT:
+        array_a = _array(a, INT)
+        array_b = _array(b, INT) if array_a is not None else None
+        if array_b is not None and _int_total_fits(a, len(a), b):
+            return int(numpy.dot(array_a, array_b))
+        return sum(x * y for x, y in zip(_list(a), _list(b)))
+    if kind_a == FLOAT and kind_b == FLOAT:
+        array_a = _array(a, FLOAT)
+        if array_a is not None:
+            with numpy.errstate(all="ignore"):
+                products = array_a * numpy.array(b, dtype=numpy.float64)
+            return _fsum(products.tolist())
+    return _fsum([x * y for x, y in zip(_list(a), _list(b))])
+
+
+def _int_total_fits(values, n, other=None):
+    """True if sums of n products/elements of these ints cannot overflow int64."""
+    bound = _bound(values)
+    if other is not None:
+        bound *= _bound(other)
+    return bound * n <= _INT64_MAX
+
+
+def _bound(values):
+    """Largest absolute value of some ints (a list or an int64 array)."""
+    if not len(values):
+        return 0
+    if _is_array(values):
+        return max(abs(int(values.max())), abs(int(values.min())))
+    return max(abs(max(values)), abs(min(values)))
+
+
+functions = {
+    "sum": sum_,
+    "mean": mean,
+    "min": min_,
+    "max": max_,
+    "percentile": percentile,
+    "range": range_,
+    "cumsum": cumsum,
+    "dot": dot,
+}
+
+
+def register(funcs):
+    funcs.update(functions)
+    return list(functions)
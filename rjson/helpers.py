@@ -1,9 +1,269 @@
+import ast
+import functools
 import importlib.util
+import inspect
+import json
 import os
+import tempfile
+import threading
 import types
 
+from .template_cache import TTLCache
+
+_MISSING = object()
+
+
+class FunctionRegistry(dict):
+    """The `functions` dict, plus names whose addon is imported on first lookup.
+
+    `declare(names, path)` (used by `load_addon(path, lazy=True)`) records that
+    the addon at `path` provides `names` without importing it. `get`, `[]`
+    and `in` see declared names; the first `get`/`[]` of one of them loads
+    the addon, which then behaves exactly as if it had been loaded eagerly at
+    that point. Setting or deleting a name drops its declaration, so the
+    last writer wins as with eager loading. Enumerating the registry
+    (`items()`, `values()`, iteration, `copy()`) loads every pending addon;
+    `names()` lists everything without loading.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = {}      # name -> addon path
+        self._lock = threading.RLock()
+        self._loader = None     # thread importing an addon; its writes keep other declarations
+        self._loading = set()   # addon paths being imported (by the thread holding the lock)
+
+    def declare(self, names, path):
+        with self._lock:
+            for name in names:
+                dict.pop(self, name, None)
+                self._pending[name] = path
+
+    def pending(self):
+        """Paths of the addons that still wait for their first lookup."""
+        return sorted(set(self._pending.values()))
+
+    def names(self):
+        return list(dict.keys(self)) + [n for n in self._pending if not dict.__contains__(self, n)]
+
+    def load_pending(self, path=None):
+        """Load the pending addon at `path` (every pending addon if None)."""
+        for p in ([path] if path is not None else self.pending()):
+            self._load(p)
+
+    def _load(self, path):
+        with self._lock:
+            if path in self._loading:
+                # the addon looks up its own names while it is imported
+                return
+            claimed = [n for n, p in self._pending.items() if p == path]
+            if not claimed:
+                return
+            # claimed names stay pending until the import is done, so lookups
+            # from other threads wait on the lock instead of missing them
+            before = dict(dict.items(self))
+            outer, self._loader = self._loader, threading.get_ident()
+            self._loading.add(path)
+            try:
+                load_addon(path)
+            finally:
+                self._loading.discard(path)
+                self._loader = outer
+                for name in claimed:
+                    if self._pending.get(name) == path:
+                        del self._pending[name]
+                # the addon may only take names it declared or nobody else holds
+                for name, value in list(dict.items(self)):
+                    if name in claimed:
+                        continue
+                    old = before.get(name, _MISSING)
+                    if old is value:
+                        continue
+                    if old is not _MISSING:
+                        dict.__setitem__(self, name, old)
+                    elif name in self._pending:
+                        dict.__delitem__(self, name)
+
+    def _load_name(self, name):
+        """Load the addon that declares `name`, if it is still pending."""
+        path = self._pending.get(name)
+        if path is not None:
+            self._load(path)
+
+    def __missing__(self, name):
+        # a pending name is defined before its declaration is dropped, so
+        # re-checking the dict after the load also covers other threads' loads
+        self._load_name(name)
+        value = dict.get(self, name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        value = dict.get(self, name, _MISSING)
+        if value is _MISSING:
+            self._load_name(name)
+            value = dict.get(self, name, default)
+        return value
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self._pending
+
+    def __len__(self):
+        return len(self.names())
+
+    def __setitem__(self, name, value):
+        if self._pending and self._loader != threading.get_ident():
+            self._pending.pop(name, None)
+        dict.__setitem__(self, name, value)
+
+    def __delitem__(self, name):
+        if self._pending.pop(name, None) is not None and not dict.__contains__(self, name):
+            return
+        dict.__delitem__(self, name)
+
+    def pop(self, name, *default):
+        if self._pending.pop(name, None) is not None and not dict.__contains__(self, name):
+            return default[0] if default else None
+        return dict.pop(self, name, *default)
+
+    def setdefault(self, name, default=None):
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            self[name] = value = default
+        return value
+
+    def update(self, *args, **kwargs):
+        for name, value in dict(*args, **kwargs).items():
+            self[name] = value
+
+    def clear(self):
+        self._pending.clear()
+        dict.clear(self)
+
+    def copy(self):
+        self.load_pending()
+        return dict(dict.items(self))
+
+    def __iter__(self):
+        self.load_pending()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self.load_pending()
+        return dict.keys(self)
+
+    def values(self):
+        self.load_pending()
+        return dict.values(self)
+
+    def items(self):
+        self.load_pending()
+        return dict.items(self)
+
+    def __reduce__(self):
+        return (FunctionRegistry, (self.copy(),))
+
+
 # Minimal core helper functions intentionally empty — use addons to add helpers.
-functions = {}
+functions = FunctionRegistry()
+
+# name -> result cache of the memoized functions registered by load_addon
+function_caches = {}
+
+
+def cacheable(fn=None, *, maxsize=1024, ttl=None):
+    """Mark an addon function as pure so `load_addon` caches its results.
+
+    Use as `@cacheable` or `@cacheable(maxsize=256, ttl=60)`. An addon can
+    also list names in a module-level `pure_functions` (a list of names, or a
+    dict name -> {"maxsize": ..., "ttl": ...}).
+    """
+    def mark(f):
+        f.rjson_cache = {"maxsize": maxsize, "ttl": ttl}
+        return f
+    return mark(fn) if fn is not None else mark
+
+
+def _cache_key(args):
+    # include types so f(1), f(1.0) and f(True) do not share an entry
+    return tuple((type(a), a) for a in args)
+
+
+def memoize(name, fn, maxsize=1024, ttl=None):
+    """Wrap `fn` with a bounded, thread-safe result cache registered as `function_caches[name]`.
+
+    Calls with unhashable arguments (lists, dicts) bypass the cache, and
+    errors are never cached. Cached results are shared between calls, so
+    they should be treated as read-only.
+    """
+    cache = TTLCache(maxsize, ttl)
+    function_caches[name] = cache
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def memoized(*args):
+            try:
+                key = _cache_key(args)
+                value = cache.get(key, _MISSING)
+            except TypeError:
+                # unhashable arguments: not cacheable
+                key = value = _MISSING
+            if key is _MISSING:
+                return await fn(*args)
+            if value is _MISSING:
+                value = await fn(*args)
+                cache.put(key, value)
+            return value
+    else:
+        @functools.wraps(fn)
+        def memoized(*args):
+            try:
+                key = _cache_key(args)
+                value = cache.get(key, _MISSING)
+            except TypeError:
+                # unhashable arguments: not cacheable
+                key = value = _MISSING
+            if key is _MISSING:
+                return fn(*args)
+            if value is _MISSING:
+                value = fn(*args)
+                cache.put(key, value)
+            return value
+    memoized.cache = cache
+    memoized.rjson_cache = {"maxsize": maxsize, "ttl": ttl}
+    return memoized
+
+
+def is_pure(fn):
+    """True if `fn` is marked pure (`@cacheable`, or named in an addon's `pure_functions`)."""
+    return getattr(fn, "rjson_cache", None) is not None
+
+
+def function_cache_stats():
+    """Return hit/miss/eviction statistics of every memoized function, by name."""
+    return {name: cache.stats() for name, cache in function_caches.items()}
+
+
+def clear_function_caches():
+    for cache in function_caches.values():
+        cache.clear()
+
+
+def _memoize_loaded(mod, loaded):
+    """Wrap the functions just loaded from `mod` that are marked as pure."""
+    declared = getattr(mod, "pure_functions", None) or {}
+    if not isinstance(declared, dict):
+        declared = {name: {} for name in declared}
+    for name in loaded:
+        fn = functions.get(name)
+        if fn is None:
+            continue
+        options = declared.get(name)
+        if options is None:
+            options = getattr(fn, "rjson_cache", None)
+        if options is not None:
+            functions[name] = memoize(name, fn, **options)
 
 
 def _load_module_from_path(path: str) -> types.ModuleType:
@@ -20,6 +280,127 @@ def _load_module_from_path(path: str) -> types.ModuleType:
     return mod
 
 
+# ---------- static scan of addon files ----------
+
+def _constant_names(node):
+    """String keys of a dict literal / strings of a list or tuple literal, or None."""
+    if isinstance(node, ast.Dict):
+        keys = node.keys
+    elif isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        keys = node.elts
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "dict" \
+            and not node.args and all(k.arg for k in node.keywords):
+        return [k.arg for k in node.keywords]
+    else:
+        return None
+    names = []
+    for key in keys:
+        if not (isinstance(key, ast.Constant) and isinstance(key.value, str)):
+            return None
+        names.append(key.value)
+    return names
+
+
+def _uses(tree, target):
+    """The names `target[<str>] = ...` stores under in `tree`; None if `target` is used any other way."""
+    names = []
+    stored = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == target \
+                and isinstance(node.ctx, ast.Store):
+            if not (isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)):
+                return None
+            names.append(node.slice.value)
+            stored.add(id(node.value))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == target and id(node) not in stored \
+                and not isinstance(node.ctx, ast.Store):
+            return None
+    return names
+
+
+def scan_addon(path):
+    """Names an addon file provides, found without importing it; None if they cannot be told statically.
+
+    Recognised: a module-level `functions` dict literal with string keys and
+    `functions["name"] = ...` assignments, and a `register(funcs)` whose body
+    stores `funcs["name"] = ...` or returns a literal list of names. Anything
+    else that touches `functions` or the `register` argument (loops, `update`,
+    computed keys, star imports) makes the result None.
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    try:
+        tree = ast.parse(source, filename=path)
+    except SyntaxError:
+        return None
+    names = []
+    module_level = ast.Module(body=[], type_ignores=[])
+    for stmt in tree.body:
+        if isinstance(stmt, ast.ImportFrom) and any(a.name in ("*", "functions") for a in stmt.names):
+            return None
+        if isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+            targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+            if any(isinstance(t, ast.Name) and t.id == "functions" for t in targets):
+                if len(targets) != 1 or stmt.value is None:
+                    return None
+                literal = _constant_names(stmt.value)
+                if literal is None:
+                    return None
+                names.extend(literal)
+                continue
+        if isinstance(stmt, ast.FunctionDef) and stmt.name == "register":
+            params = stmt.args.posonlyargs + stmt.args.args
+            if params:
+                found = _uses(stmt, params[0].arg)
+                if found is None:
+                    return None
+                names.extend(found)
+            for node in ast.walk(stmt):
+                if isinstance(node, ast.Return) and node.value is not None:
+                    returned = _constant_names(node.value)
+                    if returned is not None:
+                        names.extend(returned)
+            continue
+        module_level.body.append(stmt)
+    found = _uses(module_level, "functions")
+    if found is None:
+        return None
+    names.extend(found)
+    return list(dict.fromkeys(names))
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != 1 or not isinstance(data.get("addons"), dict):
+        return {}
+    return data["addons"]
+
+
+def _write_manifest(path, addons):
+    """Write the manifest atomically; an unwritable location just means no cache."""
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=".rjson-manifest-", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "addons": addons}, f, indent=1, sort_keys=True)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
+
+
 def load_addon(path: str) -> list:
     """Load an addon Python file and merge any `functions` it exposes.
 
@@ -27,9 +408,13 @@ def load_addon(path: str) -> list:
     - a `functions` dict mapping name -> callable, or
     - a `register` callable that accepts one argument (the existing functions dict)
 
+    Functions decorated with `@cacheable` or named in a module-level
+    `pure_functions` are wrapped with `memoize`.
+
     Returns a list of function names that were added or updated.
     """
     mod = _load_module_from_path(path)
+    before = dict(dict.items(functions))
     added = []
     # If module has a `functions` dict, merge it
     if hasattr(mod, "functions") and isinstance(getattr(mod, "functions"), dict):
@@ -42,6 +427,8 @@ def load_addon(path: str) -> list:
         result = mod.register(functions)
         if isinstance(result, (list, tuple)):
             added.extend([str(x) for x in result])
+    # Functions marked with @cacheable or listed in `pure_functions` get a result cache
+    _memoize_loaded(mod, [k for k, v in dict.items(functions) if before.get(k) is not v])
     # If module exposes a teardown callable, remember it so users can run cleanup
     if hasattr(mod, "teardown") and callable(getattr(mod, "teardown")):
         _registered_teardowns.append(getattr(mod, "teardown"))
@@ -62,23 +449,60 @@ def load_addons(paths):
     return results
 
 
-def load_addons_from_dir(dirpath: str, pattern: str = "*.py") -> dict:
+def load_addon_lazy(path: str, names=None) -> list:
+    """Declare the functions of an addon without importing it.
+
+    `names` defaults to `scan_addon(path)`. The module is imported (as by
+    `load_addon`) the first time one of the names is looked up in
+    `functions`. If the names cannot be found statically the addon is loaded
+    right away. Returns the declared (or added) names.
+    """
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if names is None:
+        names = scan_addon(path)
+    if names is None:
+        return load_addon(path)
+    functions.declare(names, path)
+    return list(names)
+
+
+def load_addons_from_dir(dirpath: str, pattern: str = "*.py", lazy: bool = False, manifest=None) -> dict:
     """Load all addon files in a directory matching pattern (uses simple filename matching).
 
+    With `lazy=True` each addon is only declared (see `load_addon_lazy`) and
+    imported on the first lookup of one of its names. `manifest` is an
+    optional JSON file caching the scanned names of each file by mtime and
+    size, so unchanged addons are not even parsed; it is rewritten when
+    something changed.
+
     Returns dict file_path -> added names or error message.
     """
     dirpath = os.path.abspath(dirpath)
     if not os.path.isdir(dirpath):
         raise NotADirectoryError(dirpath)
+    cached = _read_manifest(manifest) if lazy and manifest else {}
+    scanned = {}
     results = {}
     for name in os.listdir(dirpath):
         if not name.endswith('.py'):
             continue
         path = os.path.join(dirpath, name)
         try:
-            results[path] = load_addon(path)
+            if not lazy:
+                results[path] = load_addon(path)
+                continue
+            signature = _file_signature(path)
+            entry = cached.get(name)
+            if not (isinstance(entry, dict) and entry.get("signature") == signature):
+                entry = {"signature": signature, "functions": scan_addon(path)}
+            scanned[name] = entry
+            results[path] = load_addon_lazy(path, entry["functions"])
         except Exception as e:
             results[path] = f"ERROR: {e}"
+    if lazy and manifest and scanned != cached:
+        _write_manifest(manifest, scanned)
     return results
 
 
@@ -86,7 +510,12 @@ _registered_teardowns = []
 
 
 def teardown_addons():
-    """Run any registered teardown callables from loaded addons and clear them."""
+    """Run any registered teardown callables from loaded addons and clear them.
+
+    Only addons that were actually imported registered a teardown; lazily
+    declared addons that were never used are skipped. Also empties the result caches of memoized functions.
+    """
+    clear_function_caches()
     errors = []
     while _registered_teardowns:
         fn = _registered_teardowns.pop()
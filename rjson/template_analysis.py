@@ -0,0 +1,128 @@
+"""Static analysis over parsed expressions and compiled templates."""
+from .template_parser import (
+    TemplateNode, ExpressionNode, VariableNode, FunctionCallNode,
+    ArrayLiteralNode, BinaryOpNode, TernaryOpNode,
+)
+from .template_compiler import (
+    StringNode, ListNode, DictNode, RepeatNode, SET, REPEAT, SET_REPEAT,
+)
+
+
+def _expression_nodes(ast):
+    """Yield every node of an expression AST."""
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        yield node
+        t = type(node)
+        if t is TemplateNode:
+            stack.extend(node.parts)
+        elif t is ExpressionNode:
+            stack.append(node.expr)
+        elif t is VariableNode:
+            stack.extend(val for kind, val in node.accessors if kind == "index")
+        elif t is FunctionCallNode:
+            stack.extend(node.args)
+            stack.extend(val for kind, val in node.accessors if kind == "index")
+        elif t is BinaryOpNode:
+            stack.append(node.left)
+            stack.append(node.right)
+        elif t is TernaryOpNode:
+            stack.append(node.condition)
+            stack.append(node.true_expr)
+            stack.append(node.false_expr)
+        elif t is ArrayLiteralNode:
+            stack.extend(node.elements)
+
+
+def expression_names(ast, names=None):
+    """Collect the variable names an expression AST reads (including `_set`)."""
+    if names is None:
+        names = set()
+    for node in _expression_nodes(ast):
+        if type(node) is VariableNode:
+            names.add(node.name)
+    return names
+
+
+def expression_functions(ast, names=None):
+    """Collect the names of the functions an expression AST calls."""
+    if names is None:
+        names = set()
+    for node in _expression_nodes(ast):
+        if type(node) is FunctionCallNode:
+            names.add(node.name)
+    return names
+
+
+def _string_nodes(node):
+    """Yield every StringNode of a compiled node tree (including `_repeat` counts and hints)."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.static:
+            continue
+        if isinstance(node, StringNode):
+            yield node
+        elif isinstance(node, DictNode):
+            stack.extend(entry.node for entry in node.entries)
+        elif isinstance(node, RepeatNode):
+            stack.append(node.count)
+            stack.append(node.body)
+            if node.parallel is not None:
+                stack.append(node.parallel)
+        elif isinstance(node, ListNode):
+            stack.extend(node.items)
+
+
+def referenced_names(node, names=None):
+    """Collect every variable name read by expressions anywhere in a compiled node tree."""
+    if names is None:
+        names = set()
+    for string in _string_nodes(node):
+        if string.ast is not None:
+            expression_names(string.ast, names)
+    return names
+
+
+def called_functions(node, names=None):
+    """Collect every function name called by expressions anywhere in a compiled node tree."""
+    if names is None:
+        names = set()
+    for string in _string_nodes(node):
+        if string.ast is not None:
+            expression_functions(string.ast, names)
+    return names
+
+
+def assigned_names(node, names=None):
+    """Collect the `_set` names a compiled node tree writes when rendered.
+
+    Covers `_set.<name>` entries and visible `_repeat` keys (which are mirrored
+    into `_set`) at any depth, since nested writes propagate outwards.
+    """
+    if names is None:
+        names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.static:
+            continue
+        if isinstance(node, DictNode):
+            for entry in node.entries:
+                if entry.kind in (SET, SET_REPEAT, REPEAT):
+                    names.add(entry.name)
+                stack.append(entry.node)
+        elif isinstance(node, RepeatNode):
+            stack.append(node.body)
+        elif isinstance(node, ListNode):
+            stack.extend(node.items)
+    return names
+
+
+def repeat_analysis(node):
+    """Return `(reads, writes, calls)` for a RepeatNode body, computed once and kept on the node."""
+    if node.analysis is None:
+        node.analysis = (frozenset(referenced_names(node.body)), frozenset(assigned_names(node.body)),
+                         frozenset(called_functions(node.body)))
+    return node.analysis
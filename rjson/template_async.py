@@ -0,0 +1,345 @@
+"""Asynchronous rendering with concurrently awaited `async def` functions.
+
+`TemplateRuntime.render_async` renders through `AsyncRenderer`, which follows
+the synchronous render path step by step but can keep several awaitable
+function calls in flight:
+
+- sibling dict entries start as soon as the entries before them that write
+  something they read have finished (see `template_siblings`); their
+  results are committed to the context in template order, so key order and
+  `_set` visibility are the same as in `render()`;
+- the iterations of a `_repeat` whose body is independent of earlier
+  iterations (see `template_parallel.iterations_independent`) run
+  concurrently and are merged in order.
+
+Expressions stay synchronous: an expression is evaluated until it calls an
+async function, the call is awaited, and the expression is evaluated again
+with the results recorded so far. Every function (sync or async) therefore
+runs once per call site evaluation, in the same order as `render()`.
+Subtrees that call no async function are rendered by the synchronous path.
+"""
+import asyncio
+import inspect
+
+from .template_analysis import called_functions
+from .template_compiler import StringNode, DictNode, ListNode, RepeatNode, KEY, SET
+from .template_errors import located, wrap
+from .template_parallel import iterations_independent
+from .template_siblings import SiblingScheduler
+from .template_scope import GrowingListView
+from .template_stats import InstrumentedFunctions
+
+
+class _Pending(BaseException):
+    """Raised out of a synchronous evaluation when a function returns an awaitable.
+
+    Derives from BaseException so the `except Exception` handlers of the
+    evaluators let it through untouched.
+    """
+
+    def __init__(self, awaitable):
+        super().__init__()
+        self.awaitable = awaitable
+
+
+class _ReplayFunctions:
+    """Function mapping for one evaluation attempt of an expression.
+
+    The i-th call of an attempt returns the recorded outcome of the i-th call
+    of the earlier attempts, so replaying an expression never calls a
+    function twice; the first unrecorded call runs for real.
+    """
+    __slots__ = ("functions", "outcomes", "pos")
+
+    def __init__(self, functions, outcomes):
+        self.functions = functions
+        self.outcomes = outcomes
+        self.pos = 0
+
+    def __bool__(self):
+        return True
+
+    def get(self, name, default=None):
+        fn = self.functions.get(name)
+        if fn is None:
+            return default
+        return lambda *args: self._call(fn, args)
+
+    def _call(self, fn, args):
+        pos = self.pos
+        self.pos += 1
+        if pos < len(self.outcomes):
+            ok, value = self.outcomes[pos]
+            if ok:
+                return value
+            raise value
+        result = fn(*args)
+        if inspect.isawaitable(result):
+            raise _Pending(result)
+        self.outcomes.append((True, result))
+        return result
+
+
+class AsyncRenderer(SiblingScheduler):
+    """State of one `render_async` call: async function names, limits and per-node analysis."""
+
+    def __init__(self, functions, max_concurrency=None):
+        super().__init__()
+        self.functions = functions
+        self._is_async = {}
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._needs_async = {}
+
+    # ---------- analysis ----------
+
+    def is_async(self, name):
+        # looked up per called name so lazily declared addons are only imported when used
+        result = self._is_async.get(name)
+        if result is None:
+            functions = self.functions
+            if isinstance(functions, InstrumentedFunctions):
+                # the wrappers are plain functions; check what they wrap
+                functions = functions.functions
+            fn = functions.get(name)
+            result = self._is_async[name] = inspect.iscoroutinefunction(fn)
+        return result
+
+    def needs_async(self, node):
+        key = id(node)
+        result = self._needs_async.get(key)
+        if result is None:
+            result = any(self.is_async(name) for name in called_functions(node))
+            self._needs_async[key] = result
+        return result
+
+    # ---------- expressions ----------
+
+    async def _await(self, awaitable):
+        if self.semaphore is None:
+            return await awaitable
+        async with self.semaphore:
+            return await awaitable
+
+    async def evaluate(self, rt, node):
+        """Evaluate a StringNode against rt.context, awaiting async calls as they come up."""
+        outcomes = []
+        while True:
+            replay = rt.__class__(rt.context, _ReplayFunctions(rt.functions, outcomes),
+                                  rt.expression_cache, rt.backend)
+            replay.copies = rt.copies
+            try:
+                value = replay._eval_string_node(node)
+            except _Pending as pending:
+                try:
+                    outcomes.append((True, await self._await(pending.awaitable)))
+                except Exception as e:
+                    outcomes.append((False, e))
+                continue
+            # the replay runtime has no budget: account for the expression once, here
+            if rt.budget is not None:
+                rt.budget.evaluated(value)
+            return value
+
+    async def directive(self, rt, node, ctx):
+        if node.static or not self.needs_async(node):
+            return rt._eval_directive(node, ctx)
+        return await self.evaluate(rt._spawn(ctx), node)
+
+    # ---------- nodes ----------
+
+    async def render_node(self, rt, node):
+        if node.static or not self.needs_async(node):
+            return rt.render_node(node)
+        try:
+            if isinstance(node, StringNode):
+                return await self.evaluate(rt, node)
+            elif isinstance(node, DictNode):
+                return await self.render_dict(rt, node)
+            elif isinstance(node, RepeatNode):
+                return await self.render_repeat(rt, node)
+            elif isinstance(node, ListNode):
+                return await self.render_list(rt, node)
+            else:
+                raise TypeError(f"Unknown compiled node: {node!r}")
+        except Exception as e:
+            raise wrap(e, node)
+
+    async def render_list(self, rt, node):
+        result = []
+        base = rt.context
+        for i, item in enumerate(node.items):
+            prev = rt.context
+            if item.static:
+                rt._apply_static(item.value)
+            try:
+                result.append(await self.render_node(rt, item))
+            except Exception as e:
+                raise located(e, i, item)
+            rt._collapse(base, prev)
+        return result
+
+    async def render_body(self, rt, node):
+        if self.needs_async(node):
+            return await self.render_dict(rt, node)
+        return rt._render_dict(node)
+
+    # ---------- _repeat ----------
+
+    async def _independent(self, rt, node, name, local_ctx, repeat_count):
+        # `_repeat_parallel: true/false` overrides the static check, as for process pools
+        hint = None
+        if node.parallel is not None:
+            hint = bool(await self.directive(rt, node.parallel, local_ctx))
+        if repeat_count < 2 or hint is False:
+            return False
+        return hint or iterations_independent(node, name, local_ctx, rt.functions)
+
+    async def _iteration(self, rt, body, local_ctx, index, count):
+        # async counterpart of template_parallel.render_iteration
+        written = local_ctx.child()
+        loop_ctx = written.child()
+        loop_ctx["_index"] = index
+        loop_ctx["_repeat"] = count
+        sub_rt = rt._spawn(loop_ctx)
+        try:
+            item = await self.render_body(sub_rt, body)
+        except Exception as e:
+            raise located(e, index, body)
+        written.absorb(sub_rt.context)
+        return item, written.sets
+
+    async def _concurrent_items(self, rt, node, local_ctx, repeat_count):
+        results = await _gather_ordered([
+            self._iteration(rt, node.body, local_ctx, i, repeat_count) for i in range(repeat_count)
+        ])
+        return list(rt._merge_iterations(local_ctx, results))
+
+    async def render_repeat(self, rt, node):
+        local_ctx = rt.context.child()
+        repeat_count = int(await self.directive(rt, node.count, local_ctx))
+        rt._record_repeat(node, repeat_count)
+        if await self._independent(rt, node, None, local_ctx, repeat_count):
+            return await self._concurrent_items(rt, node, local_ctx, repeat_count)
+        items = []
+        for i in range(repeat_count):
+            loop_ctx = local_ctx.child()
+            loop_ctx["_index"] = i
+            loop_ctx["_repeat"] = repeat_count
+            sub_rt = rt._spawn(loop_ctx)
+            try:
+                items.append(await self.render_body(sub_rt, node.body))
+            except Exception as e:
+                raise located(e, i, node.body)
+            rt._merge_set(local_ctx, sub_rt.context)
+        return items
+
+    async def render_repeat_entry(self, rt, local_ctx, node, name):
+        repeat_count = int(await self.directive(rt, node.count, local_ctx))
+        rt._record_repeat(node, repeat_count)
+        if await self._independent(rt, node, name, local_ctx, repeat_count):
+            items = await self._concurrent_items(rt, node, local_ctx, repeat_count)
+            local_ctx[name] = GrowingListView(items)
+            return items
+        items = []
+        for i in range(repeat_count):
+            loop_ctx = local_ctx.child()
+            loop_ctx["_index"] = i
+            loop_ctx["_repeat"] = repeat_count
+            loop_ctx[name] = GrowingListView(items, i)
+            sub_rt = rt._spawn(loop_ctx)
+            try:
+                item = await self.render_body(sub_rt, node.body)
+            except Exception as e:
+                raise located(e, i, node.body)
+            rt._merge_set(local_ctx, sub_rt.context)
+            items.append(item)
+            local_ctx[name] = GrowingListView(items, i + 1)
+        return items
+
+    # ---------- dicts ----------
+
+    async def _entry_value(self, rt, local_ctx, entry):
+        sub_rt = rt._spawn(local_ctx)
+        return sub_rt, await self.render_node(sub_rt, entry.node)
+
+    def _start(self, rt, base, entry):
+        """Start rendering an entry against `base`; returns a future of what `_commit` needs."""
+        is_value = entry.kind == KEY or entry.kind == SET
+        if self.needs_async(entry.node):
+            if is_value:
+                return asyncio.ensure_future(self._entry_value(rt, base, entry))
+            return asyncio.ensure_future(self.render_repeat_entry(rt, base, entry.node, entry.name))
+        # synchronous subtree: render now, keep the outcome until its turn to commit
+        future = asyncio.get_running_loop().create_future()
+        try:
+            if is_value:
+                sub_rt = rt._spawn(base)
+                future.set_result((sub_rt, sub_rt.render_node(entry.node)))
+            else:
+                future.set_result(rt._render_repeat_entry(base, entry.node, entry.name))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def _start_when_ready(self, rt, local_ctx, entries, j, plan, futures, bases, committed):
+        deps, after = plan[j]
+        for i in deps:
+            await futures[i]
+        if after:
+            await committed[after - 1]
+        finished = [(i, bases[i], futures[i].result()) for i in deps if not committed[i].done()]
+        base = self._overlay(local_ctx, entries, j, finished) if finished else local_ctx
+        bases[j] = base
+        return await self._start(rt, base, entries[j])
+
+    async def render_dict(self, rt, node):
+        result = {}
+        local_ctx = rt.context.child()
+        entries = node.entries
+        plan = self._plan(entries, local_ctx)
+        loop = asyncio.get_running_loop()
+        committed = [loop.create_future() for _ in entries]
+        futures = []
+        bases = [local_ctx] * len(entries)
+        try:
+            for j, entry in enumerate(entries):
+                deps, after = plan[j]
+                if not after and all(futures[i].done() and futures[i].exception() is None for i in deps):
+                    # nothing it reads is still running: start it now (no entry is committed yet)
+                    finished = [(i, bases[i], futures[i].result()) for i in deps]
+                    if finished:
+                        bases[j] = self._overlay(local_ctx, entries, j, finished)
+                    futures.append(self._start(rt, bases[j], entry))
+                else:
+                    futures.append(asyncio.ensure_future(self._start_when_ready(
+                        rt, local_ctx, entries, j, plan, futures, bases, committed)))
+            for j, entry in enumerate(entries):
+                try:
+                    outcome = await futures[j]
+                except Exception as e:
+                    raise located(e, entry.key, entry.node)
+                self._commit(rt, local_ctx, result, entry, outcome)
+                committed[j].set_result(None)
+        except BaseException:
+            for future in committed:
+                future.cancel()
+            await _cancel(futures)
+            raise
+        rt.context = local_ctx
+        return result
+
+
+async def _cancel(futures):
+    for future in futures:
+        future.cancel()
+    await asyncio.gather(*futures, return_exceptions=True)
+
+
+async def _gather_ordered(coros):
+    """Run coroutines concurrently; return results in order or raise the first error in order."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return [await task for task in tasks]
+    except BaseException:
+        await _cancel(tasks)
+        raise
@@ -0,0 +1,107 @@
+"""Render one template against many contexts.
+
+`render_many` compiles the template once and renders it for every context of
+an iterable (which may be a lazy generator, e.g. reading NDJSON), yielding
+results in input order. With `workers` the renders are fanned out over a
+thread or process pool while keeping at most `max_in_flight` batches
+submitted, so memory stays constant however many contexts there are.
+"""
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from .template_compiler import compile_template
+
+THREAD = "thread"
+PROCESS = "process"
+
+# (compiled template, functions) in process-pool workers
+_worker_state = None
+
+
+def _render_batch(template, functions, contexts):
+    return [template.render(context, functions) for context in contexts]
+
+
+def _init_process_worker(template, functions):
+    global _worker_state
+    _worker_state = (compile_template(template), functions)
+
+
+def _render_batch_in_worker(contexts):
+    template, functions = _worker_state
+    return _render_batch(template, functions, contexts)
+
+
+def _batches(contexts, size):
+    it = iter(contexts)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def render_many(template, contexts, workers=None, *, functions=None, executor=THREAD,
+                batch_size=None, max_in_flight=None):
+    """Render `template` for each context in `contexts`, yielding results in order.
+
+    template: a template value or CompiledTemplate; compiled once.
+    workers: None or 1 renders in the calling thread; otherwise the size of
+        the pool given by `executor` ("thread" or "process").
+    batch_size: contexts per pool task (default 1 for threads, 64 for processes).
+    max_in_flight: batches submitted ahead of the consumer (default 2 * workers).
+
+    Process pools fork where available, so functions and the compiled template
+    are inherited; otherwise they must be picklable. Contexts and results are
+    always pickled in process mode. Every result is a new value, independent
+    of the template and of the other results, whichever executor is used.
+    The first error is raised at the position of the failing context, after
+    the results before it have been yielded.
+    """
+    if executor not in (THREAD, PROCESS):
+        raise ValueError(f"Unknown executor: {executor!r}")
+    if functions is None:
+        from .helpers import functions
+    compiled = compile_template(template)
+    if not workers or workers <= 1:
+        return (compiled.render(context, functions) for context in contexts)
+    return _render_pooled(compiled, contexts, functions, workers, executor, batch_size, max_in_flight)
+
+
+def _render_pooled(compiled, contexts, functions, workers, executor, batch_size, max_in_flight):
+    if executor == THREAD:
+        pool = ThreadPoolExecutor(workers)
+        task = lambda batch: _render_batch(compiled, functions, batch)
+        default_batch = 1
+    else:
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("fork")
+        else:
+            # compiled templates pickle without their closures, which workers rebuild
+            mp_context = None
+        pool = ProcessPoolExecutor(workers, mp_context=mp_context,
+                                   initializer=_init_process_worker, initargs=(compiled, functions))
+        task = _render_batch_in_worker
+        default_batch = 64
+
+    batches = _batches(contexts, batch_size or default_batch)
+    limit = max_in_flight or 2 * workers
+    pending = deque()
+    try:
+        for batch in islice(batches, limit):
+            pending.append((batch, pool.submit(task, batch)))
+        while pending:
+            batch, future = pending.popleft()
+            for nxt in islice(batches, 1):
+                pending.append((nxt, pool.submit(task, nxt)))
+            try:
+                results = future.result()
+            except Exception:
+                # re-render the failing batch here: yields the results before the
+                # failing context, then raises its original exception
+                results = (compiled.render(context, functions) for context in batch)
+            yield from results
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
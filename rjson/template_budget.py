@@ -0,0 +1,180 @@
+"""Render budgets: limits that stop a render early.
+
+Pass a `RenderBudget` to `TemplateRuntime(..., budget=...)` to bound a
+render by:
+
+- `max_iterations`: total `_repeat` iterations, checked as soon as a
+  repeat's count is known, before any of its iterations render;
+- `max_nodes`: expressions evaluated;
+- `max_output`: approximate size of the rendered values: every expression
+  result counts its length if it is a string, list or dict (1 otherwise),
+  and every `_repeat` item counts 1;
+- `timeout`: wall-clock seconds from the start of the render, checked every
+  `CLOCK_INTERVAL` expressions, at every `_repeat` and before every block of
+  rows of a `_repeat` evaluated column-wise (see `block`).
+
+Exceeding a limit raises `BudgetExceeded` (a `TemplateRenderError`, with the
+path where the render stopped) carrying the counters reached so far. The
+counters restart at every `render` / `render_async` / `iter_render` /
+`render_lazy` call. Checks are a few integer comparisons per expression;
+the clock is only read every `CLOCK_INTERVAL` expressions.
+
+A function that blocks is not interrupted by the synchronous path. With
+`threads=N` or `render_async`, the render stops waiting for it at the
+deadline (the call itself keeps running in its thread or task).
+Iterations rendered by worker processes (`workers=`) are counted when the
+repeat starts, but the expressions they evaluate are not.
+"""
+import time
+
+from .template_errors import TemplateRenderError
+
+ITERATIONS = "iterations"
+NODES = "nodes"
+OUTPUT = "output"
+DEADLINE = "deadline"
+
+# expressions evaluated between two reads of the clock
+CLOCK_INTERVAL = 256
+# column-wise `_repeat` rows evaluated at once while a deadline is set (a few ms)
+CLOCK_ROWS = 4096
+
+_UNLIMITED = float("inf")
+
+
+def output_size(value):
+    """How much one expression result counts towards `max_output`."""
+    t = type(value)
+    return len(value) if t is str or t is list or t is dict else 1
+
+
+class BudgetExceeded(TemplateRenderError):
+    """Raised when a render goes over one of the limits of its RenderBudget.
+
+    limit: which limit (ITERATIONS, NODES, OUTPUT or DEADLINE).
+    stats: the counters when the render stopped (iterations, nodes, output,
+        elapsed seconds).
+    path: JSON pointer of the value being rendered when it stopped.
+    """
+
+    def __init__(self, limit, stats):
+        super().__init__(None, None)
+        self.args = (limit, stats)
+        self.limit = limit
+        self.stats = stats
+
+    def __str__(self):
+        if self._message is None:
+            where = f" at {self.path}" if self._segments else ""
+            progress = ", ".join(f"{k}={v:.3f}" if k == "elapsed" else f"{k}={v}" for k, v in self.stats.items())
+            self._message = f"Render budget exceeded ({self.limit}){where}: {progress}"
+        return self._message
+
+    def __reduce__(self):
+        return (_rebuild, (self.limit, self.stats, self._segments))
+
+
+def _rebuild(limit, stats, segments):
+    error = BudgetExceeded(limit, stats)
+    error._segments = segments
+    return error
+
+
+class RenderBudget:
+    """Limits for one render at a time, and the counters of the render in progress."""
+
+    def __init__(self, max_iterations=None, max_nodes=None, max_output=None, timeout=None,
+                 clock=time.monotonic):
+        self.max_iterations = max_iterations
+        self.max_nodes = max_nodes
+        self.max_output = max_output
+        self.timeout = timeout
+        self._clock = clock
+        self.start()
+
+    def start(self):
+        """Reset the counters and start the clock (called when a render starts)."""
+        self._iterations_limit = _UNLIMITED if self.max_iterations is None else self.max_iterations
+        self._nodes_limit = _UNLIMITED if self.max_nodes is None else self.max_nodes
+        self._output_limit = _UNLIMITED if self.max_output is None else self.max_output
+        self.iterations = 0
+        self.nodes = 0
+        self.output = 0
+        self.started = self._clock()
+        self.deadline = None if self.timeout is None else self.started + self.timeout
+        self._next_clock = CLOCK_INTERVAL
+
+    def snapshot(self):
+        return {
+            ITERATIONS: self.iterations,
+            NODES: self.nodes,
+            OUTPUT: self.output,
+            "elapsed": self._clock() - self.started,
+        }
+
+    def exceeded(self, limit):
+        """The BudgetExceeded error for `limit`, with the current counters."""
+        return BudgetExceeded(limit, self.snapshot())
+
+    def remaining(self):
+        """Seconds left before the deadline (None without a timeout)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self._clock())
+
+    def check_deadline(self):
+        if self.deadline is not None and self._clock() > self.deadline:
+            raise self.exceeded(DEADLINE)
+
+    def repeat(self, count):
+        """Account for a `_repeat` of `count` iterations about to render."""
+        self.iterations += count
+        self.output += count
+        if self.iterations > self._iterations_limit:
+            raise self.exceeded(ITERATIONS)
+        if self.output > self._output_limit:
+            raise self.exceeded(OUTPUT)
+        self.check_deadline()
+
+    def block(self, rows, per_row):
+        """How many of the next `rows` column-wise iterations to evaluate at once.
+
+        `per_row` is the number of expressions per iteration. The block stops
+        at the first row that goes over the node or output limit (output is
+        assumed to be at least 1 per expression), and is at most `CLOCK_ROWS`
+        rows when a deadline is set, so the limits are enforced within a block
+        rather than after it.
+        """
+        self.check_deadline()
+        if per_row:
+            left = min(self._nodes_limit - self.nodes, self._output_limit - self.output)
+            if left < rows * per_row:
+                rows = int(left // per_row) + 1
+        if self.deadline is not None and rows > CLOCK_ROWS:
+            rows = CLOCK_ROWS
+        return max(1, rows)
+
+    def evaluated_block(self, count, output):
+        """Account for `count` expressions evaluated at once whose results add up to `output`."""
+        self.nodes += count
+        self.output += output
+        if self.nodes > self._nodes_limit:
+            raise self.exceeded(NODES)
+        if self.output > self._output_limit:
+            raise self.exceeded(OUTPUT)
+        if self.nodes >= self._next_clock:
+            self._next_clock = self.nodes + CLOCK_INTERVAL
+            self.check_deadline()
+
+    def evaluated(self, value, count=1):
+        """Account for `count` evaluated expressions; `value` is the result of a single one."""
+        self.nodes += count
+        t = type(value)
+        self.output += len(value) if t is str or t is list or t is dict else count
+        if self.nodes > self._nodes_limit:
+            raise self.exceeded(NODES)
+        if self.output > self._output_limit:
+            raise self.exceeded(OUTPUT)
+        if self.nodes >= self._next_clock:
+            self._next_clock = self.nodes + CLOCK_INTERVAL
+            self.check_deadline()
@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .template_lexer import TemplateLexer
+from .template_parser import TemplateParser
+from .template_closures import compile_ast
+from .template_optimizer import fold_constants
+
+
+class LRUCache:
+    """Bounded, thread-safe mapping with least-recently-used eviction.
+
+    Keeps hit/miss/eviction counters so callers can size the cache. A
+    ``maxsize`` of 0 disables storage entirely (every lookup is a miss).
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = int(maxsize)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key``, computing it with ``loader(key)`` on a miss.
+
+        The loader runs outside the lock; if two threads miss on the same key
+        both compute it and the last one wins, which is harmless for pure loaders.
+        """
+        sentinel = _MISSING
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = loader(key)
+            self.put(key, value)
+        return value
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = int(maxsize)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+    def _evict(self):
+        # caller holds the lock
+        while len(self._data) > max(self.maxsize, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+_MISSING = object()
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries also expire ``ttl`` seconds after being stored.
+
+    With ``ttl=None`` it behaves exactly like LRUCache. Expired entries are
+    dropped when they are looked up and counted as misses.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.monotonic):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self._timer = timer
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        if self.ttl is None:
+            return super().get(key, default)
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires <= self._timer():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def pop(self, key, default=None):
+        value = super().pop(key, _MISSING)
+        if value is _MISSING:
+            return default
+        return value[1] if self.ttl is not None else value
+
+    def put(self, key, value):
+        if self.ttl is not None:
+            value = (self._timer() + self.ttl, value)
+        super().put(key, value)
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        stats = super().stats()
+        stats["expirations"] = self.expirations
+        stats["ttl"] = self.ttl
+        return stats
+
+
+def parse_template_string(source):
+    """Tokenize and parse a template string into a TemplateNode."""
+    tokens = TemplateLexer(source).tokenize()
+    return TemplateParser(tokens).parse_template()
+
+
+class CachedExpression:
+    """Parsed and constant-folded AST of one template string plus its lazily built closure."""
+    __slots__ = ("ast", "_fn")
+
+    def __init__(self, ast):
+        self.ast = ast
+        self._fn = None
+
+    @property
+    def fn(self):
+        if self._fn is None:
+            self._fn = compile_ast(self.ast)
+        return self._fn
+
+    # closures do not pickle; they are rebuilt on first use after unpickling
+    def __getstate__(self):
+        return self.ast
+
+    def __setstate__(self, state):
+        self.ast = state
+        self._fn = None
+
+
+def _load_expression(source, phase=None):
+    """Tokenize, parse and fold `source`.
+
+    `phase(name, seconds)`, if given, is told the time spent in "tokenize"
+    and "parse" (including folding), as `RenderStats.phase` expects.
+    """
+    if phase is None:
+        return CachedExpression(fold_constants(parse_template_string(source)))
+    start = time.perf_counter()
+    tokens = TemplateLexer(source).tokenize()
+    tokenized = time.perf_counter()
+    phase("tokenize", tokenized - start)
+    try:
+        ast = fold_constants(TemplateParser(tokens).parse_template())
+    finally:
+        phase("parse", time.perf_counter() - tokenized)
+    return CachedExpression(ast)
+
+
+class ExpressionCache(LRUCache):
+    """LRU cache of parsed TemplateNode ASTs keyed by their source string.
+
+    Parsed ASTs are never mutated by the evaluator, so a single instance can be
+    shared by every runtime (and every `_repeat` iteration) in the process.
+    Each entry also keeps the closure-compiled form of its AST once requested.
+    """
+
+    def __init__(self, maxsize=4096):
+        super().__init__(maxsize)
+
+    def lookup(self, source):
+        return self.get_or_load(source, _load_expression)
+
+    def parse(self, source):
+        return self.lookup(source).ast
+
+    def compile(self, source):
+        """Return the closure `fn(context, functions)` evaluating `source`."""
+        return self.lookup(source).fn
+
+
+# Process-wide cache used by TemplateRuntime unless another one is passed in.
+expression_cache = ExpressionCache()
@@ -0,0 +1,318 @@
+"""Closure-compiled evaluation backend.
+
+`compile_ast` turns a parsed AST into nested Python closures once, with
+operators, accessor chains and literal operands resolved ahead of time. The
+returned callable takes `(context, functions)` and produces exactly what
+`TemplateEvaluator(context, functions).evaluate(ast)` would; the interpreter
+stays available as the reference implementation.
+"""
+from .template_evaluator import coerce_numeric, try_numeric
+from .template_scope import SetView, materialize
+from .template_parser import (
+    TemplateNode, TextNode, ExpressionNode, VariableNode, FunctionCallNode,
+    ArrayLiteralNode, BinaryOpNode, TernaryOpNode,
+)
+
+
+_MISSING = object()
+
+
+def _is_literal(node):
+    return isinstance(node, (int, float, bool, str)) or node is None
+
+
+def compile_ast(node):
+    """Compile an AST node (or literal) into a callable `fn(context, functions)`."""
+    if _is_literal(node):
+        return _const(node)
+    compiler = _COMPILERS.get(type(node))
+    if compiler is None:
+        return _raise_unknown(type(node).__name__)
+    return compiler(node)
+
+
+def _const(value):
+    def const(ctx, fns):
+        return value
+    const.constant = value
+    return const
+
+
+def _raise_unknown(nodename):
+    def unknown(ctx, fns):
+        raise ValueError(f"Unknown node type: {nodename}")
+    return unknown
+
+
+def _compile_template(node):
+    if len(node.parts) == 1:
+        return compile_ast(node.parts[0])
+    parts = [compile_ast(p) for p in node.parts]
+    if all(hasattr(p, "constant") for p in parts):
+        return _const("".join(str(p.constant) for p in parts))
+
+    def template(ctx, fns):
+        return "".join([str(p(ctx, fns)) for p in parts])
+    return template
+
+
+def _compile_text(node):
+    return _const(node.value)
+
+
+def _compile_expression(node):
+    return compile_ast(node.expr)
+
+
+def _compile_ternary(node):
+    cond = compile_ast(node.condition)
+    when_true = compile_ast(node.true_expr)
+    when_false = compile_ast(node.false_expr)
+
+    def ternary(ctx, fns):
+        if cond(ctx, fns):
+            return when_true(ctx, fns)
+        return when_false(ctx, fns)
+    return ternary
+
+
+def _compile_array(node):
+    elements = [compile_ast(e) for e in node.elements]
+
+    def array(ctx, fns):
+        return [materialize(e(ctx, fns)) for e in elements]
+    return array
+
+
+# ---------- binary operators ----------
+
+def _compile_binary(node):
+    left = compile_ast(node.left)
+    right = compile_ast(node.right)
+    op = node.op
+    builder = _BINARY.get(op)
+    if builder is None:
+        def unknown_op(ctx, fns):
+            left(ctx, fns)
+            right(ctx, fns)
+            raise ValueError(f"Unknown operator: {op}")
+        return unknown_op
+    return builder(left, right)
+
+
+def _add(left, right):
+    def add(ctx, fns):
+        a = left(ctx, fns)
+        b = right(ctx, fns)
+        if isinstance(a, str) or isinstance(b, str):
+            return str(a) + str(b)
+        return coerce_numeric(a) + coerce_numeric(b)
+    return add
+
+
+def _sub(left, right):
+    if hasattr(right, "constant") and not isinstance(right.constant, str):
+        k = coerce_numeric(right.constant)
+
+        def sub_const(ctx, fns):
+            return coerce_numeric(left(ctx, fns)) - k
+        return sub_const
+
+    def sub(ctx, fns):
+        a = left(ctx, fns)
+        b = right(ctx, fns)
+        return coerce_numeric(a) - coerce_numeric(b)
+    return sub
+
+
+def _mul(left, right):
+    if hasattr(right, "constant") and not isinstance(right.constant, str):
+        k = coerce_numeric(right.constant)
+
+        def mul_const(ctx, fns):
+            return coerce_numeric(left(ctx, fns)) * k
+        return mul_const
+
+    def mul(ctx, fns):
+        a = left(ctx, fns)
+        b = right(ctx, fns)
+        return coerce_numeric(a) * coerce_numeric(b)
+    return mul
+
+
+def _div(left, right):
+    def div(ctx, fns):
+        a = left(ctx, fns)
+        denom = coerce_numeric(right(ctx, fns))
+        if denom == 0:
+            raise ZeroDivisionError("Division by zero in template expression")
+        return coerce_numeric(a) / denom
+    return div
+
+
+def _eq(left, right):
+    def eq(ctx, fns):
+        return left(ctx, fns) == right(ctx, fns)
+    return eq
+
+
+def _ne(left, right):
+    def ne(ctx, fns):
+        return left(ctx, fns) != right(ctx, fns)
+    return ne
+
+
+def _ordering(compare):
+    def build(left, right):
+        def ordering(ctx, fns):
+            a = left(ctx, fns)
+            b = right(ctx, fns)
+            nx = try_numeric(a)
+            ny = try_numeric(b)
+            if nx is not None and ny is not None:
+                return compare(nx, ny)
+            # fall back to Python comparisons; unorderable types compare False
+            try:
+                return compare(a, b)
+            except Exception:
+                return False
+        return ordering
+    return build
+
+
+_BINARY = {
+    "+": _add,
+    "-": _sub,
+    "*": _mul,
+    "/": _div,
+    "==": _eq,
+    "!=": _ne,
+    ">": _ordering(lambda a, b: a > b),
+    "<": _ordering(lambda a, b: a < b),
+    ">=": _ordering(lambda a, b: a >= b),
+    "<=": _ordering(lambda a, b: a <= b),
+}
+
+
+# ---------- variables and function calls ----------
+
+def _dot(name):
+    def dot(value, ctx, fns):
+        if isinstance(value, dict):
+            return value.get(name)
+        return getattr(value, name, None)
+    return dot
+
+
+def _var_index(expr):
+    # variables cast the index to int before subscripting (errors propagate)
+    index = compile_ast(expr)
+
+    def var_index(value, ctx, fns):
+        idx = int(index(ctx, fns))
+        try:
+            return value[idx]
+        except Exception:
+            return None
+    return var_index
+
+
+def _call_index(expr):
+    # function results are subscripted with the raw index value
+    index = compile_ast(expr)
+
+    def call_index(value, ctx, fns):
+        idx = index(ctx, fns)
+        try:
+            return value[idx]
+        except Exception:
+            return None
+    return call_index
+
+
+def _compile_var_accessors(accessors):
+    steps = []
+    for acc_type, acc_val in accessors:
+        if acc_type == "dot":
+            steps.append(_dot(acc_val))
+        elif acc_type == "index":
+            steps.append(_var_index(acc_val))
+        else:
+            def bad_accessor(value, ctx, fns, acc_type=acc_type):
+                raise ValueError(f"Unknown accessor type: {acc_type}")
+            steps.append(bad_accessor)
+    return steps
+
+
+def _compile_call_accessors(accessors):
+    steps = []
+    for acc_type, acc_val in accessors:
+        if acc_type == "dot":
+            steps.append(_dot(acc_val))
+        elif acc_type == "index":
+            steps.append(_call_index(acc_val))
+    return steps
+
+
+def _compile_variable(node):
+    name = node.name
+    if name == "_set":
+        def base(ctx, fns):
+            value = ctx.get("_set", {})
+            if isinstance(value, SetView):
+                return value.copy()
+            return value
+    else:
+        # prefer direct context key, then fall back to the _set namespace
+        def base(ctx, fns):
+            value = ctx.get(name, _MISSING)
+            if value is not _MISSING:
+                return value
+            if "_set" in ctx:
+                ns = ctx["_set"]
+                if name in ns:
+                    return ns[name]
+            return None
+    steps = _compile_var_accessors(node.accessors)
+    if not steps:
+        return base
+
+    def variable(ctx, fns):
+        value = base(ctx, fns)
+        for step in steps:
+            value = step(value, ctx, fns)
+        return value
+    return variable
+
+
+def _compile_call(node):
+    name = node.name
+    args = [compile_ast(a) for a in node.args]
+    steps = _compile_call_accessors(node.accessors)
+
+    def call(ctx, fns):
+        fn = fns.get(name)
+        if fn is None:
+            raise NameError(f"Function '{name}' is not defined")
+        values = [materialize(a(ctx, fns)) for a in args]
+        try:
+            result = fn(*values)
+        except Exception as e:
+            raise RuntimeError(f"Error calling function {name} with args {values}: {e}")
+        result = materialize(result)
+        for step in steps:
+            result = step(result, ctx, fns)
+        return result
+    return call
+
+
+_COMPILERS = {
+    TemplateNode: _compile_template,
+    TextNode: _compile_text,
+    ExpressionNode: _compile_expression,
+    BinaryOpNode: _compile_binary,
+    TernaryOpNode: _compile_ternary,
+    VariableNode: _compile_variable,
+    FunctionCallNode: _compile_call,
+    ArrayLiteralNode: _compile_array,
+}
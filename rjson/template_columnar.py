@@ -0,0 +1,359 @@
+"""Column-wise evaluation of `_repeat` bodies with NumPy.
+
+A `_repeat` body whose visible keys are static values or expressions (or
+text templates such as `row-$_index`) built only from numbers, strings,
+`+ - * /`, comparisons, ternaries and the names `_index`, `_repeat` and
+outer numeric constants (ints below 2**53 or floats, not bools) renders
+every iteration independently of the others. Such a
+body is evaluated once per block of iterations: `_index` becomes an int64
+vector and every field a NumPy column, and the rows are assembled from the
+columns; strings are built column-wise with `numpy.char`.
+
+Results are identical to the per-iteration path: integer arithmetic stays in
+int64 and is checked to stay below 2**53 (so conversions and comparisons
+with floats are exact), int/float promotion, `/` and ordering comparisons
+follow `TemplateEvaluator`, and a ternary only evaluates each branch for the
+rows that select it. Whenever a block needs anything else -- a division by
+zero, an integer growing past 2**53, a non-numeric operand -- it is handed
+back to the per-iteration path, which renders it (and raises) exactly as
+before. Without NumPy nothing changes.
+"""
+from itertools import repeat
+
+from .template_compiler import StaticNode, StringNode, KEY, copy_static
+from .template_evaluator import TemplateEvaluator
+from .template_parser import TemplateNode, TextNode, VariableNode, BinaryOpNode, TernaryOpNode
+
+# imported by _numpy() for the first repeat long enough to evaluate column-wise,
+# so `import rjson` does not pay for it
+numpy = None
+_numpy_missing = False
+
+# repeats shorter than this are not worth setting up columns for
+COLUMNAR_THRESHOLD = 64
+# iterations evaluated per block (bounds the memory of one block's columns)
+BLOCK_SIZE = 65536
+
+_EXACT_INT = 2 ** 53
+_INT64_LIMIT = 2 ** 63
+
+_OPERATORS = frozenset(("+", "-", "*", "/", "==", "!=", ">", "<", ">=", "<="))
+
+# column kinds: a Python scalar shared by every row, int64/float64/bool arrays, or a list of values
+CONST, INT, FLOAT, BOOL, OBJECT = range(5)
+
+_reference = TemplateEvaluator()
+
+
+class _Fallback(Exception):
+    """The block must be rendered iteration by iteration."""
+
+
+# ---------- static check ----------
+
+def columnar_plan(node):
+    """`(fields, names)` for a RepeatNode whose body can be evaluated column-wise, else False (cached on the node).
+
+    `fields` lists `(key, value, ast)`: `ast` is None for static values. `names`
+    are the outer names the expressions read besides `_index` and `_repeat`.
+    """
+    if node.columnar is None:
+        node.columnar = _plan(node.body)
+    return node.columnar
+
+
+def _plan(body):
+    keys = set()
+    for entry in body.entries:
+        if entry.kind != KEY:
+            return False
+        keys.add(entry.key)
+    fields = []
+    names = set()
+    for entry in body.entries:
+        child = entry.node
+        if isinstance(child, StaticNode):
+            fields.append((entry.key, child.value, None))
+        elif isinstance(child, StringNode) and child.ast is not None and _supported(child.ast, names):
+            fields.append((entry.key, None, child.ast))
+        else:
+            return False
+    names.discard("_index")
+    names.discard("_repeat")
+    # earlier keys of the body are visible to later expressions; `$_set` is a dict
+    if "_set" in names or not names.isdisjoint(keys):
+        return False
+    return tuple(fields), frozenset(names)
+
+
+def _supported(node, names):
+    t = type(node)
+    if t is int or t is float or t is str or t is bool or t is TextNode:
+        return True
+    if t is VariableNode:
+        names.add(node.name)
+        return not node.accessors
+    if t is BinaryOpNode:
+        return node.op in _OPERATORS and _supported(node.left, names) and _supported(node.right, names)
+    if t is TernaryOpNode:
+        return all(_supported(n, names) for n in (node.condition, node.true_expr, node.false_expr))
+    if t is TemplateNode:
+        return all(_supported(p, names) for p in node.parts)
+    return False
+
+
+# ---------- evaluation ----------
+
+def _numpy():
+    """The numpy module, imported on first use; None if it is not installed."""
+    global numpy, _numpy_missing
+    if numpy is None and not _numpy_missing:
+        try:
+            import numpy as module
+        except ImportError:  # columnar evaluation is NumPy-only
+            _numpy_missing = True
+        else:
+            numpy = module
+    return numpy
+
+
+def iter_columnar(node, name, local_ctx, count, block_size=None):
+    """Yield the rows of RepeatNode `node` block by block, evaluated column-wise.
+
+    Stops early (possibly before the first block) when a block must be
+    rendered iteration by iteration; the caller continues from there.
+    `block_size(n)`, if given, returns how many of the next `n` rows (at most
+    BLOCK_SIZE) the next block evaluates.
+    """
+    if count < COLUMNAR_THRESHOLD or count >= _EXACT_INT:
+        return
+    plan = columnar_plan(node)
+    if not plan or _numpy() is None:
+        return
+    fields, names = plan
+    if name is not None and name in names:
+        return
+    constants = _constants(names, local_ctx)
+    if constants is None:
+        return
+    constants["_repeat"] = (CONST, count)
+    keys = [key for key, _, _ in fields]
+    start = 0
+    while start < count:
+        size = min(count - start, BLOCK_SIZE)
+        stop = start + (size if block_size is None else block_size(size))
+        env = dict(constants)
+        env["_index"] = (INT, numpy.arange(start, stop, dtype=numpy.int64))
+        try:
+            with numpy.errstate(all="ignore"):
+                columns = [_values((CONST, value) if ast is None else _eval(ast, env, None), stop - start)
+                           for _, value, ast in fields]
+        except _Fallback:
+            return
+        yield [dict(zip(keys, row)) for row in zip(*columns)] if columns else [{} for _ in range(start, stop)]
+        start = stop
+
+
+def _constants(names, local_ctx):
+    """Columns for the outer names, resolved like the evaluator would; None unless all are plain numbers."""
+    if not names:
+        return {}
+    if local_ctx.has_sets() and not names.isdisjoint(local_ctx.set_items()):
+        # `_set` entries are mirrored into the scope after the first iteration,
+        # so such a name may read differently from then on
+        return None
+    evaluator = TemplateEvaluator(local_ctx)
+    constants = {}
+    for n in names:
+        value = evaluator.eval_var(VariableNode(n))
+        t = type(value)
+        if t is float or (t is int and -_EXACT_INT < value < _EXACT_INT):
+            constants[n] = (CONST, value)
+        else:
+            return None
+    return constants
+
+
+def _values(column, n):
+    """Per-row Python values of a column."""
+    kind, value = column
+    if kind == CONST:
+        if isinstance(value, (dict, list)):
+            # every row gets its own copy, as if rendered separately
+            return [copy_static(value) for _ in range(n)]
+        return repeat(value, n)
+    if kind == OBJECT:
+        return value
+    return value.tolist()
+
+
+def _eval(node, env, mask):
+    """Column of `node`; `mask` (None: every row) marks the rows whose value is used."""
+    t = type(node)
+    if t is VariableNode:
+        return env[node.name]
+    if t is BinaryOpNode:
+        left = _eval(node.left, env, mask)
+        right = _eval(node.right, env, mask)
+        return _binary(node.op, left, right, mask)
+    if t is TernaryOpNode:
+        return _ternary(node, env, mask)
+    if t is TemplateNode:
+        if len(node.parts) == 1:
+            return _eval(node.parts[0], env, mask)
+        result = ""
+        for part in node.parts:
+            result = _concat(result, _strings(_eval(part, env, mask)))
+        return _string_column(result)
+    if t is TextNode:
+        return (CONST, node.value)
+    return (CONST, node)
+
+
+def _strings(column):
+    """`str()` of every value of a column, as a NumPy string array (CONST: a Python str)."""
+    kind, value = column
+    if kind == CONST:
+        return str(value)
+    if kind == OBJECT:
+        return numpy.array([str(v) for v in value])
+    # NumPy formats int64, bool and (shortest round-trip) float64 exactly like str()
+    return value.astype(str)
+
+
+def _concat(left, right):
+    if type(left) is str and type(right) is str:
+        return left + right
+    return numpy.char.add(left, right)
+
+
+def _string_column(strings):
+    if type(strings) is str:
+        return (CONST, strings)
+    return (OBJECT, strings.tolist())
+
+
+def _length(env):
+    return len(env["_index"][1])
+
+
+def _active(array, mask):
+    return array if mask is None else array[mask]
+
+
+def _max_abs(column, mask):
+    kind, value = column
+    if kind == CONST:
+        return abs(int(value))
+    active = _active(value, mask)
+    if not len(active):
+        return 0
+    return int(numpy.abs(active.astype(numpy.int64)).max())
+
+
+def _array(column):
+    """NumPy operand of a numeric column (CONST: a NumPy scalar)."""
+    kind, value = column
+    if kind != CONST:
+        return value
+    if type(value) is int and not -_EXACT_INT < value < _EXACT_INT:
+        raise _Fallback
+    return numpy.bool_(value) if type(value) is bool else numpy.float64(value) if type(value) is float \
+        else numpy.int64(value)
+
+
+def _is_integral(column):
+    kind, value = column
+    if kind == CONST:
+        return type(value) is int or type(value) is bool
+    return kind == INT or kind == BOOL
+
+
+def _binary(op, left, right, mask):
+    lkind, lvalue = left
+    rkind, rvalue = right
+    if lkind == CONST and rkind == CONST:
+        try:
+            return (CONST, _reference.evaluate(BinaryOpNode(lvalue, op, rvalue)))
+        except Exception:
+            raise _Fallback
+    if lkind == OBJECT or rkind == OBJECT:
+        raise _Fallback
+    if op == "+" and (type(lvalue) is str or type(rvalue) is str):
+        return _string_column(_concat(_strings(left), _strings(right)))
+    for kind, value in (left, right):
+        if kind == CONST and type(value) not in (int, float, bool):
+            raise _Fallback
+    x = _array(left)
+    y = _array(right)
+    if op in ("+", "-", "*"):
+        if _is_integral(left) and _is_integral(right):
+            if op == "*" and _max_abs(left, mask) * _max_abs(right, mask) >= _INT64_LIMIT:
+                raise _Fallback
+            x = x.astype(numpy.int64)
+            y = y.astype(numpy.int64)
+            result = x + y if op == "+" else x - y if op == "-" else x * y
+            if _max_abs((INT, result), mask) >= _EXACT_INT:
+                raise _Fallback
+            return (INT, result)
+        x = x.astype(numpy.float64)
+        y = y.astype(numpy.float64)
+        return (FLOAT, x + y if op == "+" else x - y if op == "-" else x * y)
+    if op == "/":
+        zero = y == 0
+        if numpy.ndim(zero) == 0:
+            if zero:
+                raise _Fallback
+        elif _active(zero, mask).any():
+            raise _Fallback
+        return (FLOAT, x.astype(numpy.float64) / y.astype(numpy.float64))
+    if op == "==":
+        return (BOOL, numpy.asarray(x == y))
+    if op == "!=":
+        return (BOOL, numpy.asarray(x != y))
+    # ordering compares the float values of both sides
+    x = x.astype(numpy.float64)
+    y = y.astype(numpy.float64)
+    if op == ">":
+        result = x > y
+    elif op == "<":
+        result = x < y
+    elif op == ">=":
+        result = x >= y
+    else:
+        result = x <= y
+    return (BOOL, numpy.asarray(result))
+
+
+def _ternary(node, env, mask):
+    kind, value = _eval(node.condition, env, mask)
+    if kind == CONST:
+        return _eval(node.true_expr if value else node.false_expr, env, mask)
+    if kind == OBJECT:
+        raise _Fallback
+    truth = value if kind == BOOL else value != 0
+    when_true = truth if mask is None else truth & mask
+    when_false = ~truth if mask is None else ~truth & mask
+    if not when_true.any():
+        return _eval(node.false_expr, env, mask)
+    if not when_false.any():
+        return _eval(node.true_expr, env, mask)
+    return _select(truth, _eval(node.true_expr, env, when_true), _eval(node.false_expr, env, when_false),
+                   len(truth))
+
+
+_CONST_KINDS = {int: INT, float: FLOAT, bool: BOOL}
+
+
+def _select(truth, when_true, when_false, n):
+    tkind, tvalue = when_true
+    fkind, fvalue = when_false
+    if tkind == CONST:
+        tkind = _CONST_KINDS.get(type(tvalue), OBJECT)
+    if fkind == CONST:
+        fkind = _CONST_KINDS.get(type(fvalue), OBJECT)
+    if tkind == fkind and tkind != OBJECT:
+        # both sides hold values of one Python type, so NumPy keeps it
+        return (tkind, numpy.where(truth, _array(when_true), _array(when_false)))
+    values = zip(truth.tolist(), _values(when_true, n), _values(when_false, n))
+    return (OBJECT, [t if c else f for c, t, f in values])
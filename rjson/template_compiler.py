@@ -0,0 +1,227 @@
+"""Whole-template compilation.
+
+`compile_template` walks a loaded YAML/JSON template once, splits the
+`_set.` / `_repeat` directive keys, pre-parses every expression string and
+marks subtrees that contain no expressions or directives as static. Strings
+whose expression folds to a constant count as static too, with their folded
+value. The resulting node tree is what `TemplateRuntime` renders.
+"""
+from .template_cache import expression_cache as _shared_expression_cache
+from .template_optimizer import is_constant
+
+# entry kinds inside a DictNode
+KEY = "key"                 # plain visible key
+SET = "set"                 # `_set.<name>`: hidden, stored in context
+REPEAT = "repeat"           # visible key whose value is a `_repeat` dict
+SET_REPEAT = "set_repeat"   # `_set.<name>` whose value is a `_repeat` dict
+
+
+_NO_SOURCE = object()
+
+
+class CompiledNode:
+    __slots__ = ("source",)
+    static = False
+
+
+class StaticNode(CompiledNode):
+    """Subtree without expressions or directives (or only constant ones); `value` is what it renders to."""
+    __slots__ = ("value",)
+    static = True
+
+    def __init__(self, value, source=_NO_SOURCE):
+        self.source = value if source is _NO_SOURCE else source
+        self.value = value
+
+    def __repr__(self): return f"StaticNode({self.value!r})"
+
+
+class StringNode(CompiledNode):
+    """String containing `$`, parsed once.
+
+    `ast` is None when the string failed to parse; the error is raised again
+    at render time so templates only fail on branches that actually render.
+    `fn` is the closure-compiled form of `ast`, built on first use.
+    """
+    __slots__ = ("ast", "_expr")
+
+    def __init__(self, source, expr):
+        self.source = source
+        self._expr = expr
+        self.ast = expr.ast if expr is not None else None
+
+    @property
+    def fn(self):
+        return self._expr.fn
+
+    def __repr__(self): return f"StringNode({self.source!r})"
+
+
+class ListNode(CompiledNode):
+    __slots__ = ("items",)
+
+    def __init__(self, source, items):
+        self.source = source
+        self.items = items
+
+    def __repr__(self): return f"ListNode({self.items})"
+
+
+class DictEntry:
+    __slots__ = ("kind", "key", "name", "node")
+
+    def __init__(self, kind, key, name, node):
+        self.kind = kind
+        self.key = key      # key as written in the template
+        self.name = name    # output key / `_set` variable name
+        self.node = node
+
+    def __repr__(self): return f"DictEntry({self.kind}, {self.key!r}, {self.node})"
+
+
+class DictNode(CompiledNode):
+    __slots__ = ("entries",)
+
+    def __init__(self, source, entries):
+        self.source = source
+        self.entries = entries
+
+    def __repr__(self): return f"DictNode({self.entries})"
+
+
+class RepeatNode(CompiledNode):
+    """Dict with a `_repeat` count; `body` is the dict without its `_repeat*` keys."""
+    __slots__ = ("count", "body", "parallel", "analysis", "columnar", "path")
+
+    def __init__(self, source, count, body, parallel=None):
+        self.source = source
+        self.count = count  # StaticNode or StringNode
+        self.body = body
+        self.parallel = parallel  # `_repeat_parallel` hint (StaticNode or StringNode) or None
+        self.analysis = None  # (names read, `_set` names written, functions called) by the body, filled on first use
+        self.columnar = None  # template_columnar.columnar_plan, filled on first use
+        self.path = None  # JSON pointer in the template (`*`: every item), filled by RenderStats.index
+
+    def __repr__(self): return f"RepeatNode({self.count}, {self.body})"
+
+
+def compile_node(obj, expression_cache=None):
+    """Compile a template value (dict/list/str/scalar) into a CompiledNode tree."""
+    cache = expression_cache if expression_cache is not None else _shared_expression_cache
+    return _compile(obj, cache)
+
+
+def _compile_string(s, cache):
+    try:
+        expr = cache.lookup(s)
+    except Exception:
+        expr = None
+    if expr is not None and is_constant(expr.ast):
+        return StaticNode(expr.ast, s)
+    return StringNode(s, expr)
+
+
+def _compile_directive(value, cache):
+    # mirrors TemplateRuntime._eval_value: only strings starting with `$` are expressions
+    if isinstance(value, str) and value.startswith("$"):
+        return _compile_string(value, cache)
+    return StaticNode(value)
+
+
+def copy_static(value):
+    """A fresh copy of the dicts and lists of a static value (other values are immutable JSON).
+
+    Static values belong to the compiled template; every render hands out its
+    own copy so changing the output never changes the template or other renders.
+    """
+    if isinstance(value, dict):
+        return {k: copy_static(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_static(v) for v in value]
+    return value
+
+
+def _static_value(source, nodes):
+    """Rendered value of a static dict/list: `source` itself unless a child folded."""
+    if all(node.value is node.source for node in nodes):
+        return source
+    values = [node.value for node in nodes]
+    if isinstance(source, dict):
+        return dict(zip(source, values))
+    return values
+
+
+def _compile_dict_body(d, cache):
+    entries = []
+    static = True
+    for key, value in d.items():
+        if isinstance(key, str) and key.startswith("_repeat"):
+            static = False
+            continue
+        if isinstance(key, str) and key.startswith("_set."):
+            static = False
+            name = key.split(".", 1)[1]
+            kind = SET
+        else:
+            name = key
+            kind = KEY
+        node = _compile(value, cache)
+        if isinstance(node, RepeatNode):
+            kind = SET_REPEAT if kind == SET else REPEAT
+        if not node.static:
+            static = False
+        entries.append(DictEntry(kind, key, name, node))
+    return DictNode(d, tuple(entries)), static
+
+
+def _compile(obj, cache):
+    if isinstance(obj, dict):
+        if obj.get("_repeat") is not None:
+            body, _ = _compile_dict_body(obj, cache)
+            parallel = None
+            if "_repeat_parallel" in obj:
+                parallel = _compile_directive(obj["_repeat_parallel"], cache)
+            return RepeatNode(obj, _compile_directive(obj["_repeat"], cache), body, parallel)
+        node, static = _compile_dict_body(obj, cache)
+        if static:
+            return StaticNode(_static_value(obj, [entry.node for entry in node.entries]), obj)
+        return node
+    if isinstance(obj, list):
+        items = tuple(_compile(item, cache) for item in obj)
+        if all(item.static for item in items):
+            return StaticNode(_static_value(obj, items), obj)
+        return ListNode(obj, items)
+    if isinstance(obj, str) and "$" in obj:
+        return _compile_string(obj, cache)
+    return StaticNode(obj)
+
+
+class CompiledTemplate:
+    """A template compiled once and rendered many times.
+
+    Static subtrees skip rendering but are copied into every result, so
+    results are independent of the template and of each other.
+    """
+
+    def __init__(self, root, source=None):
+        self.root = root
+        self.source = source
+
+    @property
+    def static(self):
+        return self.root.static
+
+    def render(self, context=None, functions=None):
+        from .template_runtime import TemplateRuntime
+        if functions is None:
+            from .helpers import functions
+        return TemplateRuntime(context or {}, functions).render(self)
+
+    def __repr__(self): return f"CompiledTemplate({self.root})"
+
+
+def compile_template(obj, expression_cache=None):
+    """Compile a loaded YAML/JSON template into a reusable CompiledTemplate."""
+    if isinstance(obj, CompiledTemplate):
+        return obj
+    return CompiledTemplate(compile_node(obj, expression_cache), obj)
@@ -0,0 +1,94 @@
+"""Structured render errors.
+
+A failure anywhere in a template is raised as one `TemplateRenderError`.
+It is created where the original exception escapes the innermost rendered
+node; every dict key, list index and `_repeat` iteration it then passes
+through only appends a segment to its path, so nothing is formatted while
+it propagates. The message is built on first `str()`.
+"""
+import json
+
+from .template_lexer import TemplateLexer
+from .template_parser import TemplateParser
+
+
+class TemplateRenderError(RuntimeError):
+    """Error raised while rendering a template.
+
+    path: JSON pointer of the failing value in the rendered output
+        (`_set.<name>` keys appear as written).
+    source: template subtree (or expression string) that failed to render.
+    expression: `source` if it is an expression string, else None.
+    position: for an expression that does not parse, the position of the
+        token the parser stopped at; None otherwise.
+    cause: the original exception (also `__cause__`).
+    """
+
+    def __init__(self, source, cause):
+        super().__init__(source, cause)
+        self.source = source
+        self.cause = cause
+        self.__cause__ = cause
+        self._segments = []     # innermost first
+        self._message = None
+
+    @property
+    def path(self):
+        return "".join("/" + pointer_token(s) for s in reversed(self._segments))
+
+    @property
+    def expression(self):
+        return self.source if isinstance(self.source, str) else None
+
+    @property
+    def position(self):
+        expression = self.expression
+        if expression is None:
+            return None
+        parser = TemplateParser(TemplateLexer(expression).tokenize())
+        try:
+            parser.parse_template()
+        except Exception:
+            return parser.current[2]
+        return None
+
+    def __str__(self):
+        if self._message is None:
+            where = f" at {self.path}" if self._segments else ""
+            source = json.dumps(self.source, indent=2, default=str)
+            self._message = f"Error during rendering template{where}: {source}\n{self.cause}"
+        return self._message
+
+    def __reduce__(self):
+        return (_rebuild, (self.source, self.cause, self._segments))
+
+
+def _rebuild(source, cause, segments):
+    error = TemplateRenderError(source, cause)
+    error._segments = segments
+    return error
+
+
+def pointer_token(segment):
+    """Escape a key for use as a JSON pointer segment."""
+    return str(segment).replace("~", "~0").replace("/", "~1")
+
+
+def located(error, segment, node=None):
+    """Return `error` as a TemplateRenderError one level further out, under `segment`.
+
+    Errors that are not TemplateRenderErrors yet are wrapped with the source
+    of `node`, the subtree being rendered where they escaped.
+    """
+    if not isinstance(error, TemplateRenderError):
+        error = TemplateRenderError(node.source if node is not None else None, error)
+    error._segments.append(segment)
+    error._message = None
+    return error
+
+
+def wrap(error, node):
+    """Return `error` as a TemplateRenderError raised while rendering `node`."""
+    if isinstance(error, TemplateRenderError):
+        return error
+    return TemplateRenderError(node.source, error)
@@ -1,5 +1,45 @@
 # template_evaluator.py
 import random
+from .template_scope import SetView, materialize
+
+
+# helper: coerce to numeric when needed (arithmetic operators)
+def coerce_numeric(x):
+    if x is None:
+        return 0
+    if isinstance(x, (int, float)):
+        return x
+    if isinstance(x, str):
+        try:
+            if '.' in x or 'e' in x or 'E' in x:
+                return float(x)
+            return int(x)
+        except Exception:
+            return 0
+    try:
+        return float(x)
+    except Exception:
+        return 0
+
+
+# helper: numeric view used by ordering comparisons; None when not numeric
+def try_numeric(x):
+    if isinstance(x, (int, float)):
+        return float(x)
+    if x is None:
+        return None
+    if isinstance(x, str):
+        try:
+            if '.' in x or 'e' in x or 'E' in x:
+                return float(x)
+            return float(int(x))
+        except Exception:
+            return None
+    try:
+        return float(x)
+    except Exception:
+        return None
+
 
 class TemplateEvaluator:
     def __init__(self, context=None, functions=None):
@@ -38,24 +78,6 @@ class TemplateEvaluator:
         if nodename == "BinaryOpNode":
             left = self.evaluate(node.left)
             right = self.evaluate(node.right)
-            # helper: coerce to numeric when needed
-            def coerce_numeric(x):
-                if x is None:
-                    return 0
-                if isinstance(x, (int, float)):
-                    return x
-                if isinstance(x, str):
-                    try:
-                        if '.' in x or 'e' in x or 'E' in x:
-                            return float(x)
-                        return int(x)
-                    except Exception:
-                        return 0
-                try:
-                    return float(x)
-                except Exception:
-                    return 0
-
             if node.op == "+":
                 # if either is string, perform concatenation (keep original semantics)
                 if isinstance(left, str) or isinstance(right, str):
@@ -79,23 +101,6 @@ class TemplateEvaluator:
                     return left != right
 
                 # for ordering comparisons, try numeric comparison first
-                def try_numeric(x):
-                    if isinstance(x, (int, float)):
-                        return float(x)
-                    if x is None:
-                        return None
-                    if isinstance(x, str):
-                        try:
-                            if '.' in x or 'e' in x or 'E' in x:
-                                return float(x)
-                            return float(int(x))
-                        except Exception:
-                            return None
-                    try:
-                        return float(x)
-                    except Exception:
-                        return None
-
                 nx = try_numeric(left)
                 ny = try_numeric(right)
                 if nx is not None and ny is not None:
@@ -139,7 +144,7 @@ class TemplateEvaluator:
 
         if nodename == "ArrayLiteralNode":
             # elements có thể là literals hoặc nodes
-            return [self.evaluate(e) for e in node.elements]
+            return [materialize(self.evaluate(e)) for e in node.elements]
 
         # fallback
         raise ValueError(f"Unknown node type: {nodename}")
@@ -151,6 +156,9 @@ class TemplateEvaluator:
         # special-case: accessing the _set namespace: '$_set.total_members'
         if node.name == "_set":
             value = self.context.get("_set", {})
+            if isinstance(value, SetView):
+                # layered scopes expose a view; expressions always see a plain dict
+                value = value.copy()
         else:
             # prefer direct context key (e.g. $name), then fallback to _set namespace (e.g. $total_members)
             if node.name in self.context:
@@ -182,13 +190,14 @@ class TemplateEvaluator:
             raise NameError(f"Function '{node.name}' is not defined")
 
         # args có thể là nodes hoặc literals
-        args = [self.evaluate(a) for a in node.args]
+        args = [materialize(self.evaluate(a)) for a in node.args]
 
         # gọi hàm, bọc try để hiện thông báo rõ ràng
         try:
             result = fn(*args)
         except Exception as e:
             raise RuntimeError(f"Error calling function {node.name} with args {args}: {e}")
+        result = materialize(result)
 
         # áp dụng accessors nếu có (ví dụ $f(...).prop or $f(...)[0])
         for acc_type, acc_val in node.accessors:
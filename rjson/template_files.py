@@ -0,0 +1,236 @@
+"""Template files: the on-disk cache of compiled templates and the in-memory registry.
+
+`compile_file(path)` loads a YAML or JSON template file and compiles it.
+With `cache_dir=`, the compiled template is also pickled into that directory,
+keyed by a hash of the file contents, the rjson version and the Python
+version; another process loading the same contents unpickles it instead of
+parsing YAML and expressions again. Compiled closures are not stored (they
+are rebuilt on first use).
+
+Entries are written to a temporary file and renamed into place, so
+concurrent writers never expose a partial entry and the last one wins.
+Entries that cannot be read, are corrupt or were written for another key are
+rebuilt and overwritten. Entries are pickles: only point `cache_dir` at a
+directory you trust.
+
+`TemplateRegistry` keeps compiled templates in memory by path, reloading a
+file only when its mtime or size changed.
+
+YAML is parsed with libyaml's `CSafeLoader` when PyYAML was built with it.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+
+from .template_cache import LRUCache
+from .template_compiler import CompiledTemplate, compile_template
+
+# bump when the layout of compiled nodes changes
+FORMAT = 4
+_MAGIC = b"rjson-compiled\n"
+
+_version = None
+
+
+def rjson_version():
+    global _version
+    if _version is None:
+        from importlib import metadata
+        try:
+            _version = metadata.version("rjson")
+        except metadata.PackageNotFoundError:
+            _version = "unknown"
+    return _version
+
+
+def is_json_path(path):
+    return os.path.splitext(os.fspath(path))[1].lower() == ".json"
+
+
+def parse_file_data(data, json_=False):
+    """Parse the bytes of a template file: JSON if `json_`, otherwise YAML."""
+    text = data.decode("utf-8")
+    if json_:
+        import json
+        return json.loads(text)
+    import yaml
+    return yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+class DiskCache:
+    """Directory of pickled CompiledTemplates keyed by content hash."""
+
+    def __init__(self, directory):
+        self.directory = os.fspath(directory)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def key(self, data, kind=""):
+        h = hashlib.sha256()
+        for part in (str(FORMAT), rjson_version(), sys.implementation.cache_tag or "", kind):
+            h.update(part.encode())
+            h.update(b"\0")
+        h.update(data)
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".rjc")
+
+    def get(self, key):
+        """Return the CompiledTemplate stored under `key`, or None (dropping a bad entry)."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self._count("misses")
+            return None
+        try:
+            if not data.startswith(_MAGIC):
+                raise ValueError("not a compiled template")
+            stored_key, compiled = pickle.loads(data[len(_MAGIC):])
+            if stored_key != key or not isinstance(compiled, CompiledTemplate):
+                raise ValueError("entry written for another key")
+        except Exception:
+            self._count("rebuilds")
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        self._count("hits")
+        return compiled
+
+    def put(self, key, compiled):
+        """Store `compiled` atomically; an unwritable directory just means no caching."""
+        path = self.path(key)
+        payload = _MAGIC + pickle.dumps((key, compiled), pickle.HIGHEST_PROTOCOL)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            return False
+        return True
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "rebuilds": self.rebuilds}
+
+
+_disk_caches = {}
+_disk_caches_lock = threading.Lock()
+
+
+def disk_cache(directory):
+    """The DiskCache for `directory` (one instance per directory, so stats add up)."""
+    if isinstance(directory, DiskCache):
+        return directory
+    directory = os.path.abspath(os.fspath(directory))
+    with _disk_caches_lock:
+        cache = _disk_caches.get(directory)
+        if cache is None:
+            cache = _disk_caches[directory] = DiskCache(directory)
+        return cache
+
+
+def compile_data(data, json_=False, cache_dir=None, expression_cache=None):
+    """Compile the bytes of a template file, through the disk cache if `cache_dir` is given."""
+    if cache_dir is None:
+        return compile_template(parse_file_data(data, json_), expression_cache)
+    cache = disk_cache(cache_dir)
+    key = cache.key(data, "json" if json_ else "yaml")
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_template(parse_file_data(data, json_), expression_cache)
+        cache.put(key, compiled)
+    return compiled
+
+
+def compile_file(path, cache_dir=None, expression_cache=None):
+    """Load a YAML or JSON template file (JSON if the extension is .json) and compile it.
+
+    With `cache_dir` (a directory path or a DiskCache) the compiled template
+    is looked up there first and stored there after compiling.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return compile_data(data, is_json_path(path), cache_dir, expression_cache)
+
+
+class TemplateRegistry:
+    """Compiled templates by file path, loaded once and reloaded when the file changes.
+
+    `get(path)` stats the file and returns the cached CompiledTemplate while
+    its mtime and size are unchanged; otherwise the file is read and compiled
+    again (through `cache_dir` if given). With `check_interval` seconds, a
+    path is stat-ed at most that often, so repeated lookups do no I/O at all.
+    At most `maxsize` templates are kept (least recently used are evicted).
+    """
+
+    def __init__(self, maxsize=128, cache_dir=None, expression_cache=None, check_interval=0.0,
+                 timer=time.monotonic):
+        self.cache_dir = cache_dir
+        self.expression_cache = expression_cache
+        self.check_interval = check_interval
+        self._timer = timer
+        self._templates = LRUCache(maxsize)  # abs path -> [signature, compiled, checked at]
+        self.reloads = 0
+
+    def get(self, path):
+        path = os.path.abspath(os.fspath(path))
+        entry = self._templates.get(path)
+        if entry is not None and self.check_interval and self._timer() - entry[2] < self.check_interval:
+            return entry[1]
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        if entry is not None and entry[0] == signature:
+            entry[2] = self._timer()
+            return entry[1]
+        with open(path, "rb") as f:
+            data = f.read()
+        compiled = compile_data(data, is_json_path(path), self.cache_dir, self.expression_cache)
+        if entry is not None:
+            self.reloads += 1
+        self._templates.put(path, [signature, compiled, self._timer()])
+        return compiled
+
+    def render(self, path, context=None, functions=None):
+        return self.get(path).render(context, functions)
+
+    def invalidate(self, path=None):
+        """Forget one path (or every path) so it is reloaded on the next `get`."""
+        if path is None:
+            self._templates.clear()
+        else:
+            self._templates.pop(os.path.abspath(os.fspath(path)), None)
+
+    def resize(self, maxsize):
+        self._templates.resize(maxsize)
+
+    def __len__(self):
+        return len(self._templates)
+
+    def __contains__(self, path):
+        return os.path.abspath(os.fspath(path)) in self._templates
+
+    def stats(self):
+        stats = self._templates.stats()
+        stats["reloads"] = self.reloads
+        return stats
@@ -0,0 +1,287 @@
+"""Lazy rendering: output proxies whose values render on first access.
+
+`TemplateRuntime.render_lazy` returns a `LazyDict` (or `LazyList`) instead
+of the rendered value. Creating a LazyDict renders only the entries whose
+results later siblings can observe: `_set.` entries, and keys whose value or
+`_set` writes a later sibling reads (see `template_analysis`). Every other
+key is deferred: the variables its expressions read are captured as they
+are at its position, and it is rendered against them when first accessed,
+then cached. A deferred nested dict is itself a LazyDict.
+
+Lists (plain lists and `_repeat` lists) are `LazyList`s that render their
+items in order, up to the highest index accessed, since items may observe
+the items before them; `len()` renders the whole list.
+
+`materialize()` turns a proxy into plain dicts and lists equal to what
+`render` returns. Errors are raised when the failing value is accessed,
+with the same path as `render`.
+"""
+from collections.abc import Mapping, Sequence
+
+from .template_analysis import referenced_names, assigned_names
+from .template_compiler import DictNode, ListNode, RepeatNode, KEY, SET, REPEAT, copy_static
+from .template_errors import located, wrap
+from .template_scope import Scope
+
+_MISSING = object()
+
+
+def _plan(node, plans):
+    """For each entry of DictNode `node`, True if no later sibling can observe what it writes.
+
+    `plans` caches the result by node for one `render_lazy` call.
+    """
+    plan = plans.get(id(node))
+    if plan is not None:
+        return plan
+    entries = node.entries
+    reads = [frozenset(referenced_names(entry.node)) for entry in entries]
+    result = []
+    for i, entry in enumerate(entries):
+        if entry.kind != KEY and entry.kind != REPEAT:
+            result.append(False)
+            continue
+        sets = set(assigned_names(entry.node))
+        if entry.kind == REPEAT:
+            # visible `_repeat` lists are mirrored into `_set`
+            sets.add(entry.name)
+        writes = sets | {entry.name}
+        result.append(not any(
+            not later.isdisjoint(writes) or ("_set" in later and sets)
+            for later in reads[i + 1:]))
+    plans[id(node)] = result = tuple(result)
+    return result
+
+
+def lazy_value(rt, node, path=(), plans=None):
+    """Render compiled `node` with runtime `rt`, as a proxy for dicts and lists."""
+    if node.static:
+        return copy_static(node.value)
+    if plans is None:
+        plans = {}
+    if isinstance(node, DictNode):
+        return LazyDict(rt, node, path, plans)
+    if isinstance(node, RepeatNode):
+        return LazyList(rt._iter_repeat(node), node, path)
+    if isinstance(node, ListNode):
+        return LazyList(_iter_list(rt, node), node, path, len(node.items))
+    return rt.render_node(node)
+
+
+def _iter_list(rt, node):
+    # same steps as TemplateRuntime._render_list, one item at a time
+    base = rt.context
+    for i, item in enumerate(node.items):
+        prev = rt.context
+        if item.static:
+            rt._apply_static(item.value)
+        try:
+            value = rt.render_node(item)
+        except Exception as e:
+            raise located(e, i, item)
+        rt._collapse(base, prev)
+        yield value
+
+
+def _locate(error, path):
+    for segment in reversed(path):
+        error = located(error, segment)
+    return error
+
+
+def materialize_lazy(value):
+    """Plain dicts and lists for a value that may contain lazy proxies."""
+    if isinstance(value, (LazyDict, LazyList)):
+        return value.materialize()
+    return value
+
+
+class _Deferred:
+    """A deferred entry: the scope it renders against and, once rendered, its value."""
+    __slots__ = ("entry", "scope", "value")
+
+    def __init__(self, entry, scope):
+        self.entry = entry
+        self.scope = scope
+        self.value = _MISSING
+
+
+class LazyDict(Mapping):
+    """Read-only mapping of a rendered dict whose deferred keys render on first access."""
+
+    def __init__(self, rt, node, path=(), plans=None):
+        self._rt = rt
+        self._path = path
+        self._plans = {} if plans is None else plans
+        self._values = {}       # key -> rendered value or _Deferred
+        self._error = None      # error of the first eager entry that failed
+        self._keys = [entry.key for entry in node.entries if entry.kind == KEY or entry.kind == REPEAT]
+        self._render_eager(node)
+
+    def _render_eager(self, node):
+        rt = self._rt
+        local_ctx = rt.context.child()
+        plan = _plan(node, self._plans)
+        for i, entry in enumerate(node.entries):
+            kind = entry.kind
+            if plan[i] and (kind == KEY or not local_ctx.has_sets()):
+                # a repeat merges `_set` only if it runs at least once, so it is not skipped while any are visible
+                self._values[entry.key] = _Deferred(entry, _capture(local_ctx, entry.node))
+                rt._merge_set(local_ctx, local_ctx)
+                continue
+            try:
+                if kind == KEY or kind == SET:
+                    value = rt._render_entry_value(local_ctx, entry)
+                    local_ctx[entry.name] = value
+                    if kind == SET:
+                        local_ctx.set_entry(entry.name, value)
+                    else:
+                        self._values[entry.key] = value
+                elif kind == REPEAT:
+                    items = rt._render_repeat_entry(local_ctx, entry.node, entry.key)
+                    self._values[entry.key] = items
+                    local_ctx[entry.key] = items
+                    rt._mirror_repeat(local_ctx, entry.key, items)
+                else:
+                    rt._render_hidden_entry(local_ctx, entry)
+            except Exception as e:
+                # keys before this one can still be read; later ones raise this error
+                self._error = _locate(wrap(located(e, entry.key, entry.node), node), self._path)
+                break
+        rt.context = local_ctx
+
+    def _resolve(self, key, item):
+        entry = item.entry
+        rt = self._rt._spawn(item.scope)
+        path = self._path + (entry.key,)
+        try:
+            if entry.kind == REPEAT:
+                value = LazyList(rt._iter_repeat_entry(item.scope, entry.node, entry.key, []), entry.node, path)
+            elif isinstance(entry.node, (DictNode, ListNode)):
+                value = lazy_value(rt, entry.node, path, self._plans)
+            else:
+                value = rt.render_node(entry.node)
+        except Exception as e:
+            raise _locate(located(e, entry.key, entry.node), self._path)
+        item.value = value
+        item.scope = None
+        return value
+
+    def __getitem__(self, key):
+        try:
+            value = self._values[key]
+        except KeyError:
+            if self._error is not None and key in self._keys:
+                raise self._error
+            raise
+        if type(value) is _Deferred:
+            if value.value is _MISSING:
+                return self._resolve(key, value)
+            return value.value
+        return value
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._values or (self._error is not None and key in self._keys)
+
+    def materialize(self):
+        """The rendered dict, with every key rendered (equal to what `render` returns)."""
+        result = {}
+        for key in self._keys:
+            result[key] = materialize_lazy(self[key])
+        if self._error is not None:
+            # an entry after the last visible key failed
+            raise self._error
+        return result
+
+    def __repr__(self):
+        shown = []
+        for key, value in self._values.items():
+            if type(value) is _Deferred:
+                value = value.value
+            shown.append(f"{key!r}: ..." if value is _MISSING else f"{key!r}: {value!r}")
+        shown = ", ".join(shown)
+        return f"LazyDict({{{shown}}})"
+
+
+class LazyList(Sequence):
+    """Read-only sequence of rendered items, rendered in order up to the highest index accessed."""
+
+    def __init__(self, items, node, path=(), length=None):
+        self._source = iter(items)
+        self._items = []
+        self._node = node
+        self._path = path
+        self._length = length
+        self._error = None
+
+    def _fill(self, n=None):
+        """Render items until there are `n` (None: all of them)."""
+        source = self._source
+        if source is None:
+            if self._error is not None:
+                raise self._error
+            return
+        items = self._items
+        try:
+            while n is None or len(items) < n:
+                try:
+                    items.append(next(source))
+                except StopIteration:
+                    self._source = None
+                    self._length = len(items)
+                    return
+        except Exception as e:
+            # the render stopped here; later reads past this item raise the same error
+            self._source = None
+            self._error = _locate(wrap(e, self._node), self._path)
+            raise self._error
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) or index < 0:
+            self._fill()
+        else:
+            self._fill(index + 1)
+        return self._items[index]
+
+    def __len__(self):
+        if self._length is None:
+            self._fill()
+        return self._length
+
+    def __iter__(self):
+        i = 0
+        while True:
+            self._fill(i + 1)
+            if i >= len(self._items):
+                return
+            yield self._items[i]
+            i += 1
+
+    def materialize(self):
+        """The rendered list, with every item rendered."""
+        self._fill()
+        return [materialize_lazy(item) for item in self._items]
+
+    def __repr__(self):
+        more = ", ..." if self._source is not None else ""
+        return f"LazyList({self._items!r}{more})"
+
+
+def _capture(local_ctx, node):
+    """A standalone scope holding what `node`'s expressions can read from `local_ctx` right now."""
+    scope = Scope()
+    values = scope.vars
+    for name in referenced_names(node):
+        if name != "_set":
+            value = local_ctx.get(name, _MISSING)
+            if value is not _MISSING:
+                values[name] = value
+    if local_ctx.has_sets():
+        scope.sets = local_ctx.set_items()
+    return scope
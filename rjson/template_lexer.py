@@ -28,16 +28,110 @@ class TokenType(Enum):
     COLON = auto()
 
 
-class Token:
-    def __init__(self, type_, value=None, pos=None):
-        self.type = type_
-        self.value = value
-        self.pos = pos
-
-    def __repr__(self):
-        if self.value is None:
-            return f"Token({self.type.name})"
-        return f"Token({self.type.name}, {self.value!r})"
+# Tokens are plain `(type, value, pos)` tuples; the parser reads them by index.
+Token = tuple
+
+
+def token_repr(token):
+    """Readable form of a token tuple, as used in parser error messages."""
+    type_, value = token[0], token[1]
+    if value is None:
+        return f"Token({type_.name})"
+    return f"Token({type_.name}, {value!r})"
+
+
+# Characters for which str.isdigit() is true but `\d` (str.isdecimal()) is not:
+# superscripts, circled digits, ... (Unicode Numeric_Type=Digit). They start
+# NUMBER tokens and cannot start identifiers.
+_OTHER_DIGITS = (
+    "²³¹፩-፱᧚⁰⁴-⁹₀-₉"
+    "①-⑨⑴-⑼⒈-⒐⓪⓵-⓽⓿"
+    "❶-❾➀-➈➊-➒\U00010a40-\U00010a43"
+    "\U00010e60-\U00010e68\U00011052-\U0001105a\U0001f100-\U0001f10a"
+)
+
+# The template is scanned with a single `findall`: every match is one token,
+# identifiers, operators, numbers and `$`/`.` taking the whitespace after
+# them along. The text before the first `$` is plain text; after that every
+# position is either inside an expression or at the first character that
+# cannot continue one, from where the text runs up to the next `$` -- the
+# same place the original character-by-character scanner stopped. `\w`
+# matches exactly the characters for which str.isalnum() is true, plus "_".
+_PATTERN = r"""
+      (?: [^\W\d{other}][\w$]*                  # IDENTIFIER
+        | [()\[\],+\-*/?:] | [<>=!]=?           # operators and punctuation
+        | [$.][\w$]*                            # DOLLAR / DOT, with the identifier after it
+        | [\d{other}][\d{other}.eE+\-]*         # NUMBER
+      ) [ \t\n\r]*
+    | "[^"\\]*(?:\\[\s\S][^"\\]*)*\\?"?         # "quoted" (to the end if unterminated)
+    | '[^'\\]*(?:\\[\s\S][^'\\]*)*\\?'?         # 'quoted'
+    | [ \t\n\r]+                                # whitespace after a quoted string
+    | [^$]+                                     # text after an expression
+""".format(other=_OTHER_DIGITS)
+_scan = re.compile(_PATTERN, re.VERBOSE).findall
+
+_OPERATORS = {
+    "(": TokenType.LPAREN, ")": TokenType.RPAREN,
+    "[": TokenType.LBRACKET, "]": TokenType.RBRACKET,
+    ",": TokenType.COMMA,
+    "+": TokenType.PLUS, "-": TokenType.MINUS,
+    "*": TokenType.STAR, "/": TokenType.SLASH,
+    ">": TokenType.GT, "<": TokenType.LT, ">=": TokenType.GE, "<=": TokenType.LE,
+    # single '=' is unexpected in expressions but has always lexed as EQ
+    "==": TokenType.EQ, "=": TokenType.EQ, "!=": TokenType.NE,
+    # stray '!' — treat as identifier-like token
+    "!": TokenType.IDENTIFIER,
+    "?": TokenType.QUESTION, ":": TokenType.COLON,
+}
+
+# Token types bound once: looking up an Enum member is slow in the scan loop.
+_STRING = TokenType.STRING
+_IDENTIFIER = TokenType.IDENTIFIER
+_NUMBER = TokenType.NUMBER
+_DOLLAR = TokenType.DOLLAR
+_DOT = TokenType.DOT
+_EOF = TokenType.EOF
+
+# kind of a scanned token, by its first character: its type, or one of these
+_OP, _QUOTED, _SPACE = range(3)
+
+
+class _Kinds(dict):
+    def __missing__(self, ch):
+        # non-ASCII: letters and digits of other scripts, or text
+        if ch.isdigit():
+            return _NUMBER
+        if ch.isalnum():
+            return _IDENTIFIER
+        return _STRING
+
+
+_KINDS = _Kinds({"$": _DOLLAR, ".": _DOT, '"': _QUOTED, "'": _QUOTED, "_": _IDENTIFIER})
+_KINDS.update(dict.fromkeys(" \t\n\r", _SPACE))
+_KINDS.update(dict.fromkeys("()[],+-*/?:<>=!", _OP))
+_KINDS.update(dict.fromkeys("0123456789", _NUMBER))
+_KINDS.update(dict.fromkeys("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ", _IDENTIFIER))
+_KINDS.update((chr(c), _STRING) for c in range(128) if chr(c) not in _KINDS)
+
+_quoted_body = {
+    q: re.compile(rf"{q}((?:[^{q}\\]|\\[\s\S])*\\?){q}?\Z").match for q in "\"'"
+}
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "n": "\n", "": "\\"}
+_escape = re.compile(r"\\([\s\S]?)")
+
+
+def _unescape_match(m):
+    c = m.group(1)
+    return _ESCAPES.get(c) or "\\" + c
+
+
+def _quoted_value(tok):
+    """Value of a scanned quoted-string token (escapes resolved)."""
+    if "\\" not in tok:
+        if len(tok) > 1 and tok[-1] == tok[0]:
+            return tok[1:-1]
+        return tok[1:]
+    return _escape.sub(_unescape_match, _quoted_body[tok[0]](tok).group(1))
 
 
 class TemplateLexer:
@@ -46,186 +140,64 @@ class TemplateLexer:
         self.pos = 0
         self.len = len(text)
 
-    def peek(self, offset=0):
-        i = self.pos + offset
-        if i >= self.len:
-            return None
-        return self.text[i]
-
-    def next_char(self):
-        if self.pos >= self.len:
-            return None
-        ch = self.text[self.pos]
-        self.pos += 1
-        return ch
-
     def eof(self):
         return self.pos >= self.len
 
-    def read_identifier(self):
-        start = self.pos
-        while self.peek() and (self.peek().isalnum() or self.peek() in "_$"):
-            self.pos += 1
-        return self.text[start:self.pos]
-
-    def read_number(self):
-        start = self.pos
-        while self.peek() and (self.peek().isdigit() or self.peek() in ".eE-+"):
-            self.pos += 1
-        return self.text[start:self.pos]
-
-    def read_quoted_string(self):
-        quote = self.next_char()
-        result = []
-        while not self.eof():
-            ch = self.next_char()
-            if ch == "\\":
-                nxt = self.next_char()
-                if nxt in ('"', "'", "\\"):
-                    result.append(nxt)
-                elif nxt == "n":
-                    result.append("\n")
-                else:
-                    result.append("\\" + (nxt or ""))
-            elif ch == quote:
-                break
-            else:
-                result.append(ch)
-        return "".join(result)
-
-    def read_text_until_dollar(self):
-        start = self.pos
-        while not self.eof() and self.peek() != "$":
-            self.pos += 1
-        return self.text[start:self.pos]
-
     def tokenize(self):
-        tokens = []
-
-        while not self.eof():
-            ch = self.peek()
-
-            # ========== CASE 1: Expression ==========
-            if ch == "$":
-                self.next_char()
-                tokens.append(Token(TokenType.DOLLAR, "$", self.pos - 1))
-
-                ident = self.read_identifier()
-                if ident:
-                    tokens.append(Token(TokenType.IDENTIFIER, ident, self.pos - len(ident)))
-
-                while not self.eof():
-                    nxt = self.peek()
-                    if nxt in ' \t\n\r':
-                        self.next_char()
-                        continue
-                    if nxt == ".":
-                        tokens.append(Token(TokenType.DOT, ".", self.pos))
-                        self.next_char()
-                        sub = self.read_identifier()
-                        if sub:
-                            tokens.append(Token(TokenType.IDENTIFIER, sub, self.pos - len(sub)))
-                    elif nxt == "(":
-                        tokens.append(Token(TokenType.LPAREN, "(", self.pos))
-                        self.next_char()
-                    elif nxt == ")":
-                        tokens.append(Token(TokenType.RPAREN, ")", self.pos))
-                        self.next_char()
-                    elif nxt == "[":
-                        tokens.append(Token(TokenType.LBRACKET, "[", self.pos))
-                        self.next_char()
-                    elif nxt == "]":
-                        tokens.append(Token(TokenType.RBRACKET, "]", self.pos))
-                        self.next_char()
-                    elif nxt == ",":
-                        tokens.append(Token(TokenType.COMMA, ",", self.pos))
-                        self.next_char()
-                    elif nxt == "+":
-                        tokens.append(Token(TokenType.PLUS, "+", self.pos))
-                        self.next_char()
-                    elif nxt == "-":
-                        tokens.append(Token(TokenType.MINUS, "-", self.pos))
-                        self.next_char()
-                    elif nxt == "*":
-                        tokens.append(Token(TokenType.STAR, "*", self.pos))
-                        self.next_char()
-                    elif nxt == "/":
-                        tokens.append(Token(TokenType.SLASH, "/", self.pos))
-                        self.next_char()
-                    elif nxt == ">":
-                        # >= or >
-                        self.next_char()
-                        if self.peek() == "=":
-                            self.next_char()
-                            tokens.append(Token(TokenType.GE, ">=", self.pos - 2))
-                        else:
-                            tokens.append(Token(TokenType.GT, ">", self.pos - 1))
-                    elif nxt == "<":
-                        # <= or <
-                        self.next_char()
-                        if self.peek() == "=":
-                            self.next_char()
-                            tokens.append(Token(TokenType.LE, "<=", self.pos - 2))
-                        else:
-                            tokens.append(Token(TokenType.LT, "<", self.pos - 1))
-                    elif nxt == "=":
-                        # ==
-                        self.next_char()
-                        if self.peek() == "=":
-                            self.next_char()
-                            tokens.append(Token(TokenType.EQ, "==", self.pos - 2))
-                        else:
-                            # single '=' is unexpected in expressions; treat as identifier or skip
-                            tokens.append(Token(TokenType.EQ, "=", self.pos - 1))
-                    elif nxt == "!":
-                        # !=
-                        self.next_char()
-                        if self.peek() == "=":
-                            self.next_char()
-                            tokens.append(Token(TokenType.NE, "!=", self.pos - 2))
-                        else:
-                            # stray '!' — treat as identifier-like token
-                            tokens.append(Token(TokenType.IDENTIFIER, "!", self.pos - 1))
-                    elif nxt == "?":
-                        tokens.append(Token(TokenType.QUESTION, "?", self.pos))
-                        self.next_char()
-                    elif nxt == ":":
-                        tokens.append(Token(TokenType.COLON, ":", self.pos))
-                        self.next_char()
-                    elif nxt == "$":
-                        tokens.append(Token(TokenType.DOLLAR, "$", self.pos))
-                        self.next_char()
-                        ident = self.read_identifier()
-                        if ident:
-                            tokens.append(Token(TokenType.IDENTIFIER, ident, self.pos - len(ident)))
-                        continue
-                    elif nxt.isdigit():
-                        num = self.read_number()
-                        tokens.append(Token(TokenType.NUMBER, num, self.pos))
-                    elif nxt in ('"', "'"):
-                        val = self.read_quoted_string()
-                        tokens.append(Token(TokenType.STRING, val, self.pos))
-                    elif nxt.isalnum() or nxt in "_":
-                        ident = self.read_identifier()
-                        tokens.append(Token(TokenType.IDENTIFIER, ident, self.pos - len(ident)))
-                    else:
-                        break
-
-                # 👉 đọc text ngay sau biểu thức (vd: "Hello $user.name!")
-                if not self.eof() and self.peek() == '$':
-                    pass
-                else:
-                    text_after = self.read_text_until_dollar()
-                    if text_after:
-                        tokens.append(Token(TokenType.STRING, text_after, self.pos - len(text_after)))
-
-            # ========== CASE 2: Plain text ==========
-            else:
-                text_segment = self.read_text_until_dollar()
-                if text_segment:
-                    tokens.append(Token(TokenType.STRING, text_segment, self.pos - len(text_segment)))
-
-        tokens.append(Token(TokenType.EOF, None, self.pos))
+        """Return the tokens of the template as `(type, value, pos)` tuples, ending with EOF.
+
+        NUMBER and quoted STRING tokens carry the position just *after* the
+        literal; every other token its start.
+        """
+        text = self.text
+        pos = self.pos
+        STRING = _STRING
+
+        # ========== Plain text before the first expression ==========
+        start = text.find("$", pos)
+        if start < 0:
+            tokens = [(STRING, text[pos:], pos)] if pos < self.len else []
+            self.pos = self.len
+            tokens.append((_EOF, None, self.len))
+            return tokens
+        tokens = [(STRING, text[pos:start], pos)] if start > pos else []
+        append = tokens.append
+
+        # ========== Expressions and the text after each of them ==========
+        IDENTIFIER = _IDENTIFIER
+        NUMBER = _NUMBER
+        DOLLAR = _DOLLAR
+        DOT = _DOT
+        OP = _OP
+        QUOTED = _QUOTED
+        kinds = _KINDS
+        operators = _OPERATORS
+        pos = start
+        for part in _scan(text, start):
+            # identifiers, operators, numbers and `$`/`.` end with the whitespace after them
+            kind = kinds[part[0]]
+            if kind is IDENTIFIER:
+                append((IDENTIFIER, part.rstrip(), pos))
+            elif kind is OP:
+                tok = part.rstrip()
+                append((operators[tok], tok, pos))
+            elif kind is DOLLAR or kind is DOT:
+                tok = part.rstrip()
+                append((kind, tok[0], pos))
+                if len(tok) > 1:
+                    append((IDENTIFIER, tok[1:], pos + 1))
+            elif kind is NUMBER:
+                tok = part.rstrip()
+                append((NUMBER, tok, pos + len(tok)))
+            elif kind is QUOTED:
+                append((STRING, _quoted_value(part), pos + len(part)))
+            elif kind is STRING:
+                # 👉 text ngay sau biểu thức (vd: "Hello $user.name!")
+                append((STRING, part, pos))
+            pos += len(part)
+
+        self.pos = self.len
+        append((_EOF, None, self.len))
         return tokens
 
 
@@ -0,0 +1,119 @@
+"""Constant folding over parsed expressions.
+
+`fold_constants` runs between `TemplateParser.parse_template()` and
+evaluation. Every operator whose operands are literals is evaluated once with
+the reference `TemplateEvaluator`, so coercion (`coerce_numeric`, string
+concatenation on `+`, ordering fallbacks) is exactly what a render would do;
+operations that raise are left in place so the error still surfaces when the
+expression renders. Ternaries with a literal condition are replaced by the
+branch they select, `ExpressionNode` wrappers and single-part `TemplateNode`s
+are dropped, and adjacent constant parts of a template string are merged. A
+string whose expression folds completely becomes a plain literal.
+"""
+from .template_evaluator import TemplateEvaluator
+from .template_parser import (
+    TemplateNode, TextNode, ExpressionNode, VariableNode, FunctionCallNode,
+    ArrayLiteralNode, BinaryOpNode, TernaryOpNode,
+)
+
+_reference = TemplateEvaluator()
+
+
+def is_constant(node):
+    """True if an AST node is a literal value (int, float, bool or str)."""
+    return isinstance(node, (int, float, str))
+
+
+def _foldable(value):
+    # NaN never equals itself: keep it out of the (structurally compared) AST
+    return is_constant(value) and value == value
+
+
+def fold_constants(ast):
+    """Return `ast` with its constant subexpressions evaluated ahead of time."""
+    folder = _FOLDERS.get(type(ast))
+    if folder is None:
+        return ast
+    return folder(ast)
+
+
+def _fold_template(node):
+    parts = [fold_constants(p) for p in node.parts]
+    if not parts:
+        return ""
+    if len(parts) == 1:
+        # a single part renders as its own value, not as a string
+        return parts[0]
+    merged = []
+    text = None
+    for part in parts:
+        if is_constant(part):
+            text = str(part) if text is None else text + str(part)
+            continue
+        if text is not None:
+            merged.append(TextNode(text))
+            text = None
+        merged.append(part)
+    if not merged:
+        return text
+    if text is not None:
+        merged.append(TextNode(text))
+    return TemplateNode(merged)
+
+
+def _fold_text(node):
+    return node.value
+
+
+def _fold_expression(node):
+    return fold_constants(node.expr)
+
+
+def _fold_binary(node):
+    left = fold_constants(node.left)
+    right = fold_constants(node.right)
+    folded = BinaryOpNode(left, node.op, right)
+    if is_constant(left) and is_constant(right):
+        try:
+            value = _reference.evaluate(folded)
+        except Exception:
+            return folded
+        if _foldable(value):
+            return value
+    return folded
+
+
+def _fold_ternary(node):
+    condition = fold_constants(node.condition)
+    if is_constant(condition):
+        return fold_constants(node.true_expr if condition else node.false_expr)
+    return TernaryOpNode(condition, fold_constants(node.true_expr), fold_constants(node.false_expr))
+
+
+def _fold_accessors(accessors):
+    return [(kind, fold_constants(val)) if kind == "index" else (kind, val) for kind, val in accessors]
+
+
+def _fold_variable(node):
+    return VariableNode(node.name, _fold_accessors(node.accessors))
+
+
+def _fold_call(node):
+    return FunctionCallNode(node.name, [fold_constants(a) for a in node.args], _fold_accessors(node.accessors))
+
+
+def _fold_array(node):
+    # a fresh list is built on every evaluation, so the node itself stays
+    return ArrayLiteralNode([fold_constants(e) for e in node.elements])
+
+
+_FOLDERS = {
+    TemplateNode: _fold_template,
+    TextNode: _fold_text,
+    ExpressionNode: _fold_expression,
+    BinaryOpNode: _fold_binary,
+    TernaryOpNode: _fold_ternary,
+    VariableNode: _fold_variable,
+    FunctionCallNode: _fold_call,
+    ArrayLiteralNode: _fold_array,
+}
@@ -0,0 +1,127 @@
+"""Process-pool rendering of independent `_repeat` iterations.
+
+A `_repeat` body whose expressions never read the list being built, `$_set`,
+or any `_set` name written by the body (or already visible) renders the same
+no matter in which order its iterations run. Such repeats can be split into
+chunks of iterations rendered by forked worker processes; results are
+consumed in iteration order and the `_set` entries each iteration wrote are
+merged back exactly as the sequential path would.
+
+Repeats are only split up on their own when every function the body calls
+is marked pure (`@cacheable` or an addon's `pure_functions`): a forked
+worker inherits the parent's random state and addon state, and its side
+effects are not seen by the parent. `_repeat_parallel: true` asserts the
+iterations are independent and skips both checks.
+
+Workers are forked so the runtime, its functions and the context are
+inherited rather than pickled; only rendered items travel back.
+"""
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .helpers import is_pure
+from .template_analysis import repeat_analysis
+from .template_stats import InstrumentedFunctions
+
+# iterations below which a pool is not worth starting without an explicit `_repeat_parallel` hint
+DEFAULT_THRESHOLD = 1000
+
+# (runtime, body, local_ctx, count) of the repeat being rendered; set in forked workers only
+_job = None
+
+
+def can_fork():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def iterations_independent(node, name, local_ctx, functions):
+    """True if the iterations of RepeatNode `node` cannot observe each other.
+
+    `name` is the key the items are stored under (None for a repeat rendered
+    on its own); `local_ctx` is the scope the iterations render against and
+    `functions` the function mapping they call into.
+    """
+    reads, writes, calls = repeat_analysis(node)
+    if "_set" in reads or (name is not None and name in reads):
+        return False
+    if not reads.isdisjoint(writes):
+        return False
+    # visible `_set` entries are mirrored into plain variables after every iteration
+    if local_ctx.has_sets() and not reads.isdisjoint(local_ctx.set_items()):
+        return False
+    if isinstance(functions, InstrumentedFunctions):
+        # the wrappers are plain functions; check what they wrap
+        functions = functions.functions
+    for fn_name in calls:
+        fn = functions.get(fn_name)
+        if fn is None or not is_pure(fn):
+            return False
+    return True
+
+
+def render_iteration(runtime, body, local_ctx, index, count):
+    """Render one iteration; return (item, `_set` entries it wrote or None)."""
+    written = local_ctx.child()
+    loop_ctx = written.child()
+    loop_ctx["_index"] = index
+    loop_ctx["_repeat"] = count
+    sub_rt = runtime._spawn(loop_ctx)
+    item = sub_rt._render_dict(body)
+    written.absorb(sub_rt.context)
+    return item, written.sets
+
+
+def _init_worker(job):
+    global _job
+    runtime = job[0]
+    # no nested pools inside a worker
+    runtime.workers = 1
+    _job = job
+
+
+def _render_chunk(start, stop):
+    runtime, body, local_ctx, count = _job
+    return [render_iteration(runtime, body, local_ctx, i, count) for i in range(start, stop)]
+
+
+def iter_parallel(runtime, body, local_ctx, count, workers):
+    """Yield (item, written `_set` entries) for iterations 0..count-1, in order.
+
+    At most `2 * workers` chunks are in flight, so results are held only a
+    few chunks ahead of the consumer. A chunk whose worker failed is rendered
+    again in this process, so errors surface exactly as in the sequential path.
+    """
+    chunk = max(1, -(-count // (workers * 4)))
+    bounds = iter([(start, min(start + chunk, count)) for start in range(0, count, chunk)])
+    pool = ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker, initargs=((runtime, body, local_ctx, count),),
+    )
+    pending = deque()
+
+    def submit():
+        nxt = next(bounds, None)
+        if nxt is None:
+            return
+        try:
+            future = pool.submit(_render_chunk, *nxt)
+        except Exception:
+            future = None
+        pending.append((nxt, future))
+
+    try:
+        for _ in range(workers * 2):
+            submit()
+        while pending:
+            (start, stop), future = pending.popleft()
+            submit()
+            try:
+                if future is None:
+                    raise RuntimeError("chunk was not submitted")
+                results = future.result()
+            except Exception:
+                results = (render_iteration(runtime, body, local_ctx, i, count) for i in range(start, stop))
+            yield from results
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
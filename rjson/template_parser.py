@@ -1,51 +1,111 @@
-from .template_lexer import TemplateLexer, TokenType
+from sys import intern
+
+from .template_lexer import TemplateLexer, TokenType, token_repr
 
 # ===== AST Nodes =====
-class Node: pass
+# Nodes are slotted and frozen: attributes are only set by __init__ and
+# __setstate__ (through `_init`) and child sequences are tuples, so nodes
+# stay valid as cache keys. Identifier names are interned, so thousands of
+# cached expressions stay small. Nodes compare and hash by structure (literal
+# operands by type *and* value, so `1`, `1.0` and `True` differ) and pickle
+# as plain slot values.
+
+def _literal_key(value):
+    if isinstance(value, Node):
+        return value
+    if isinstance(value, tuple):
+        return tuple(_literal_key(v) for v in value)
+    return (type(value), value)
+
+
+_init = object.__setattr__
+
+
+class Node:
+    __slots__ = ()
+
+    def _key(self):
+        return tuple(_literal_key(getattr(self, name)) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash((type(self).__name__, self._key()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            _init(self, name, value)
+
+
+def _accessors(accessors):
+    # ('dot', name) / ('index', expr) pairs, frozen, with dot names interned
+    if not accessors:
+        return ()
+    return tuple((kind, intern(val)) if kind == 'dot' else (kind, val) for kind, val in accessors)
 
 class TextNode(Node):
-    def __init__(self, value): self.value = value
+    __slots__ = ("value",)
+    def __init__(self, value): _init(self, "value", value)
     def __repr__(self): return f"TextNode({self.value!r})"
 
 class VariableNode(Node):
+    __slots__ = ("name", "accessors")
     def __init__(self, name, accessors=None):
-        self.name = name
-        self.accessors = accessors or []  # list of ('dot', name) or ('index', expr)
-    def __repr__(self): return f"VariableNode({self.name!r}, accessors={self.accessors})"
+        _init(self, "name", intern(name))
+        _init(self, "accessors", _accessors(accessors))  # tuple of ('dot', name) or ('index', expr)
+    def __repr__(self): return f"VariableNode({self.name!r}, accessors={list(self.accessors)})"
 
 class FunctionCallNode(Node):
+    __slots__ = ("name", "args", "accessors")
     def __init__(self, name, args=None, accessors=None):
-        self.name = name
-        self.args = args or []
-        self.accessors = accessors or []
-    def __repr__(self): return f"FunctionCallNode({self.name!r}, args={self.args}, accessors={self.accessors})"
+        _init(self, "name", intern(name))
+        _init(self, "args", tuple(args) if args else ())
+        _init(self, "accessors", _accessors(accessors))
+    def __repr__(self): return f"FunctionCallNode({self.name!r}, args={list(self.args)}, accessors={list(self.accessors)})"
 
 class ArrayLiteralNode(Node):
-    def __init__(self, elements): self.elements = elements
-    def __repr__(self): return f"ArrayLiteralNode({self.elements})"
+    __slots__ = ("elements",)
+    def __init__(self, elements): _init(self, "elements", tuple(elements))
+    def __repr__(self): return f"ArrayLiteralNode({list(self.elements)})"
 
 class ExpressionNode(Node):
-    def __init__(self, expr): self.expr = expr
+    __slots__ = ("expr",)
+    def __init__(self, expr): _init(self, "expr", expr)
     def __repr__(self): return f"ExpressionNode({self.expr})"
 
 class BinaryOpNode(Node):
+    __slots__ = ("left", "op", "right")
     def __init__(self, left, op, right):
-        self.left = left
-        self.op = op
-        self.right = right
+        _init(self, "left", left)
+        _init(self, "op", intern(op))
+        _init(self, "right", right)
     def __repr__(self): return f"BinaryOpNode({self.left}, {self.op!r}, {self.right})"
 
 class TernaryOpNode(Node):
+    __slots__ = ("condition", "true_expr", "false_expr")
     def __init__(self, condition, true_expr, false_expr):
-        self.condition = condition
-        self.true_expr = true_expr
-        self.false_expr = false_expr
+        _init(self, "condition", condition)
+        _init(self, "true_expr", true_expr)
+        _init(self, "false_expr", false_expr)
     def __repr__(self):
         return f"TernaryOpNode({self.condition}, {self.true_expr}, {self.false_expr})"
 
 class TemplateNode(Node):
-    def __init__(self, parts): self.parts = parts
-    def __repr__(self): return f"TemplateNode({self.parts})"
+    __slots__ = ("parts",)
+    def __init__(self, parts): _init(self, "parts", tuple(parts))
+    def __repr__(self): return f"TemplateNode({list(self.parts)})"
 
 class TemplateParser:
     def __init__(self, tokens):
@@ -63,9 +123,9 @@ class TemplateParser:
 
     def expect(self, token_type):
         """Kiểm tra token hiện tại có đúng loại mong đợi không"""
-        if self.current.type != token_type:
-            raise SyntaxError(f"Expected {token_type}, got {self.current.type}")
-        value = self.current.value
+        if self.current[0] != token_type:
+            raise SyntaxError(f"Expected {token_type}, got {self.current[0]}")
+        value = self.current[1]
         self.advance()
         return value
 
@@ -79,15 +139,15 @@ class TemplateParser:
         return self.current
 
     def match(self, *types):
-        if self.current.type in types:
+        if self.current[0] in types:
             tok = self.current
             self.next()
             return tok
         return None
 
     def expect(self, type_):
-        if self.current.type != type_:
-            raise SyntaxError(f"Expected {type_.name}, got {self.current.type.name}")
+        if self.current[0] != type_:
+            raise SyntaxError(f"Expected {type_.name}, got {self.current[0].name}")
         val = self.current
         self.next()
         return val
@@ -95,11 +155,11 @@ class TemplateParser:
     # --- entry ---
     def parse_template(self):
         parts = []
-        while self.current.type != TokenType.EOF:
-            if self.current.type == TokenType.STRING:
-                parts.append(TextNode(self.current.value))
+        while self.current[0] != TokenType.EOF:
+            if self.current[0] == TokenType.STRING:
+                parts.append(TextNode(self.current[1]))
                 self.next()
-            elif self.current.type == TokenType.DOLLAR:
+            elif self.current[0] == TokenType.DOLLAR:
                 parts.append(self.parse_expr())
             else:
                 # bỏ qua ký tự lạ hoặc lỗi
@@ -135,8 +195,8 @@ class TemplateParser:
     # --- <comparison> ::= <additive> ((==|!=|>|<|>=|<=) <additive>)*
     def parse_comparison(self):
         left = self.parse_additive()
-        while self.current.type in (TokenType.EQ, TokenType.NE, TokenType.GT, TokenType.LT, TokenType.GE, TokenType.LE):
-            op = self.current.value
+        while self.current[0] in (TokenType.EQ, TokenType.NE, TokenType.GT, TokenType.LT, TokenType.GE, TokenType.LE):
+            op = self.current[1]
             self.advance()
             right = self.parse_additive()
             left = BinaryOpNode(left, op, right)
@@ -145,8 +205,8 @@ class TemplateParser:
     # --- <additive> ::= <term> ((+|-) <term>)*
     def parse_additive(self):
         left = self.parse_term()
-        while self.current.type in (TokenType.PLUS, TokenType.MINUS):
-            op = self.current.value
+        while self.current[0] in (TokenType.PLUS, TokenType.MINUS):
+            op = self.current[1]
             self.advance()
             right = self.parse_term()
             left = BinaryOpNode(left, op, right)
@@ -155,8 +215,8 @@ class TemplateParser:
     # --- <term> ::= <factor> ((*|/) <factor>)*
     def parse_term(self):
         left = self.parse_factor()
-        while self.current.type in (TokenType.STAR, TokenType.SLASH):
-            op = self.current.value
+        while self.current[0] in (TokenType.STAR, TokenType.SLASH):
+            op = self.current[1]
             self.advance()
             right = self.parse_factor()
             left = BinaryOpNode(left, op, right)
@@ -165,34 +225,34 @@ class TemplateParser:
     # --- <factor> ::= <identifier> <expr_tail> | NUMBER | STRING | '(' <expression> ')' | '[' <array_literal> ']'
     def parse_factor(self):
         # allow nested expressions starting with $ (e.g. function args like $len($teams))
-        if self.current.type == TokenType.DOLLAR:
+        if self.current[0] == TokenType.DOLLAR:
             return self.parse_expr()
         # Read current token without double-consuming (use self.current and self.next())
-        if self.current.type == TokenType.IDENTIFIER:
-            ident = self.current.value
+        if self.current[0] == TokenType.IDENTIFIER:
+            ident = self.current[1]
             self.next()
             return self.parse_expr_tail(ident)
-        elif self.current.type == TokenType.NUMBER:
-            val = self.current.value
+        elif self.current[0] == TokenType.NUMBER:
+            val = self.current[1]
             self.next()
             return float(val) if '.' in val else int(val)
-        elif self.current.type == TokenType.STRING:
-            val = self.current.value
+        elif self.current[0] == TokenType.STRING:
+            val = self.current[1]
             self.next()
             return val
-        elif self.current.type == TokenType.LPAREN:
+        elif self.current[0] == TokenType.LPAREN:
             self.next()
             expr = self.parse_expression()
             self.expect(TokenType.RPAREN)
             return expr
-        elif self.current.type == TokenType.LBRACKET:
+        elif self.current[0] == TokenType.LBRACKET:
             return self.parse_array_literal()
         else:
-            raise ValueError(f"Unexpected token: {self.current}")
+            raise ValueError(f"Unexpected token: {token_repr(self.current)}")
 
     # --- <expr_tail> ::= '(' <arg_list>? ')' <accessors>* | <accessors>*
     def parse_expr_tail(self, ident):
-        if self.current.type == TokenType.LPAREN:
+        if self.current[0] == TokenType.LPAREN:
             args = self.parse_arg_list()
             accessors = self.parse_accessors()
             return FunctionCallNode(ident, args, accessors)
@@ -205,7 +265,7 @@ class TemplateParser:
         accessors = []
         while True:
             if self.match(TokenType.DOT):
-                name = self.expect(TokenType.IDENTIFIER).value
+                name = self.expect(TokenType.IDENTIFIER)[1]
                 accessors.append(('dot', name))
             elif self.match(TokenType.LBRACKET):
                 index_expr = self.parse_index_or_expr()
@@ -219,7 +279,7 @@ class TemplateParser:
     def parse_arg_list(self):
         args = []
         self.expect(TokenType.LPAREN)
-        if self.current.type != TokenType.RPAREN:
+        if self.current[0] != TokenType.RPAREN:
             while True:
                 args.append(self.parse_arg())
                 if not self.match(TokenType.COMMA):
@@ -229,34 +289,34 @@ class TemplateParser:
 
     # --- <arg> ::= NUMBER | STRING_LITERAL | <expr> | <array_literal> | IDENTIFIER
     def parse_arg(self):
-        if self.current.type == TokenType.NUMBER:
-            raw = self.current.value
+        if self.current[0] == TokenType.NUMBER:
+            raw = self.current[1]
             self.advance()
             # convert to number
             if '.' in raw or 'e' in raw or 'E' in raw:
                 return float(raw)
             else:
                 return int(raw)
-        elif self.current.type == TokenType.STRING:
-            val = self.current.value
+        elif self.current[0] == TokenType.STRING:
+            val = self.current[1]
             self.next()
             return val
-        elif self.current.type == TokenType.DOLLAR:
+        elif self.current[0] == TokenType.DOLLAR:
             return self.parse_expr()
-        elif self.current.type == TokenType.LBRACKET:
+        elif self.current[0] == TokenType.LBRACKET:
             return self.parse_array_literal()
-        elif self.current.type == TokenType.IDENTIFIER:
-            val = self.current.value
+        elif self.current[0] == TokenType.IDENTIFIER:
+            val = self.current[1]
             self.next()
             return val
         else:
-            raise SyntaxError(f"Unexpected token in arg: {self.current}")
+            raise SyntaxError(f"Unexpected token in arg: {token_repr(self.current)}")
 
     # --- <array_literal> ::= '[' ( <arg> (',' <arg>)* )? ']'
     def parse_array_literal(self):
         elements = []
         self.expect(TokenType.LBRACKET)
-        if self.current.type != TokenType.RBRACKET:
+        if self.current[0] != TokenType.RBRACKET:
             while True:
                 elements.append(self.parse_arg())
                 if not self.match(TokenType.COMMA):
@@ -266,23 +326,23 @@ class TemplateParser:
 
     # --- <index_or_expr> ::= NUMBER | '$' | IDENTIFIER | <expr>
     def parse_index_or_expr(self):
-        if self.current.type == TokenType.NUMBER:
-            raw = self.current.value
+        if self.current[0] == TokenType.NUMBER:
+            raw = self.current[1]
             self.next()
             # convert to number
             if '.' in raw or 'e' in raw or 'E' in raw:
                 return float(raw)
             else:
                 return int(raw)
-        elif self.current.type == TokenType.IDENTIFIER:
-            name = self.current.value
+        elif self.current[0] == TokenType.IDENTIFIER:
+            name = self.current[1]
             self.next()
             # treat bare identifier inside index as a variable reference
             return VariableNode(name)
-        elif self.current.type == TokenType.DOLLAR:
+        elif self.current[0] == TokenType.DOLLAR:
             return self.parse_expr()
         else:
-            raise SyntaxError(f"Unexpected token in index: {self.current}")
+            raise SyntaxError(f"Unexpected token in index: {token_repr(self.current)}")
 
 if __name__ == "__main__":
     text = "Hello $user.name! Your lucky numbers: $random([1,2,$x])"
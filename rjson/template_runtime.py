@@ -1,196 +1,690 @@
-import copy
 import json
-from .template_parser import TemplateParser
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
 from .template_evaluator import TemplateEvaluator
-from .template_lexer import TemplateLexer
+from .template_scope import Scope, GrowingListView, detach
+from .template_cache import expression_cache as _shared_expression_cache
+from .template_compiler import (
+    CompiledTemplate, DictNode, ListNode, RepeatNode, StringNode,
+    KEY, SET, REPEAT, SET_REPEAT, compile_node, copy_static,
+)
+from .template_analysis import referenced_names
+from .template_columnar import iter_columnar, columnar_plan
+from .template_lazy import lazy_value
+from .template_threads import ThreadScheduler
+from .template_parallel import DEFAULT_THRESHOLD, can_fork, iter_parallel, iterations_independent
+from .template_stats import EVALUATE, CONTEXT_COPY
+from .template_budget import DEADLINE, NODES, OUTPUT, BudgetExceeded, output_size
+from .template_errors import located, wrap
+
+# placeholder stored for streamed values that no expression can read
+_RELEASED = GrowingListView([], 0)
+
+# evaluation backends: closures compiled once per expression, or the reference AST interpreter
+COMPILED = "compiled"
+INTERPRETER = "interpreter"
+
 
 class TemplateRuntime:
-    def __init__(self, context=None, functions=None):
-        self.context = context or {}
+    def __init__(self, context=None, functions=None, expression_cache=None, backend=COMPILED,
+                 workers=None, parallel_threshold=DEFAULT_THRESHOLD, stats=None, threads=None, budget=None):
+        # the caller's context becomes the root layer of a copy-on-write scope chain;
+        # rendering only ever writes to child layers, so it is never modified
+        self.context = context if isinstance(context, Scope) else Scope(context or {})
         self.functions = functions or {}
+        # parsed ASTs are shared across runtimes, so re-rendering the same string
+        # (e.g. inside every _repeat iteration) skips the lexer and parser
+        self.expression_cache = expression_cache if expression_cache is not None else _shared_expression_cache
+        # context values copied into the output of the render in progress (see `detach`)
+        self.copies = None
+        if backend not in (COMPILED, INTERPRETER):
+            raise ValueError(f"Unknown evaluation backend: {backend!r}")
+        self.backend = backend
+        # worker processes for independent _repeat iterations (None/1: only `_repeat_parallel: true`
+        # repeats run in parallel, on os.cpu_count() workers)
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        # threads for sibling keys that call functions (None/1: render keys one after another);
+        # `scheduler` is the ThreadScheduler of the render in progress
+        self.threads = threads
+        self.scheduler = None
+        # optional RenderBudget: iteration/expression/output/time limits, shared by sub-runtimes
+        self.budget = budget
+        # optional RenderStats: phase timings, function calls and repeat counts
+        self.stats = stats
+        if stats is not None:
+            self.functions = stats.instrument(self.functions)
+            self.expression_cache = stats.instrument_cache(self.expression_cache)
+
+    def _spawn(self, context):
+        """Create a sub-runtime sharing this runtime's functions, caches, backend, pool settings and stats."""
+        rt = TemplateRuntime(context, self.functions, self.expression_cache, self.backend,
+                             self.workers, self.parallel_threshold, self.stats, self.threads, self.budget)
+        rt.scheduler = self.scheduler
+        rt.copies = self.copies
+        return rt
 
     def render(self, template):
+        """Render a template value (dict/list/str/scalar) or a CompiledTemplate."""
+        if isinstance(template, CompiledTemplate):
+            node = template.root
+        else:
+            node = compile_node(template, self.expression_cache)
+        if self.stats is not None:
+            self.stats.index(node)
+        if self.budget is not None:
+            self.budget.start()
+        if node.static:
+            self._apply_static(node.value)
+        self.copies = {}
+        try:
+            if self.threads and self.threads > 1 and self.scheduler is None and not node.static:
+                return self._render_threaded(node)
+            return self.render_node(node)
+        finally:
+            self.copies = None
+
+    def _render_threaded(self, node):
+        """Render with sibling keys that call functions scheduled on a thread pool (see template_threads)."""
+        executor = ThreadPoolExecutor(self.threads, thread_name_prefix="rjson")
+        self.scheduler = ThreadScheduler(executor)
+        try:
+            result = self.render_node(node)
+        except BaseException:
+            # don't wait for calls still running (e.g. after a budget deadline)
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self.scheduler = None
+        executor.shutdown()
+        return result
+
+    async def render_async(self, template, max_concurrency=None):
+        """Render like `render`, awaiting `async def` functions concurrently where it is safe.
+
+        Calls from independent sibling keys and `_repeat` iterations are in
+        flight together; `max_concurrency` caps how many are awaited at once.
+        """
+        if isinstance(template, CompiledTemplate):
+            node = template.root
+        else:
+            node = compile_node(template, self.expression_cache)
+        if self.stats is not None:
+            self.stats.index(node)
+        if self.budget is not None:
+            self.budget.start()
+        if node.static:
+            self._apply_static(node.value)
+        # imported here so synchronous rendering does not load asyncio
+        import asyncio
+        from .template_async import AsyncRenderer
+        self.copies = {}
+        rendering = AsyncRenderer(self.functions, max_concurrency).render_node(self, node)
         try:
-            if isinstance(template, dict):
-                return self._render_dict(template)
-            elif isinstance(template, list):
-                return [self.render(item) for item in template]
-            elif isinstance(template, str):
-                return self._render_string(template)
+            if self.budget is None or self.budget.deadline is None:
+                return await rendering
+            try:
+                return await asyncio.wait_for(rendering, self.budget.remaining())
+            except asyncio.TimeoutError:
+                raise self.budget.exceeded(DEADLINE) from None
+        finally:
+            self.copies = None
+
+    def render_lazy(self, template):
+        """Render like `render`, but dicts and lists come back as proxies rendered on access.
+
+        See template_lazy; `materialize()` on the result gives what `render` returns.
+        """
+        if isinstance(template, CompiledTemplate):
+            node = template.root
+        else:
+            node = compile_node(template, self.expression_cache)
+        if self.stats is not None:
+            self.stats.index(node)
+        if self.budget is not None:
+            self.budget.start()
+        if node.static:
+            self._apply_static(node.value)
+        # proxies render on access, so the copies are kept as long as they are
+        self.copies = {}
+        return lazy_value(self, node)
+
+    def render_node(self, node):
+        """Render a compiled node; static subtrees are copied without evaluating them."""
+        if node.static:
+            return copy_static(node.value)
+        try:
+            if isinstance(node, StringNode):
+                return self._eval_string_node(node)
+            elif isinstance(node, DictNode):
+                return self._render_dict(node)
+            elif isinstance(node, RepeatNode):
+                return self._render_repeat(node)
+            elif isinstance(node, ListNode):
+                return self._render_list(node)
             else:
-                return template
+                raise TypeError(f"Unknown compiled node: {node!r}")
         except Exception as e:
-            raise RuntimeError(f"Error during rendering template: {json.dumps(template, indent=2)}\n{e}") from e
+            raise wrap(e, node)
+
+    def _render_list(self, node):
+        result = []
+        base = self.context
+        for i, item in enumerate(node.items):
+            prev = self.context
+            if item.static:
+                self._apply_static(item.value)
+            try:
+                result.append(self.render_node(item))
+            except Exception as e:
+                raise located(e, i, item)
+            self._collapse(base, prev)
+        return result
+
+    def _collapse(self, base, prev):
+        """Fold the layer a list item added onto the layer added by an earlier item.
+
+        Each dict rendered by this runtime leaves a child scope in self.context so
+        later siblings see its keys; folding keeps the chain from growing with the
+        length of the list.
+        """
+        if self.context is not prev and prev is not base:
+            prev.absorb(self.context)
+            self.context = prev
+
+    def _apply_static(self, value):
+        """Apply the context side effects of rendering a static value with this runtime.
+
+        Dicts rendered directly by a runtime (list items, template root) leave
+        their keys in its context for later siblings; static subtrees skip the
+        rendering itself but must keep that behaviour.
+        """
+        if isinstance(value, list):
+            base = self.context
+            for item in value:
+                prev = self.context
+                self._apply_static(item)
+                self._collapse(base, prev)
+        elif isinstance(value, dict):
+            local_ctx = self.context.child()
+            for key, v in value.items():
+                self._merge_set(local_ctx, local_ctx)
+                local_ctx[key] = copy_static(v)
+            self.context = local_ctx
 
     def _render_string(self, template_str):
         # Nếu không chứa dấu $, coi như chuỗi thường
         if "$" not in template_str:
             return template_str
 
-        # 1️⃣ Tokenize
-        lexer = TemplateLexer(template_str)
-        tokens = lexer.tokenize()
-
-        # 2️⃣ Parse
-        parser = TemplateParser(tokens)
-        ast = parser.parse_template()
+        # 1️⃣ Tokenize + 2️⃣ Parse (cached by source string)
+        expr = self.expression_cache.lookup(template_str)
 
         # 3️⃣ Evaluate
+        if self.stats is not None:
+            return self._timed_evaluate(expr)
+        return self._evaluate(expr)
+
+    def _evaluate(self, expr):
+        """Evaluate a CachedExpression / StringNode (anything with `ast` and `fn`) against self.context."""
+        if self.backend == COMPILED:
+            value = detach(expr.fn(self.context, self.functions), self.copies)
+        else:
+            value = detach(TemplateEvaluator(self.context, self.functions).evaluate(expr.ast), self.copies)
+        if self.budget is not None:
+            self.budget.evaluated(value)
+        return value
+
+    def _timed_evaluate(self, expr):
+        start = perf_counter()
+        try:
+            return self._evaluate(expr)
+        finally:
+            self.stats.phase(EVALUATE, perf_counter() - start)
+
+    def _eval_string_node(self, node):
+        if node.ast is None:
+            # compilation failed; re-parse so the original error surfaces here
+            return self._render_string(node.source)
+        if self.stats is not None:
+            return self._timed_evaluate(node)
+        if self.budget is not None:
+            return self._evaluate(node)
+        if self.backend == COMPILED:
+            return detach(node.fn(self.context, self.functions), self.copies)
         evaluator = TemplateEvaluator(self.context, self.functions)
-        return evaluator.evaluate(ast)
+        return detach(evaluator.evaluate(node.ast), self.copies)
 
+    def _eval_directive(self, node, ctx):
+        """Evaluate a `_repeat` / `_repeat_parallel` value node against ctx."""
+        if node.static:
+            return node.value
+        return self._spawn(ctx)._eval_string_node(node)
 
-    def _render_dict(self, d):
-        result = {}
-        # Tạo bản sao context cục bộ để không ảnh hưởng toàn cục trong vòng lặp
-        local_ctx = copy.deepcopy(self.context)
-
-        # Xử lý _repeat nếu có
-        repeat_count = d.get("_repeat")
-        if repeat_count is not None:
-            # evaluate using local context copy so expressions can refer to previously-set keys
-            repeat_count = int(TemplateRuntime(local_ctx, self.functions)._eval_value(repeat_count))
-            items = []
-            for i in range(repeat_count):
-                # Tạo context tạm cho từng lần lặp
-                loop_ctx = copy.deepcopy(local_ctx)
-                loop_ctx["_index"] = i
-                loop_ctx["_repeat"] = repeat_count
-
-                sub_runtime = TemplateRuntime(loop_ctx, self.functions)
-                # Loại bỏ key _repeat để render phần còn lại
-                sub_dict = {k: v for k, v in d.items() if not k.startswith("_repeat")}
-                item = sub_runtime._render_dict(sub_dict)
-                # propagate _set context back to parent for next iterations
-                if "_set" in sub_runtime.context:
-                    local_ctx["_set"] = sub_runtime.context["_set"]
-                    for k, v in sub_runtime.context["_set"].items():
-                        local_ctx[k] = v
-                items.append(item)
-            return items
-
-        # Xử lý từng key-value
-        for key, value in d.items():
-            # Bỏ qua _repeat
-            if key.startswith("_repeat"):
-                continue
-
-            # Nếu là _set.<var>, chỉ lưu vào context, KHÔNG in ra kết quả
-            if key.startswith("_set."):
-                var_name = key.split(".", 1)[1]
-                # Nếu value là dict có _repeat, xử lý như một danh sách ẩn
-                if isinstance(value, dict) and value.get("_repeat") is not None:
-                    # compute repeat count using current local_ctx
-                    repeat_count = int(TemplateRuntime(local_ctx, self.functions)._eval_value(value.get("_repeat")))
-                    items = []
-                    for i in range(repeat_count):
-                        loop_ctx = copy.deepcopy(local_ctx)
-                        loop_ctx["_index"] = i
-                        loop_ctx["_repeat"] = repeat_count
-                        # expose previously built items under var_name so expressions can refer to them
-                        loop_ctx[var_name] = list(items)
-
-                        sub_rt = TemplateRuntime(loop_ctx, self.functions)
-                        sub_dict = {k: v for k, v in value.items() if not k.startswith("_repeat")}
-                        item = sub_rt._render_dict(sub_dict)
-
-                        # merge any _set entries from sub-runtime
-                        if "_set" in sub_rt.context:
-                            if "_set" not in local_ctx:
-                                local_ctx["_set"] = {}
-                            for k, v in sub_rt.context["_set"].items():
-                                local_ctx["_set"][k] = v
-                                local_ctx[k] = v
+    def _eval_count(self, count_node, ctx):
+        """Evaluate a `_repeat` count node against ctx."""
+        return int(self._eval_directive(count_node, ctx))
+
+    def _parallel_workers(self, node, name, local_ctx, repeat_count):
+        """Number of worker processes to render a repeat with, or 0 for the sequential path.
+
+        `_repeat_parallel: true` forces the pool (the template asserts independence);
+        otherwise it is used when `self.workers` > 1, the repeat is large enough,
+        its iterations are statically independent and it only calls pure functions.
+        """
+        hint = None
+        if node.parallel is not None:
+            hint = bool(self._eval_directive(node.parallel, local_ctx))
+            if not hint:
+                return 0
+        workers = self.workers
+        if hint and workers is None:
+            workers = os.cpu_count()
+        if not workers or workers <= 1 or repeat_count < 2 or not can_fork():
+            return 0
+        if not hint:
+            if repeat_count < self.parallel_threshold:
+                return 0
+            if not iterations_independent(node, name, local_ctx, self.functions):
+                return 0
+        return min(workers, repeat_count)
+
+    def _iter_parallel(self, local_ctx, node, repeat_count, workers):
+        """Yield the items of an independent repeat rendered by a process pool."""
+        return self._merge_iterations(local_ctx, iter_parallel(self, node.body, local_ctx, repeat_count, workers))
+
+    def _iter_columnar(self, local_ctx, node, name, repeat_count):
+        """Yield blocks of rows of a repeat whose body NumPy can evaluate column-wise (see template_columnar).
+
+        Stops at the first block that has to be rendered iteration by
+        iteration; the caller renders the remaining iterations.
+        """
+        if node.parallel is not None:
+            return
+        done = 0
+        start = perf_counter() if self.stats is not None else None
+        budget = self.budget
+        block_size = None
+        if budget is not None and columnar_plan(node):
+            keys = [key for key, _, ast in columnar_plan(node)[0] if ast is not None]
+            per_row = len(keys)
+            block_size = lambda rows: budget.block(rows, per_row)
+        for rows in iter_columnar(node, name, local_ctx, repeat_count, block_size):
+            if budget is not None:
+                nodes, output = budget.nodes, budget.output
+                try:
+                    budget.evaluated_block(len(rows) * per_row,
+                                           sum(output_size(row[key]) for row in rows for key in keys))
+                except BudgetExceeded as e:
+                    raise self._columnar_overrun(e, rows, keys, done, nodes, output)
+            done += len(rows)
+            yield rows
+        if start is not None and done:
+            self.stats.phase(EVALUATE, perf_counter() - start)
+        if done:
+            # the `_set` entries visible to every iteration, mirrored as after each of them
+            self._merge_set(local_ctx, local_ctx)
+
+    def _columnar_overrun(self, error, rows, keys, done, nodes, output):
+        """The budget error of a column-wise block, at the row and key where the per-iteration path stops.
+
+        `nodes` and `output` are the counters before the block; they are set
+        to what they were just after the first expression over a limit.
+        """
+        budget = self.budget
+        if error.limit != NODES and error.limit != OUTPUT:
+            return error
+        max_nodes = float("inf") if budget.max_nodes is None else budget.max_nodes
+        max_output = float("inf") if budget.max_output is None else budget.max_output
+        for i, row in enumerate(rows):
+            for key in keys:
+                nodes += 1
+                output += output_size(row[key])
+                if nodes > max_nodes or output > max_output:
+                    budget.nodes, budget.output = nodes, output
+                    error = budget.exceeded(NODES if nodes > max_nodes else OUTPUT)
+                    return located(located(error, key), done + i)
+        return error
+
+    def _merge_iterations(self, local_ctx, results):
+        """Yield the items of independently rendered iterations, merging the `_set` entries each wrote."""
+        results = iter(results)
+        index = 0
+        while True:
+            try:
+                item, written = next(results)
+            except StopIteration:
+                break
+            except Exception as e:
+                raise located(e, index)
+            index += 1
+            if written:
+                for k, v in written.items():
+                    local_ctx.set_entry(k, v)
+            yield item
+        # no iteration reads these names, so mirroring once gives the same end state
+        # as _merge_set after every iteration
+        if local_ctx.has_sets():
+            start = perf_counter() if self.stats is not None else None
+            for k, v in local_ctx.set_items().items():
+                local_ctx[k] = v
+            if start is not None:
+                self.stats.phase(CONTEXT_COPY, perf_counter() - start)
+
+    def _merge_set(self, local_ctx, sub_ctx):
+        """Copy `_set` entries visible from a sub-runtime into local_ctx (namespace and direct keys)."""
+        if sub_ctx.has_sets():
+            start = perf_counter() if self.stats is not None else None
+            for k, v in sub_ctx.set_items().items():
+                local_ctx.set_entry(k, v)
+                local_ctx[k] = v
+            if start is not None:
+                self.stats.phase(CONTEXT_COPY, perf_counter() - start)
+
+    def _mirror_repeat(self, local_ctx, key, items):
+        """Mirror a visible repeated list into `_set` so it behaves like `_set.<key>`."""
+        if self.stats is None:
+            local_ctx.set_entry(key, list(items))
+            return
+        start = perf_counter()
+        local_ctx.set_entry(key, list(items))
+        self.stats.phase(CONTEXT_COPY, perf_counter() - start)
 
+    def _record_repeat(self, node, repeat_count):
+        if self.stats is not None:
+            self.stats.repeat(self.stats.path_of(node), repeat_count)
+        if self.budget is not None:
+            self.budget.repeat(repeat_count)
+
+    def _iter_repeat(self, node):
+        """Yield the items of a dict carrying `_repeat` on its own (list item or template root)."""
+        local_ctx = self.context.child()
+        repeat_count = self._eval_count(node.count, local_ctx)
+        self._record_repeat(node, repeat_count)
+        done = 0
+        for rows in self._iter_columnar(local_ctx, node, None, repeat_count):
+            done += len(rows)
+            yield from rows
+        if done:
+            if done == repeat_count:
+                return
+        else:
+            workers = self._parallel_workers(node, None, local_ctx, repeat_count)
+            if workers:
+                yield from self._iter_parallel(local_ctx, node, repeat_count, workers)
+                return
+        for i in range(done, repeat_count):
+            # Tạo scope tạm cho từng lần lặp
+            loop_ctx = local_ctx.child()
+            loop_ctx["_index"] = i
+            loop_ctx["_repeat"] = repeat_count
+
+            sub_runtime = self._spawn(loop_ctx)
+            try:
+                item = sub_runtime._render_dict(node.body)
+            except Exception as e:
+                raise located(e, i, node.body)
+            # propagate _set context back to parent for next iterations
+            self._merge_set(local_ctx, sub_runtime.context)
+            yield item
+
+    def _render_repeat(self, node):
+        return list(self._iter_repeat(node))
+
+    def _iter_repeat_entry(self, local_ctx, node, name, items):
+        """Yield the items of a `_repeat` dict stored under `name` as they are rendered.
+
+        Items are appended to `items`, which is exposed to later iterations. Pass
+        None when nothing can read `name`, so items are not retained.
+        """
+        # compute repeat count using current local_ctx
+        repeat_count = self._eval_count(node.count, local_ctx)
+        self._record_repeat(node, repeat_count)
+        done = 0
+        for rows in self._iter_columnar(local_ctx, node, name, repeat_count):
+            if items is not None:
+                items.extend(rows)
+            done += len(rows)
+            yield from rows
+        if done:
+            local_ctx[name] = GrowingListView(items, done) if items is not None else _RELEASED
+            if done == repeat_count:
+                return
+        else:
+            workers = self._parallel_workers(node, name, local_ctx, repeat_count)
+            if workers:
+                for item in self._iter_parallel(local_ctx, node, repeat_count, workers):
+                    if items is not None:
                         items.append(item)
-                        # update local context to include items built so far
-                        local_ctx[var_name] = list(items)
-
-                    # store result in _set namespace and in direct context but do not add to visible result
-                    if "_set" not in local_ctx:
-                        local_ctx["_set"] = {}
-                    local_ctx["_set"][var_name] = items
-                    local_ctx[var_name] = items
-                    continue
-
-                # Use a sub-runtime so nested _set assignments inside 'value' can run
-                sub_rt = TemplateRuntime(local_ctx, self.functions)
-                evaluated_value = sub_rt.render(value)
-
-                # Merge any _set entries produced by the sub-runtime back into our local_ctx
-                if "_set" in sub_rt.context:
-                    if "_set" not in local_ctx:
-                        local_ctx["_set"] = {}
-                    for k, v in sub_rt.context["_set"].items():
-                        local_ctx["_set"][k] = v
-                        local_ctx[k] = v
-
-                # Ghi vào context thường và namespace _set for this var_name
-                local_ctx[var_name] = evaluated_value
-                if "_set" not in local_ctx:
-                    local_ctx["_set"] = {}
-                local_ctx["_set"][var_name] = evaluated_value
-
-                # Không đưa vào result (ẩn)
-                continue
-
-            # Nếu value là dict có _repeat, xử lý theo từng lần lặp và expose các phần tử đã dựng
-            if isinstance(value, dict) and value.get("_repeat") is not None:
-                # compute repeat count using current local_ctx
-                repeat_count = int(TemplateRuntime(local_ctx, self.functions)._eval_value(value.get("_repeat")))
-                items = []
-                for i in range(repeat_count):
-                    loop_ctx = copy.deepcopy(local_ctx)
-                    loop_ctx["_index"] = i
-                    loop_ctx["_repeat"] = repeat_count
-                    # expose previously built items under the key so expressions can refer to them
-                    loop_ctx[key] = list(items)
-
-                    sub_rt = TemplateRuntime(loop_ctx, self.functions)
-                    # render the body of the repeated dict (excluding _repeat)
-                    sub_dict = {k: v for k, v in value.items() if not k.startswith("_repeat")}
-                    item = sub_rt._render_dict(sub_dict)
-
-                    # merge any _set entries from sub-runtime
-                    if "_set" in sub_rt.context:
-                        if "_set" not in local_ctx:
-                            local_ctx["_set"] = {}
-                        for k, v in sub_rt.context["_set"].items():
-                            local_ctx["_set"][k] = v
-                            local_ctx[k] = v
-
-                    items.append(item)
-                    # update local context to include items built so far
-                    local_ctx[key] = list(items)
-
-                result[key] = items
-                local_ctx[key] = items
-                # also mirror visible repeated list into _set so behavior matches `_set.<name>`
-                if "_set" not in local_ctx:
-                    local_ctx["_set"] = {}
-                local_ctx["_set"][key] = list(items)
+                    yield item
+                local_ctx[name] = GrowingListView(items) if items is not None else _RELEASED
+                return
+        for i in range(done, repeat_count):
+            loop_ctx = local_ctx.child()
+            loop_ctx["_index"] = i
+            loop_ctx["_repeat"] = repeat_count
+            # expose previously built items under name so expressions can refer to them
+            loop_ctx[name] = GrowingListView(items, i) if items is not None else _RELEASED
+
+            sub_rt = self._spawn(loop_ctx)
+            try:
+                item = sub_rt._render_dict(node.body)
+            except Exception as e:
+                raise located(e, i, node.body)
+            self._merge_set(local_ctx, sub_rt.context)
+
+            if items is not None:
+                items.append(item)
+                # update local context to include items built so far
+                local_ctx[name] = GrowingListView(items, i + 1)
             else:
-                # Các key bình thường: render using a sub-runtime so any _set side-effects are captured
-                sub_rt = TemplateRuntime(local_ctx, self.functions)
-                evaluated_value = sub_rt.render(value)
+                local_ctx[name] = _RELEASED
+            yield item
 
-                # Merge any _set entries produced by the sub-runtime
-                if "_set" in sub_rt.context:
-                    if "_set" not in local_ctx:
-                        local_ctx["_set"] = {}
-                    for k, v in sub_rt.context["_set"].items():
-                        local_ctx["_set"][k] = v
-                        local_ctx[k] = v
+    def _render_repeat_entry(self, local_ctx, node, name):
+        """Render a `_repeat` dict stored under `name`, exposing the items built so far."""
+        items = []
+        for _ in self._iter_repeat_entry(local_ctx, node, name, items):
+            pass
+        return items
+
+    def _render_entry_value(self, local_ctx, entry):
+        """Render an entry's value with a sub-runtime so any _set side-effects are captured."""
+        sub_rt = self._spawn(local_ctx)
+        value = sub_rt.render_node(entry.node)
+        self._merge_set(local_ctx, sub_rt.context)
+        return value
 
-                result[key] = evaluated_value
-                local_ctx[key] = evaluated_value
+    def _render_hidden_entry(self, local_ctx, entry):
+        """Handle a `_set.<name>` entry: store the value in context, KHÔNG in ra kết quả."""
+        if entry.kind == SET_REPEAT:
+            # danh sách ẩn: store in _set namespace and in direct context but not in result
+            items = self._render_repeat_entry(local_ctx, entry.node, entry.name)
+            local_ctx.set_entry(entry.name, items)
+            local_ctx[entry.name] = items
+        else:
+            evaluated_value = self._render_entry_value(local_ctx, entry)
+            # Ghi vào context thường và namespace _set for this var_name
+            local_ctx[entry.name] = evaluated_value
+            local_ctx.set_entry(entry.name, evaluated_value)
+
+    def _render_dict(self, node):
+        if self.scheduler is not None and self.scheduler.calls_functions(node):
+            return self.scheduler.render_dict(self, node)
+        result = {}
+        # Scope cục bộ (O(1)) để không ảnh hưởng context cha
+        local_ctx = self.context.child()
+
+        # Xử lý từng key-value (các key _repeat* đã được tách ra khi compile)
+        try:
+            for entry in node.entries:
+                kind = entry.kind
+                if kind == KEY:
+                    evaluated_value = self._render_entry_value(local_ctx, entry)
+                    result[entry.key] = evaluated_value
+                    local_ctx[entry.key] = evaluated_value
+
+                elif kind == REPEAT:
+                    items = self._render_repeat_entry(local_ctx, entry.node, entry.key)
+                    result[entry.key] = items
+                    local_ctx[entry.key] = items
+                    # also mirror visible repeated list into _set so behavior matches `_set.<name>`
+                    self._mirror_repeat(local_ctx, entry.key, items)
+
+                else:
+                    self._render_hidden_entry(local_ctx, entry)
+        except Exception as e:
+            raise located(e, entry.key, entry.node)
 
         # propagate context back to self
         self.context = local_ctx
         return result
 
+    # ---------- streaming ----------
+
+    def iter_render(self, template, encoder=None):
+        """Render a template to JSON text, yielding chunks as they are produced.
+
+        Joining the chunks gives the same text as encoding `render(template)`.
+        Items of visible `_repeat` lists (and container values) whose key no
+        expression reads are encoded and released one by one instead of being
+        kept in the context, so memory stays bounded by one item for large
+        generated lists. Released keys hold a placeholder in `self.context`.
+        """
+        if encoder is None:
+            encoder = json.JSONEncoder()
+        if isinstance(template, CompiledTemplate):
+            node = template.root
+        else:
+            node = compile_node(template, self.expression_cache)
+        if self.stats is not None:
+            self.stats.index(node)
+        if self.budget is not None:
+            self.budget.start()
+        if node.static:
+            self._apply_static(node.value)
+        stream = _JsonStream(encoder, referenced_names(node))
+        return self._iter_node(node, stream)
+
+    def _iter_node(self, node, stream):
+        if node.static:
+            yield stream.encode(node.value)
+            return
+        try:
+            if isinstance(node, DictNode):
+                yield from self._iter_dict(node, stream)
+            elif isinstance(node, RepeatNode):
+                yield from stream.iter_array(self._iter_repeat(node))
+            elif isinstance(node, ListNode):
+                yield from self._iter_list(node, stream)
+            else:
+                yield stream.encode(self.render_node(node))
+        except Exception as e:
+            raise wrap(e, node)
+
+    def _iter_list(self, node, stream):
+        yield "["
+        base = self.context
+        for i, item in enumerate(node.items):
+            if i:
+                yield stream.item_separator
+            prev = self.context
+            if item.static:
+                self._apply_static(item.value)
+            try:
+                yield from self._iter_node(item, stream)
+            except Exception as e:
+                raise located(e, i, item)
+            self._collapse(base, prev)
+        yield "]"
+
+    def _iter_dict(self, node, stream):
+        local_ctx = self.context.child()
+        first = True
+        yield "{"
+        try:
+            for entry in node.entries:
+                kind = entry.kind
+                if kind == KEY or kind == REPEAT:
+                    yield stream.key_prefix(entry.key, first)
+                    first = False
+                if kind == KEY:
+                    if entry.key in stream.names or isinstance(entry.node, StringNode) or entry.node.static:
+                        evaluated_value = self._render_entry_value(local_ctx, entry)
+                        yield stream.encode(evaluated_value)
+                        local_ctx[entry.key] = evaluated_value
+                    else:
+                        # nothing reads this key: stream the value instead of keeping it
+                        sub_rt = self._spawn(local_ctx)
+                        yield from sub_rt._iter_node(entry.node, stream)
+                        self._merge_set(local_ctx, sub_rt.context)
+                        local_ctx[entry.key] = _RELEASED
+
+                elif kind == REPEAT:
+                    keep = entry.key in stream.names or "_set" in stream.names
+                    items = [] if keep else None
+                    yield from stream.iter_array(self._iter_repeat_entry(local_ctx, entry.node, entry.key, items))
+                    if keep:
+                        local_ctx[entry.key] = items
+                        self._mirror_repeat(local_ctx, entry.key, items)
+                    else:
+                        local_ctx[entry.key] = _RELEASED
+                        local_ctx.set_entry(entry.key, _RELEASED)
+
+                else:
+                    self._render_hidden_entry(local_ctx, entry)
+        except Exception as e:
+            raise located(e, entry.key, entry.node)
+        yield "}"
+        self.context = local_ctx
+
     def _eval_value(self, value):
         """Evaluate string expression if it starts with $, otherwise return as-is"""
         if isinstance(value, str) and value.startswith("$"):
             return self._render_string(value)
         return value
+
+
+class _JsonStream:
+    """Encoding state shared by one `iter_render` call."""
+
+    def __init__(self, encoder, names):
+        if encoder.indent is not None or encoder.sort_keys:
+            raise ValueError("streaming output does not support indent or sort_keys")
+        self.encoder = encoder
+        self.encode = encoder.encode
+        self.names = names
+        self.item_separator = encoder.item_separator
+        self.key_separator = encoder.key_separator
+
+    def key_prefix(self, key, first):
+        text = self.encode(self._key_str(key)) + self.key_separator
+        return text if first else self.item_separator + text
+
+    def _key_str(self, key):
+        # same key coercion as json.dumps
+        if isinstance(key, str):
+            return key
+        if key is True:
+            return "true"
+        if key is False:
+            return "false"
+        if key is None:
+            return "null"
+        if isinstance(key, float):
+            return self.encoder.encode(key)
+        if isinstance(key, int):
+            return int.__repr__(key)
+        raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+    def iter_array(self, items):
+        yield "["
+        first = True
+        for item in items:
+            if first:
+                first = False
+                yield self.encode(item)
+            else:
+                yield self.item_separator + self.encode(item)
+        yield "]"
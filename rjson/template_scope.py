@@ -0,0 +1,320 @@
+"""Layered rendering scopes.
+
+Every dict and every `_repeat` iteration used to render against a
+`copy.deepcopy` of its parent context. A `Scope` is a copy-on-write layer
+instead: `child()` is O(1), lookups walk up the chain and writes only touch
+the layer they are made on, so parent scopes (and the caller's context) are
+never modified.
+
+The `_set` namespace is layered the same way: each scope keeps its own
+`_set` entries and `scope["_set"]` is a read-only view over the chain.
+
+Lookups return the stored values themselves. The runtime copies the dicts
+and lists of an expression result when it becomes a rendered value
+(`detach`), so output never shares objects with the caller's context;
+functions and operators receive context values uncopied and must not
+modify them. Within one render each context value is copied once, however
+many times it is placed into the output, so a `_repeat` body referencing a
+large list does not copy it on every iteration.
+"""
+from collections.abc import Mapping, Sequence
+from itertools import islice
+
+_MISSING = object()
+
+
+class SetView(Mapping):
+    """Read-only view of the `_set` namespace visible from a scope."""
+    __slots__ = ("_scope",)
+
+    def __init__(self, scope):
+        self._scope = scope
+
+    def __getitem__(self, key):
+        scope = self._scope
+        while scope is not None:
+            sets = scope.sets
+            if sets is not None and key in sets:
+                return sets[key]
+            scope = scope.parent
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        scope = self._scope
+        while scope is not None:
+            sets = scope.sets
+            if sets is not None and key in sets:
+                return sets[key]
+            scope = scope.parent
+        return default
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __len__(self):
+        return len(self.copy())
+
+    def copy(self):
+        """Materialize the visible entries into a plain dict."""
+        return self._scope.set_items()
+
+    def __repr__(self): return f"SetView({self.copy()!r})"
+
+
+class Scope(Mapping):
+    """One copy-on-write layer of rendering context."""
+    __slots__ = ("vars", "sets", "parent")
+
+    def __init__(self, data=None, parent=None):
+        self.parent = parent
+        self.sets = None
+        if data is None:
+            self.vars = {}
+        elif isinstance(data, dict) and "_set" not in data:
+            # root layer over the caller's dict: referenced, never written
+            self.vars = data
+        else:
+            data = dict(data)
+            ns = data.pop("_set", None)
+            self.vars = data
+            if ns is not None:
+                self.sets = dict(ns)
+
+    def child(self):
+        return Scope(parent=self)
+
+    # ----- Mapping protocol -----
+    def __getitem__(self, key):
+        if key == "_set":
+            if not self.has_sets():
+                raise KeyError(key)
+            return SetView(self)
+        scope = self
+        while scope is not None:
+            v = scope.vars
+            if key in v:
+                return v[key]
+            scope = scope.parent
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key == "_set":
+            return SetView(self) if self.has_sets() else default
+        scope = self
+        while scope is not None:
+            v = scope.vars
+            if key in v:
+                return v[key]
+            scope = scope.parent
+        return default
+
+    def __contains__(self, key):
+        if key == "_set":
+            return self.has_sets()
+        scope = self
+        while scope is not None:
+            if key in scope.vars:
+                return True
+            scope = scope.parent
+        return False
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __setitem__(self, key, value):
+        if key == "_set":
+            raise TypeError("assign `_set` entries with Scope.set_entry()")
+        self.vars[key] = value
+
+    # ----- _set namespace -----
+    def has_sets(self):
+        scope = self
+        while scope is not None:
+            if scope.sets is not None:
+                return True
+            scope = scope.parent
+        return False
+
+    def set_entry(self, key, value):
+        """Write `key` into this layer's `_set` namespace."""
+        if self.sets is None:
+            self.sets = {}
+        self.sets[key] = value
+
+    def set_items(self):
+        """Visible `_set` entries as a plain dict (nearest layer wins)."""
+        layers = []
+        scope = self
+        while scope is not None:
+            if scope.sets is not None:
+                layers.append(scope.sets)
+            scope = scope.parent
+        merged = {}
+        for sets in reversed(layers):
+            merged.update(sets)
+        return merged
+
+    # ----- layer management -----
+    def absorb(self, descendant):
+        """Fold the layers between `descendant` and this scope into this scope."""
+        layers = []
+        scope = descendant
+        while scope is not self:
+            if scope is None:
+                raise ValueError("scope is not a descendant of this scope")
+            layers.append(scope)
+            scope = scope.parent
+        for layer in reversed(layers):
+            self.vars.update(layer.vars)
+            if layer.sets is not None:
+                if self.sets is None:
+                    self.sets = {}
+                self.sets.update(layer.sets)
+
+    def to_dict(self):
+        """Flatten the visible variables (and `_set`, if any) into a plain dict."""
+        layers = []
+        scope = self
+        while scope is not None:
+            layers.append(scope.vars)
+            scope = scope.parent
+        merged = {}
+        for v in reversed(layers):
+            merged.update(v)
+        if self.has_sets():
+            merged["_set"] = self.set_items()
+        return merged
+
+    def __repr__(self): return f"Scope({self.to_dict()!r})"
+
+
+class GrowingListView(Sequence):
+    """Read-only view of the first `length` items of an append-only list.
+
+    `_repeat` exposes the items built so far to each iteration; handing out a
+    view instead of `list(items)` keeps repeat rendering linear. Only appends
+    ever happen to the underlying list, so the view never changes.
+    """
+    __slots__ = ("_items", "_length")
+
+    def __init__(self, items, length=None):
+        self._items = items
+        self._length = len(items) if length is None else length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._items[:self._length][index]
+        n = self._length
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("list index out of range")
+        return self._items[index]
+
+    def __iter__(self):
+        return islice(self._items, self._length)
+
+    def to_list(self):
+        return self._items[:self._length]
+
+    def _cmp_other(self, other):
+        if isinstance(other, GrowingListView):
+            return other.to_list()
+        return other
+
+    def __eq__(self, other):
+        return self.to_list() == self._cmp_other(other)
+
+    def __ne__(self, other):
+        return self.to_list() != self._cmp_other(other)
+
+    def __lt__(self, other):
+        return self.to_list() < self._cmp_other(other)
+
+    def __le__(self, other):
+        return self.to_list() <= self._cmp_other(other)
+
+    def __gt__(self, other):
+        return self.to_list() > self._cmp_other(other)
+
+    def __ge__(self, other):
+        return self.to_list() >= self._cmp_other(other)
+
+    def __add__(self, other):
+        return self.to_list() + self._cmp_other(other)
+
+    def __radd__(self, other):
+        return other + self.to_list()
+
+    def __mul__(self, n):
+        return self.to_list() * n
+
+    __rmul__ = __mul__
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+
+_CONTAINERS = frozenset((dict, list, GrowingListView))
+
+
+def detach(value, copies=None):
+    """`materialize(value)`, with every dict and list in it copied.
+
+    Scopes hand out the caller's context values without copying them, so an
+    expression result may be (part of) the caller's context; the runtime
+    passes results through here before they become rendered values, so the
+    output never shares a dict or list with the context.
+
+    `copies` (`{id: (value, copy)}`, kept for one render) makes a value that
+    is detached again return the same copy instead of a new one.
+    """
+    t = type(value)
+    if copies is not None and (t is dict or t is list):
+        # the value is kept alongside its copy so its id is not reused
+        entry = copies.get(id(value))
+        if entry is not None:
+            return entry[1]
+        copy = detach(value)
+        copies[id(value)] = (value, copy)
+        return copy
+    if t is dict:
+        return {k: detach(v) if type(v) in _CONTAINERS else v for k, v in value.items()}
+    if t is list:
+        return [detach(v) if type(v) in _CONTAINERS else v for v in value]
+    if t is GrowingListView:
+        # items built by this render: already rendered values
+        return value.to_list()
+    return value
+
+
+def materialize(value):
+    """Replace GrowingListViews in a value (and directly inside a list/dict) with real lists.
+
+    Views are handed to accessors as-is; function arguments and anything that
+    becomes a rendered value go through here, so functions and output only
+    ever see real lists.
+    """
+    t = type(value)
+    if t is GrowingListView:
+        return value.to_list()
+    if t is list:
+        for v in value:
+            if type(v) is GrowingListView:
+                return [v.to_list() if type(v) is GrowingListView else v for v in value]
+    elif t is dict:
+        for v in value.values():
+            if type(v) is GrowingListView:
+                return {k: (v.to_list() if type(v) is GrowingListView else v) for k, v in value.items()}
+    return value
@@ -0,0 +1,261 @@
+"""Incremental re-rendering of one template against a changing context.
+
+`RenderSession(template, context)` renders once and remembers, for every
+entry of every rendered dict, its value and the `_set` entries it wrote.
+`update(changed)` merges `changed` into the context and renders the
+template again, but an entry whose expressions (at any depth, see
+`template_analysis.referenced_names`) read none of the names that changed
+is not rendered: its previous value is reused and its context writes are
+replayed. Names written by re-rendered entries whose value changed count as
+changed for the entries after them, so dependents are re-rendered too.
+Nested dicts are updated entry by entry; lists and `_repeat` lists are
+rendered again as a whole when anything in them is affected.
+
+`update` returns the JSON pointers of the output values that changed
+(outermost only), so consumers can patch their copy instead of reloading
+the document. Unchanged subtrees of `result` are shared with the previous
+result. Functions are assumed to be pure: an entry that only calls
+functions is never re-rendered.
+"""
+from .template_analysis import referenced_names, assigned_names
+from .template_compiler import DictNode, KEY, SET, REPEAT, compile_template
+from .template_errors import located, pointer_token, wrap
+from .template_runtime import TemplateRuntime
+from .template_scope import Scope
+
+
+class _Entry:
+    """What rendering one dict entry produced: its value, the `_set` entries it wrote, nested state."""
+    __slots__ = ("value", "writes", "child")
+
+    def __init__(self, value, writes, child=None):
+        self.value = value
+        self.writes = writes    # {name: value} of `_set` entries written, None if nothing was merged
+        self.child = child      # [_Entry] of a nested dict value
+
+
+class RenderSession:
+    """A rendered template kept up to date by re-rendering only what a context change affects.
+
+    `options` are passed to every `TemplateRuntime` (expression_cache,
+    backend, workers, ...). `result` is the current rendered output; treat
+    it as read-only, since unchanged parts are reused by later updates.
+    """
+
+    def __init__(self, template, context=None, functions=None, **options):
+        if functions is None:
+            from .helpers import functions
+        self.template = compile_template(template, options.get("expression_cache"))
+        self.functions = functions
+        self.options = options
+        self.context = dict(context or {})
+        self._reads = {}
+        self._writes = {}
+        self.result = None
+        self._state = None
+        self.result, self._state, _ = self._render(None, None)
+
+    def update(self, changed_context):
+        """Merge `changed_context` into the context, re-render what depends on it, return changed paths.
+
+        Paths are JSON pointers into `result` ("" for the whole output).
+        Keys whose value is unchanged are ignored. If rendering fails the
+        session is left as it was.
+        """
+        context = dict(self.context)
+        dirty = set()
+        for key, value in changed_context.items():
+            if key in context and _same(context[key], value):
+                continue
+            if key == "_set":
+                # every name of the old and the new namespace may read differently now
+                dirty.update(context.get(key) or ())
+                dirty.update(value or ())
+            dirty.add(key)
+            context[key] = value
+        if not dirty:
+            return []
+        saved = self.context
+        self.context = context
+        try:
+            self.result, self._state, changed = self._render(self._state, dirty)
+        except BaseException:
+            self.context = saved
+            raise
+        return changed
+
+    def render(self):
+        """Render the whole template from scratch against the current context (no reuse)."""
+        return self._runtime().render(self.template)
+
+    def _runtime(self):
+        return TemplateRuntime(Scope(self.context), self.functions, **self.options)
+
+    def _render(self, state, dirty):
+        """(result, state, changed paths) for the root; `state` None renders everything."""
+        rt = self._runtime()
+        root = self.template.root
+        if not isinstance(root, DictNode):
+            if state is not None and not self._affected(root, dirty):
+                return self.result, state, []
+            result = rt.render(self.template)
+            if state is not None and _same(result, self.result):
+                return self.result, state, []
+            return result, (), [""]
+        changed = []
+        result, state = self._dict(rt, root, self.result, state, dirty, "", changed)
+        return result, state, changed
+
+    # ---------- analysis ----------
+
+    def _entry_reads(self, entry):
+        key = id(entry)
+        reads = self._reads.get(key)
+        if reads is None:
+            reads = self._reads[key] = frozenset(referenced_names(entry.node))
+        return reads
+
+    def _entry_sets(self, entry):
+        """`_set` names an entry's subtree can write."""
+        key = id(entry)
+        sets = self._writes.get(key)
+        if sets is None:
+            sets = self._writes[key] = frozenset(assigned_names(entry.node))
+        return sets
+
+    def _entry_dirty(self, entry, dirty):
+        """True if an entry may render differently: it reads a changed name or may write one.
+
+        Written `_set` names count because the recorded value of a name the
+        entry could have written, but did not, is the one it inherited.
+        """
+        if not dirty:
+            return False
+        reads = self._entry_reads(entry)
+        return "_set" in reads or not reads.isdisjoint(dirty) or not self._entry_sets(entry).isdisjoint(dirty)
+
+    def _affected(self, node, dirty):
+        reads = frozenset(referenced_names(node))
+        return not reads.isdisjoint(dirty) or ("_set" in reads and bool(dirty))
+
+    # ---------- dicts ----------
+
+    def _dict(self, rt, node, old, state, dirty, path, changed):
+        """Render DictNode `node` like `TemplateRuntime._render_dict`, reusing unaffected entries.
+
+        `old`/`state` are the previous output and entry states (None: render
+        everything); `dirty` is updated in place with the names whose value
+        changed in this dict's scope. Changed output paths under `path` (None:
+        not part of the output) are appended to `changed`.
+        """
+        result = {}
+        entries = []
+        local_ctx = rt.context.child()
+        try:
+            for i, entry in enumerate(node.entries):
+                previous = state[i] if state is not None else None
+                if previous is not None and not self._entry_dirty(entry, dirty):
+                    record = self._replay(rt, local_ctx, entry, previous)
+                else:
+                    try:
+                        record = self._entry(rt, local_ctx, entry, previous, dirty, path, changed)
+                    except Exception as e:
+                        raise located(e, entry.key, entry.node)
+                entries.append(record)
+                if entry.kind == KEY or entry.kind == REPEAT:
+                    result[entry.key] = record.value
+        except Exception as e:
+            raise wrap(e, node)
+        rt.context = local_ctx
+        if old is not None and len(old) == len(result) and all(result[k] is old[k] for k in result):
+            result = old
+        return result, entries
+
+    def _entry(self, rt, local_ctx, entry, previous, dirty, path, changed):
+        """Render one entry and commit it to `local_ctx`; returns its _Entry."""
+        kind = entry.kind
+        node = entry.node
+        visible = kind == KEY or kind == REPEAT
+        entry_path = path + "/" + pointer_token(entry.key) if visible and path is not None else None
+        before = previous.value if previous is not None else None
+        if kind == KEY or kind == SET:
+            sub_rt = rt._spawn(local_ctx)
+            if isinstance(node, DictNode):
+                value, child = self._dict(
+                    sub_rt, node, before if previous is not None else None,
+                    previous.child if previous is not None else None,
+                    set(dirty) if dirty is not None else None, entry_path, changed)
+            else:
+                value = sub_rt.render_node(node)
+                child = None
+            writes = self._written(entry, sub_rt.context)
+            rt._merge_set(local_ctx, sub_rt.context)
+            local_ctx[entry.name] = value
+            if kind == SET:
+                local_ctx.set_entry(entry.name, value)
+            record = _Entry(value, writes, child)
+        else:
+            value = rt._render_repeat_entry(local_ctx, node, entry.name)
+            # a repeat without iterations merges nothing
+            writes = self._written(entry, local_ctx) if value else None
+            if kind == REPEAT:
+                local_ctx[entry.name] = value
+                rt._mirror_repeat(local_ctx, entry.name, value)
+            else:
+                local_ctx.set_entry(entry.name, value)
+                local_ctx[entry.name] = value
+            record = _Entry(value, writes)
+        if previous is None:
+            return record
+        if _same(value, before):
+            # keep the previous object so unchanged subtrees stay shared
+            record.value = before
+        else:
+            dirty.add(entry.name)
+            if entry_path is not None and not isinstance(node, DictNode):
+                # nested dicts report the paths inside them
+                changed.append(entry_path)
+        if not _same(record.writes, previous.writes):
+            dirty.update(self._entry_sets(entry))
+        return record
+
+    def _written(self, entry, ctx):
+        names = self._entry_sets(entry)
+        if not names or not ctx.has_sets():
+            return {}
+        return {k: v for k, v in ctx.set_items().items() if k in names}
+
+    def _replay(self, rt, local_ctx, entry, previous):
+        """Commit an entry that was not re-rendered: the same context writes as rendering it."""
+        value = previous.value
+        if previous.writes is not None:
+            sub_ctx = local_ctx.child()
+            for k, v in previous.writes.items():
+                sub_ctx.set_entry(k, v)
+            rt._merge_set(local_ctx, sub_ctx)
+        kind = entry.kind
+        if kind == KEY:
+            local_ctx[entry.name] = value
+        elif kind == SET:
+            local_ctx[entry.name] = value
+            local_ctx.set_entry(entry.name, value)
+        elif kind == REPEAT:
+            local_ctx[entry.name] = value
+            rt._mirror_repeat(local_ctx, entry.name, value)
+        else:
+            local_ctx.set_entry(entry.name, value)
+            local_ctx[entry.name] = value
+        return previous
+
+
+def _same(a, b):
+    """True if `a` and `b` render to the same JSON (unlike `==`, 1, 1.0 and True differ)."""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return len(a) == len(b) and list(a) == list(b) and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
@@ -0,0 +1,131 @@
+"""Ordering rules for rendering the entries of one dict out of order.
+
+`render_async` and the thread scheduler (`TemplateRuntime(threads=N)`) both
+render the entries of a dict as a dependency graph: an entry starts as soon
+as the entries ahead of it that write a name it reads have *finished*, and
+every entry is committed to the dict scope in template order. An entry that
+starts before those writers are committed renders against an overlay scope
+holding just the values they wrote. `SiblingScheduler` holds what both
+share: the per-entry read/write analysis, the plan, the overlays and the
+commit itself.
+"""
+from .template_analysis import referenced_names, assigned_names
+from .template_compiler import StringNode, KEY, SET, REPEAT
+
+
+class SiblingScheduler:
+    """Per-entry analysis (cached by entry) and in-order commits for out-of-order dict rendering."""
+
+    def __init__(self):
+        self._reads = {}
+        self._sets = {}
+
+    def _entry_reads(self, entry):
+        key = id(entry)
+        reads = self._reads.get(key)
+        if reads is None:
+            reads = self._reads[key] = frozenset(referenced_names(entry.node))
+        return reads
+
+    def _entry_sets(self, entry):
+        """Names an entry writes to `_set` (and mirrors into variables)."""
+        key = id(entry)
+        sets = self._sets.get(key)
+        if sets is None:
+            sets = assigned_names(entry.node)
+            if entry.kind != KEY:
+                sets.add(entry.name)
+            sets = self._sets[key] = frozenset(sets)
+        return sets
+
+    def _plan(self, entries, local_ctx):
+        """For each entry, `(deps, after)`: it starts once the entries at the indices
+        in `deps` have finished and the first `after` entries are committed."""
+        start_sets = local_ctx.set_items() if local_ctx.has_sets() else ()
+        plain_writers = {}
+        set_writers = {}
+        last_sets = 0
+        plan = []
+        for j, entry in enumerate(entries):
+            reads = self._entry_reads(entry)
+            nested = not isinstance(entry.node, StringNode) and not entry.node.static
+            deps = set()
+            # nested dicts copy the visible `_set` entries and write them back on commit
+            after = last_sets if nested else 0
+            if entry.kind != KEY and entry.kind != SET:
+                # _repeat entries write to the dict scope while they render
+                deps = None
+            elif "_set" in reads or not reads.isdisjoint(start_sets):
+                # visible `_set` entries are mirrored into plain variables on every commit
+                deps = None
+            else:
+                for name in reads:
+                    plain = plain_writers.get(name)
+                    mirrored = set_writers.get(name)
+                    if plain and mirrored:
+                        # which value is visible depends on how many entries have committed
+                        deps = None
+                        break
+                    if mirrored and nested:
+                        # and nested dicts mirror them into their own scope
+                        after = max(after, mirrored[-1] + 1)
+                    deps.update(plain or mirrored or ())
+            if deps is None:
+                plan.append(((), j))
+            else:
+                plan.append((tuple(sorted(deps)), after))
+            for name in self._entry_sets(entry):
+                writers = set_writers.setdefault(name, [])
+                if writers or name in start_sets:
+                    # replaces a visible value, which a nested dict may copy before this commits
+                    last_sets = j + 1
+                writers.append(j)
+            if entry.kind == KEY:
+                plain_writers.setdefault(entry.name, []).append(j)
+        return plan
+
+    def _overlay(self, local_ctx, entries, j, finished):
+        """Scope for entry `j` to render in, over the dict scope, holding what the finished
+        but uncommitted entries it reads from wrote: `finished` is `(index, base, outcome)`
+        for each of them, in template order."""
+        reads = self._entry_reads(entries[j])
+        view = local_ctx.child()
+        for i, base, outcome in finished:
+            entry = entries[i]
+            kind = entry.kind
+            if kind == KEY or kind == SET:
+                sub_rt, value = outcome
+                # `_set` entries written inside the value are mirrored into variables
+                # on commit; the layers below `base` are the value's own
+                written = {}
+                scope = sub_rt.context
+                while scope is not base:
+                    if scope.sets is not None:
+                        for name in reads.intersection(scope.sets):
+                            written.setdefault(name, scope.sets[name])
+                    scope = scope.parent
+                view.vars.update(written)
+                view[entry.name] = value
+            else:
+                # _repeat entries render on the dict scope itself: only the list is pending
+                view[entry.name] = outcome
+        return view
+
+    def _commit(self, rt, local_ctx, result, entry, outcome):
+        # same context writes, in the same order, as TemplateRuntime._render_dict
+        kind = entry.kind
+        if kind == KEY or kind == SET:
+            sub_rt, value = outcome
+            rt._merge_set(local_ctx, sub_rt.context)
+            local_ctx[entry.name] = value
+            if kind == KEY:
+                result[entry.key] = value
+            else:
+                local_ctx.set_entry(entry.name, value)
+        elif kind == REPEAT:
+            result[entry.key] = outcome
+            local_ctx[entry.key] = outcome
+            rt._mirror_repeat(local_ctx, entry.key, outcome)
+        else:
+            local_ctx.set_entry(entry.name, outcome)
+            local_ctx[entry.name] = outcome
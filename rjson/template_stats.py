@@ -0,0 +1,245 @@
+"""Opt-in render instrumentation.
+
+Pass a `RenderStats` to `TemplateRuntime(..., stats=...)` to record:
+
+- time and counts of the render phases: `tokenize` and `parse` (expression
+  cache misses only; parsing includes constant folding), `evaluate` (one
+  expression, including the functions it calls) and `context_copy` (`_set`
+  entries mirrored into the context, `_repeat` lists copied into `_set`);
+- per function: calls, cumulative latency and errors (awaited time for
+  `async def` functions);
+- per `_repeat`: how often it rendered and the total number of iterations,
+  keyed by its path in the template as a JSON pointer (`*` stands for "every
+  item" of an enclosing repeat).
+
+Without a stats object the runtime only pays an `is not None` check on these
+paths. Iterations rendered in worker processes (`workers=`, `_repeat_parallel`)
+record their function calls in the worker, so those are not counted here.
+Subclasses can override `phase`, `function_call` and `repeat` to forward the
+events elsewhere; `to_prometheus` dumps the counters as Prometheus text.
+"""
+import inspect
+import threading
+import time
+
+from .template_cache import _load_expression
+from .template_compiler import DictNode, ListNode, RepeatNode
+from .template_errors import pointer_token
+
+TOKENIZE = "tokenize"
+PARSE = "parse"
+EVALUATE = "evaluate"
+CONTEXT_COPY = "context_copy"
+PHASES = (TOKENIZE, PARSE, EVALUATE, CONTEXT_COPY)
+
+perf_counter = time.perf_counter
+
+
+class RenderStats:
+    """Counters filled by the runtimes it is passed to; safe to share between threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = {phase: [0, 0.0] for phase in PHASES}   # phase -> [count, seconds]
+            self.functions = {}                                   # name -> [calls, seconds, errors]
+            self.repeats = {}                                     # path -> [renders, iterations]
+
+    # ---------- events ----------
+
+    def phase(self, name, seconds):
+        with self._lock:
+            entry = self.phases.get(name)
+            if entry is None:
+                entry = self.phases[name] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def function_call(self, name, seconds, error=False):
+        with self._lock:
+            entry = self.functions.get(name)
+            if entry is None:
+                entry = self.functions[name] = [0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            if error:
+                entry[2] += 1
+
+    def repeat(self, path, iterations):
+        with self._lock:
+            entry = self.repeats.get(path)
+            if entry is None:
+                entry = self.repeats[path] = [0, 0]
+            entry[0] += 1
+            entry[1] += iterations
+
+    # ---------- runtime hooks ----------
+
+    def instrument(self, functions):
+        """Return `functions` wrapped so every call is recorded (idempotent)."""
+        if isinstance(functions, InstrumentedFunctions) and functions.stats is self:
+            return functions
+        return InstrumentedFunctions(functions, self)
+
+    def instrument_cache(self, cache):
+        """Return a view of an ExpressionCache that times tokenizing and parsing on misses (idempotent)."""
+        if isinstance(cache, _TimedExpressionCache) and cache.stats is self:
+            return cache
+        return _TimedExpressionCache(cache, self)
+
+    def index(self, root):
+        """Record on the `_repeat` nodes under a compiled root their path in the template.
+
+        Paths live on the nodes, so nothing is kept once the template is gone.
+        """
+        _set_repeat_paths(root, "")
+
+    def path_of(self, node):
+        return node.path if node.path is not None else "?"
+
+    # ---------- output ----------
+
+    def snapshot(self):
+        """Plain-dict copy of the counters."""
+        with self._lock:
+            return {
+                "phases": {k: {"count": c, "seconds": s} for k, (c, s) in self.phases.items()},
+                "functions": {k: {"calls": c, "seconds": s, "errors": e}
+                              for k, (c, s, e) in self.functions.items()},
+                "repeats": {k: {"renders": r, "iterations": i} for k, (r, i) in self.repeats.items()},
+            }
+
+    def to_prometheus(self, prefix="rjson"):
+        """Counters in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+
+        def family(name, help_text, label, rows):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in rows:
+                lines.append(f'{metric}{{{label}="{_escape_label(key)}"}} {value!r}')
+
+        phases = snap["phases"]
+        functions = snap["functions"]
+        repeats = snap["repeats"]
+        family("phase_seconds_total", "Time spent per render phase.", "phase",
+               [(k, v["seconds"]) for k, v in phases.items()])
+        family("phase_count_total", "Number of timed operations per render phase.", "phase",
+               [(k, v["count"]) for k, v in phases.items()])
+        family("function_calls_total", "Calls per template function.", "function",
+               [(k, v["calls"]) for k, v in sorted(functions.items())])
+        family("function_seconds_total", "Cumulative latency per template function.", "function",
+               [(k, v["seconds"]) for k, v in sorted(functions.items())])
+        family("function_errors_total", "Calls per template function that raised.", "function",
+               [(k, v["errors"]) for k, v in sorted(functions.items())])
+        family("repeat_renders_total", "Times each _repeat was rendered.", "path",
+               [(k, v["renders"]) for k, v in sorted(repeats.items())])
+        family("repeat_iterations_total", "Iterations rendered per _repeat.", "path",
+               [(k, v["iterations"]) for k, v in sorted(repeats.items())])
+        return "\n".join(lines) + "\n"
+
+
+def to_prometheus(stats, prefix="rjson"):
+    """Dump a RenderStats as a Prometheus-style text snapshot."""
+    return stats.to_prometheus(prefix)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _set_repeat_paths(node, path):
+    if isinstance(node, RepeatNode):
+        if node.path is not None:
+            # set by an earlier render; so is everything below it
+            return
+        _set_repeat_paths(node.body, path + "/*")
+        node.path = path
+    elif isinstance(node, DictNode):
+        for entry in node.entries:
+            _set_repeat_paths(entry.node, f"{path}/{pointer_token(entry.key)}")
+    elif isinstance(node, ListNode):
+        for i, item in enumerate(node.items):
+            _set_repeat_paths(item, f"{path}/{i}")
+
+
+class InstrumentedFunctions:
+    """Function mapping whose lookups return call-recording wrappers."""
+    __slots__ = ("functions", "stats", "_wrapped")
+
+    def __init__(self, functions, stats):
+        self.functions = functions
+        self.stats = stats
+        self._wrapped = {}
+
+    def __bool__(self):
+        return True
+
+    def __contains__(self, name):
+        return name in self.functions
+
+    def items(self):
+        # the original callables, so `async def` functions are still recognised
+        return self.functions.items()
+
+    def get(self, name, default=None):
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            fn = self.functions.get(name)
+            if fn is None:
+                return default
+            wrapped = self._wrapped[name] = _record_calls(name, fn, self.stats)
+        return wrapped
+
+
+def _record_calls(name, fn, stats):
+    def recorded(*args):
+        start = perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            stats.function_call(name, perf_counter() - start, True)
+            raise
+        if inspect.isawaitable(result):
+            return _record_await(name, result, start, stats)
+        stats.function_call(name, perf_counter() - start)
+        return result
+    return recorded
+
+
+async def _record_await(name, awaitable, start, stats):
+    try:
+        result = await awaitable
+    except Exception:
+        stats.function_call(name, perf_counter() - start, True)
+        raise
+    stats.function_call(name, perf_counter() - start)
+    return result
+
+
+class _TimedExpressionCache:
+    """ExpressionCache view that records tokenize/parse time for the strings it loads."""
+
+    def __init__(self, cache, stats):
+        self.cache = cache
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def _load(self, source):
+        return _load_expression(source, self.stats.phase)
+
+    def lookup(self, source):
+        return self.cache.get_or_load(source, self._load)
+
+    def parse(self, source):
+        return self.lookup(source).ast
+
+    def compile(self, source):
+        return self.lookup(source).fn
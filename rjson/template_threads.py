@@ -0,0 +1,211 @@
+"""Thread-pool rendering of sibling dict entries that call (blocking) functions.
+
+With `TemplateRuntime(..., threads=N)`, `render` schedules the entries of a
+dict like `render_async` does (see `template_siblings`): an entry starts as
+soon as the entries it reads from have finished, and every entry is
+committed to the dict scope in template order, so key order and `_set`
+visibility are the same as rendering sequentially.
+
+Entries whose subtree calls a function are rendered on a pool of `N`
+threads, and everything else renders inline. A nested dict that calls
+functions is scheduled the same way as its parent, without a thread of its
+own: each dict's progress is driven by the completion of its entries, so
+nothing ever waits on the pool but the caller of `render`. Subtrees handed
+to the pool render sequentially inside their thread. I/O bound templates
+finish in roughly the time of their longest chain of dependent calls.
+Functions must be safe to call from several threads.
+"""
+from concurrent.futures import Future, TimeoutError
+from threading import RLock
+
+from .template_analysis import called_functions
+from .template_budget import DEADLINE
+from .template_compiler import DictNode, KEY, SET
+from .template_errors import located
+from .template_siblings import SiblingScheduler
+
+
+def _render_value(rt, node):
+    return rt, rt.render_node(node)
+
+
+class ThreadScheduler(SiblingScheduler):
+    """State of one threaded `render` call: the executor and per-node analysis."""
+
+    def __init__(self, executor):
+        super().__init__()
+        self.executor = executor
+        self.lock = RLock()
+        self._calls = {}
+
+    def calls_functions(self, node):
+        key = id(node)
+        result = self._calls.get(key)
+        if result is None:
+            result = self._calls[key] = bool(called_functions(node))
+        return result
+
+    def _start(self, rt, entry, base):
+        """Start rendering an entry against `base`; returns a Future of what `_commit` needs."""
+        is_value = entry.kind == KEY or entry.kind == SET
+        node = entry.node
+        if self.calls_functions(node):
+            worker = rt._spawn(base)
+            worker.scheduler = None
+            if is_value:
+                return self.executor.submit(_render_value, worker, node)
+            return self.executor.submit(worker._render_repeat_entry, base, node, entry.name)
+        # cheap: render now, commit in turn
+        future = Future()
+        try:
+            if is_value:
+                sub_rt = rt._spawn(base)
+                future.set_result((sub_rt, sub_rt.render_node(node)))
+            else:
+                future.set_result(rt._render_repeat_entry(base, node, entry.name))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def render_dict(self, rt, node):
+        state = _DictRender(self, rt, node)
+        budget = rt.budget
+        try:
+            state.advance()
+            try:
+                _, result = state.done.result(None if budget is None else budget.remaining())
+            except TimeoutError:
+                error = budget.exceeded(DEADLINE)
+                for entry in reversed(state.stalled()):
+                    error = located(error, entry.key, entry.node)
+                raise error from None
+        except BaseException:
+            state.cancel()
+            raise
+        return result
+
+
+class _DictRender:
+    """One dict being rendered by a ThreadScheduler.
+
+    `advance` starts every entry the plan allows and commits finished
+    entries in order; it runs whenever one of the entries finishes, in the
+    thread that finished it. `done` resolves to `(rt, result)`, with
+    `rt.context` the dict scope, like a rendered KEY entry.
+    """
+
+    def __init__(self, scheduler, rt, node):
+        self.scheduler = scheduler
+        self.rt = rt
+        self.entries = node.entries
+        self.local_ctx = rt.context.child()
+        self.plan = scheduler._plan(self.entries, self.local_ctx)
+        self.result = {}
+        self.futures = [None] * len(self.entries)
+        self.bases = [None] * len(self.entries)
+        self.waiting = list(range(len(self.entries)))
+        self.nested = {}
+        self.committed = 0
+        self.done = Future()
+        self._busy = False
+        self._again = False
+
+    def advance(self, _future=None):
+        with self.scheduler.lock:
+            if self._busy:
+                # called back from inside _step (an entry finished right away)
+                self._again = True
+                return
+            self._busy = True
+            try:
+                self._again = True
+                while self._again and not self.done.done():
+                    self._again = False
+                    self._step()
+            finally:
+                self._busy = False
+
+    def _step(self):
+        entries = self.entries
+        futures = self.futures
+        while self.committed < len(entries):
+            future = futures[self.committed]
+            if future is None or not future.done():
+                break
+            entry = entries[self.committed]
+            try:
+                outcome = future.result()
+            except BaseException as e:
+                self._fail(located(e, entry.key, entry.node))
+                return
+            self.scheduler._commit(self.rt, self.local_ctx, self.result, entry, outcome)
+            self.committed += 1
+        if self.committed == len(entries):
+            self.rt.context = self.local_ctx
+            self.done.set_result((self.rt, self.result))
+            return
+        waiting = []
+        for j in self.waiting:
+            if self._ready(j):
+                self._start(j)
+            else:
+                waiting.append(j)
+        self.waiting = waiting
+
+    def _ready(self, j):
+        deps, after = self.plan[j]
+        if self.committed < after:
+            return False
+        futures = self.futures
+        for i in deps:
+            future = futures[i]
+            if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+                # a failed entry is raised when its turn to commit comes; nothing after it starts
+                return False
+        return True
+
+    def _start(self, j):
+        finished = [(i, self.bases[i], self.futures[i].result()) for i in self.plan[j][0] if i >= self.committed]
+        if finished:
+            base = self.scheduler._overlay(self.local_ctx, self.entries, j, finished)
+        else:
+            base = self.local_ctx
+        self.bases[j] = base
+        entry = self.entries[j]
+        if isinstance(entry.node, DictNode) and self.scheduler.calls_functions(entry.node):
+            # scheduled like this dict, so its entries run alongside the ones here
+            nested = self.nested[j] = _DictRender(self.scheduler, self.rt._spawn(base), entry.node)
+            nested.advance()
+            future = nested.done
+        else:
+            future = self.scheduler._start(self.rt, entry, base)
+        self.futures[j] = future
+        if future.done():
+            self._again = True
+        else:
+            future.add_done_callback(self.advance)
+
+    def _fail(self, error):
+        self.done.set_exception(error)
+        self._cancel_started()
+
+    def cancel(self):
+        with self.scheduler.lock:
+            self.done.cancel()
+            self._cancel_started()
+
+    def _cancel_started(self):
+        for nested in self.nested.values():
+            nested.cancel()
+        for future in self.futures:
+            if future is not None:
+                future.cancel()
+
+    def stalled(self):
+        """The entries, outermost first, that the render is waiting on to commit next."""
+        chain = []
+        state = self
+        while state is not None and state.committed < len(state.entries):
+            chain.append(state.entries[state.committed])
+            state = state.nested.get(state.committed)
+        return chain
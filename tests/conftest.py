@@ -0,0 +1,129 @@
+"""Shared fixtures: templates with the output the original renderer produced for them.
+
+`SAMPLES` are `(template, context, expected)`; `expected` was recorded from
+the renderer before any of the caching, compilation and scheduling work, so
+every rendering path is checked against the same baseline.
+"""
+import pytest
+
+FUNCTIONS = {
+    "len": lambda x: len(x) if x is not None else 0,
+    "add": lambda a, b: a + b,
+    "up": lambda s: str(s).upper(),
+    "pair": lambda a, b: [a, b],
+}
+
+SAMPLES = [
+    (
+        {'greeting': 'Hello $user.name!', 'next': '$n + 1', 'half': '$n / 2', 'static': {'a': [1, 2]}},
+        {'user': {'name': 'Ann'}, 'n': 3},
+        {'greeting': 'Hello Ann', 'next': 4, 'half': 1.5, 'static': {'a': [1, 2]}},
+    ),
+    (
+        {'rows': {'_repeat': 3,
+                  'i': '$_index',
+                  'sq': '$_index * $_index',
+                  'label': 'row $_index of $_repeat'}},
+        {},
+        {'rows': [{'i': 0, 'sq': 0, 'label': 'row 03'},
+                  {'i': 1, 'sq': 1, 'label': 'row 13'},
+                  {'i': 2, 'sq': 4, 'label': 'row 23'}]},
+    ),
+    (
+        {'_set.total': 0,
+         'items': {'_repeat': 4,
+                   '_set.total': '$_set.total + $_index',
+                   'running': '$_set.total',
+                   'seen': '$len($items)'},
+         'final': '$_set.total',
+         'count': '$len($items)'},
+        {},
+        {'items': [{'running': 0, 'seen': 0},
+                   {'running': 1, 'seen': 1},
+                   {'running': 3, 'seen': 2},
+                   {'running': 6, 'seen': 3}],
+         'final': 6,
+         'count': 4},
+    ),
+    (
+        {'size': "$n > 2 ? 'big' : 'small'", 'cmp': '$n == 3', 'lt': "$n <= 'x'", 'arr': "$[1, $n, 'x']"},
+        {'n': 3},
+        {'size': 'big', 'cmp': True, 'lt': False, 'arr': [1, 3, 'x']},
+    ),
+    (
+        {'up': '$up($user.name)',
+         'pair': '$pair($n, $add($n, 1))',
+         'first': '$rows[0].k',
+         'last': '$rows[1].k'},
+        {'user': {'name': 'bob'}, 'n': 2, 'rows': [{'k': 1}, {'k': 2}]},
+        {'up': 'BOB', 'pair': [2, 3], 'first': 1, 'last': 2},
+    ),
+    (
+        ['$n', {'a': '$n * 2', 'b': ['plain', "$up('x')"]}, 'text $n text', 4.5, None, True],
+        {'n': 7},
+        [7, {'a': 14, 'b': ['plain', 'X']}, 'text 7', 4.5, None, True],
+    ),
+    (
+        {'a': '$x', 'b': {'c': '$a + 1', '_set.d': '$c * 10', 'e': '$d'}, 'f': '$b.c', 'g': '$_set.d'},
+        {'x': 1},
+        {'a': 1, 'b': {'c': 2, 'e': 20}, 'f': 2, 'g': 20},
+    ),
+    (
+        {'list': {'_repeat': '$n', 'v': '$_index', 'prev': '$_index > 0 ? $list[$_index - 1].v : 0 - 1'},
+         'n': '$n'},
+        {'n': 5},
+        {'list': [{'v': 0, 'prev': -1},
+                  {'v': 1, 'prev': 0},
+                  {'v': 2, 'prev': 1},
+                  {'v': 3, 'prev': 2},
+                  {'v': 4, 'prev': 3}],
+         'n': 5},
+    ),
+    (
+        {'_set.names': {'_repeat': 2, 'name': 'n$_index'}, 'names': '$_set.names', 'k': '$names[1].name'},
+        {},
+        {'names': [{'name': 'n0'}, {'name': 'n1'}], 'k': 'n1'},
+    ),
+    (
+        {'s': "$'a' + 'b' + $n", 'num': '$(2 * 3) + $n', 'f': '$n / 4', 'neg': '$n - 10', 'mix': "$'3' * 2"},
+        {'n': 2},
+        {'s': 'ab2', 'num': 8, 'f': 0.5, 'neg': -8, 'mix': 6},
+    ),
+    (
+        {'outer': {'_repeat': 2, 'inner': {'_repeat': 2, 'ij': '$_index'}, 'i': '$_index'}},
+        {},
+        {'outer': [{'inner': [{'ij': 0}, {'ij': 1}], 'i': 0}, {'inner': [{'ij': 0}, {'ij': 1}], 'i': 1}]},
+    ),
+    (
+        {'u': '$user', 't': '$user.tags', 'r': {'_repeat': 2, 'row': '$rows[0]'}},
+        {'user': {'name': 'a', 'tags': ['x']}, 'rows': [{'k': 1}]},
+        {'u': {'name': 'a', 'tags': ['x']}, 't': ['x'], 'r': [{'row': {'k': 1}}, {'row': {'k': 1}}]},
+    ),
+]
+
+
+@pytest.fixture(params=range(len(SAMPLES)), ids=lambda i: f"sample{i}")
+def sample(request):
+    """A `(template, context, expected)` triple from SAMPLES."""
+    return SAMPLES[request.param]
+
+
+@pytest.fixture
+def functions():
+    return dict(FUNCTIONS)
+
+
+@pytest.fixture
+def registry():
+    """The global `rjson.functions` table, restored (with the memoized function caches) afterwards."""
+    from rjson import helpers
+    saved = dict(dict.items(helpers.functions))
+    pending = dict(helpers.functions._pending)
+    caches = dict(helpers.function_caches)
+    yield helpers.functions
+    helpers.teardown_addons()
+    helpers.functions.clear()
+    dict.update(helpers.functions, saved)
+    helpers.functions._pending.update(pending)
+    helpers.function_caches.clear()
+    helpers.function_caches.update(caches)
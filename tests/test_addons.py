@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from rjson import TemplateRuntime, load_addon, load_addon_lazy, load_addons_from_dir
+from rjson import helpers
+from rjson.helpers import scan_addon
+
+
+def _addon(path, body, marker):
+    # the addon records its import in the environment
+    path.write_text(f"import os\nos.environ[{marker!r}] = '1'\n" + body)
+    return str(path)
+
+
+@pytest.fixture
+def markers(monkeypatch):
+    names = []
+
+    def marker(name):
+        key = f"RJSON_TEST_LOADED_{name}"
+        monkeypatch.delenv(key, raising=False)
+        names.append(key)
+        return key
+    yield marker
+    for key in names:
+        os.environ.pop(key, None)
+
+
+@pytest.mark.parametrize("body,names", [
+    ("functions = {'a': len, 'b': len}\nfunctions['c'] = len\n", ["a", "b", "c"]),
+    ("functions = dict(a=len)\n", ["a"]),
+    ("def register(funcs):\n    funcs['a'] = len\n    funcs['b'] = len\n", ["a", "b"]),
+    ("def register(funcs):\n    funcs.update(a=len)\n    return ['a']\n", None),
+    ("def register(funcs):\n    return ['x', 'y']\n", ["x", "y"]),
+    ("functions = {}\nfor n in 'ab':\n    functions[n] = len\n", None),
+    ("functions = {'a': len}\nfunctions.update(b=len)\n", None),
+    ("from os.path import *\nfunctions = {'a': len}\n", None),
+])
+def test_scan_addon(tmp_path, body, names):
+    path = tmp_path / "addon.py"
+    path.write_text(body)
+    assert scan_addon(str(path)) == names
+
+
+def test_lazy_addon_is_imported_on_first_lookup(tmp_path, registry, markers):
+    key = markers("lazy")
+    path = _addon(tmp_path / "lazy.py", "functions = {'twice': lambda x: x * 2}\n", key)
+    assert load_addon_lazy(path) == ["twice"]
+    assert key not in os.environ
+    assert "twice" in registry and "twice" in registry.names() and registry.pending() == [os.path.abspath(path)]
+    out = TemplateRuntime({}, registry).render({"v": "$twice(21)"})
+    assert out == {"v": 42} and os.environ[key] == "1" and registry.pending() == []
+
+
+def test_lazy_and_eager_loading_agree(tmp_path, registry, markers):
+    first = _addon(tmp_path / "first.py", "functions = {'name': lambda: 'first', 'only1': lambda: 1}\n", markers("f"))
+    second = _addon(tmp_path / "second.py", "def register(funcs):\n    funcs['name'] = lambda: 'second'\n",
+                    markers("s"))
+    template = {"name": "$name()", "one": "$only1()"}
+    load_addon(first)
+    load_addon(second)
+    eager = TemplateRuntime({}, registry).render(template)
+    registry.clear()
+    load_addon_lazy(first)
+    load_addon_lazy(second)
+    assert TemplateRuntime({}, registry).render(template) == eager == {"name": "second", "one": 1}
+    # an explicit assignment replaces a pending declaration
+    load_addon_lazy(first)
+    registry["name"] = lambda: "mine"
+    assert TemplateRuntime({}, registry).render(template) == {"name": "mine", "one": 1}
+
+
+def test_enumerating_loads_pending_addons(tmp_path, registry, markers):
+    key = markers("enum")
+    load_addon_lazy(_addon(tmp_path / "enum.py", "functions = {'e': len}\n", key))
+    assert key not in os.environ
+    assert "e" in dict(registry.items())
+    assert os.environ[key] == "1"
+
+
+def test_manifest_skips_unchanged_files(tmp_path, registry, markers, monkeypatch):
+    addons = tmp_path / "addons"
+    addons.mkdir()
+    _addon(addons / "one.py", "functions = {'one': lambda: 1}\n", markers("one"))
+    manifest = tmp_path / "addons.json"
+    load_addons_from_dir(str(addons), lazy=True, manifest=str(manifest))
+    assert json.loads(manifest.read_text())["addons"]["one.py"]["functions"] == ["one"]
+
+    def no_scan(path):
+        raise AssertionError("scanned an unchanged addon")
+    monkeypatch.setattr(helpers, "scan_addon", no_scan)
+    results = load_addons_from_dir(str(addons), lazy=True, manifest=str(manifest))
+    assert list(results.values()) == [["one"]]
+    assert TemplateRuntime({}, registry).render({"v": "$one()"}) == {"v": 1}
+
+
+def test_unscannable_addon_loads_eagerly(tmp_path, registry, markers):
+    key = markers("dyn")
+    path = _addon(tmp_path / "dyn.py", "functions = {}\nfor n in ['d']:\n    functions[n] = len\n", key)
+    assert load_addon_lazy(path) == ["d"]
+    assert os.environ[key] == "1"
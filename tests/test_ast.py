@@ -0,0 +1,61 @@
+import pickle
+
+import pytest
+
+from rjson.template_cache import parse_template_string
+from rjson.template_parser import BinaryOpNode, ExpressionNode, TemplateNode, VariableNode
+
+
+def test_nodes_are_immutable():
+    node = VariableNode("a", [("dot", "b")])
+    with pytest.raises(AttributeError):
+        node.name = "c"
+    with pytest.raises(AttributeError):
+        del node.accessors
+    assert node.accessors == (("dot", "b"),)
+    assert not hasattr(node, "__dict__")
+
+
+def test_structural_equality_and_hashing():
+    a = parse_template_string("$x + 1 ? $f($y.z, [1, 'a']) : $w[0]")
+    b = parse_template_string("$x + 1 ? $f($y.z, [1, 'a']) : $w[0]")
+    assert a == b and hash(a) == hash(b)
+    assert {a: 1}[b] == 1
+    # literals compare by type as well as value
+    assert parse_template_string("$x + 1") != parse_template_string("$x + 1.0")
+    assert BinaryOpNode(1, "+", 1) != BinaryOpNode(True, "+", 1)
+
+
+def test_names_are_interned():
+    a = parse_template_string("$" + "".join(["na", "me"]))
+    b = parse_template_string("$name")
+    assert a.parts[0].expr.name is b.parts[0].expr.name
+
+
+def test_pickle_round_trip():
+    ast = parse_template_string("pre $f($a.b[0], [1, 2]) $x > 2 ? 'y' : 'n'")
+    copy = pickle.loads(pickle.dumps(ast))
+    assert copy == ast and isinstance(copy, TemplateNode)
+    assert isinstance(copy.parts[1], ExpressionNode)
+
+
+# reprs of what the original (mutable, list based) parser produced
+BASELINE = [
+    ("Hello $user.name!",
+     "TemplateNode([TextNode('Hello '), ExpressionNode(VariableNode('user', accessors=[('dot', 'name')]))])"),
+    ("$f($a.b[0], [1, 'x'])",
+     "TemplateNode([ExpressionNode(FunctionCallNode('f', args=[ExpressionNode(VariableNode('a', "
+     "accessors=[('dot', 'b'), ('index', 0)])), ArrayLiteralNode([1, 'x'])], accessors=[]))])"),
+    ("$x > 2 ? 'y' : $z ? 1 : 2",
+     "TemplateNode([ExpressionNode(TernaryOpNode(BinaryOpNode(VariableNode('x', accessors=[]), '>', 2), y, "
+     "ExpressionNode(TernaryOpNode(VariableNode('z', accessors=[]), 1, 2))))])"),
+    ("$a[$i].b + $c * 2 - 1",
+     "TemplateNode([ExpressionNode(BinaryOpNode(VariableNode('a', accessors=[('index', ExpressionNode("
+     "VariableNode('i', accessors=[]))), ('dot', 'b')]), '+', ExpressionNode(BinaryOpNode(BinaryOpNode("
+     "VariableNode('c', accessors=[]), '*', 2), '-', 1))))])"),
+]
+
+
+@pytest.mark.parametrize("source,expected", BASELINE)
+def test_parse_matches_baseline(source, expected):
+    assert repr(parse_template_string(source)) == expected
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime
+
+
+def _render(context, functions, template, **kwargs):
+    return asyncio.run(TemplateRuntime(context, functions).render_async(template, **kwargs))
+
+
+def _as_async(fn):
+    async def call(*args):
+        await asyncio.sleep(0)
+        return fn(*args)
+    return call
+
+
+class InFlight:
+    """Records how many calls of `fetch` were awaited at once, and the order they finished in."""
+
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+        self.order = []
+
+        async def fetch(name):
+            self.now += 1
+            self.peak = max(self.peak, self.now)
+            await asyncio.sleep(0.01)
+            self.now -= 1
+            self.order.append(name)
+            return name
+        self.fetch = fetch
+
+
+def test_samples_match_baseline(sample, functions):
+    template, context, expected = sample
+    assert _render(context, functions, template) == expected
+    async_functions = {name: _as_async(fn) for name, fn in functions.items()}
+    assert _render(context, async_functions, template) == expected
+
+
+def test_independent_siblings_are_awaited_together():
+    fetch = InFlight()
+    # a `_repeat` entry waits for the entries before it, the ones after it do not
+    template = {"rows": {"_repeat": 3, "_repeat_parallel": True, "v": "$fetch($_index)"},
+                "a": "$fetch('a')", "b": "$fetch('b')", "c": {"d": "$fetch('d')"}}
+    out = _render({}, {"fetch": fetch.fetch}, template)
+    assert out == {"rows": [{"v": 0}, {"v": 1}, {"v": 2}], "a": "a", "b": "b", "c": {"d": "d"}}
+    assert fetch.peak == 6
+
+
+def test_max_concurrency():
+    fetch = InFlight()
+    template = {"a": "$fetch('a')", "b": "$fetch('b')", "c": "$fetch('c')"}
+    _render({}, {"fetch": fetch.fetch}, template, max_concurrency=1)
+    assert fetch.peak == 1
+
+
+def test_dependent_keys_wait_for_what_they_read():
+    fetch = InFlight()
+    template = {"a": "$fetch('a')", "b": "$fetch($a + '!')", "_set.s": "$fetch('s')", "c": "$s"}
+    out = _render({}, {"fetch": fetch.fetch}, template)
+    assert out == {"a": "a", "b": "a!", "c": "s"}
+    assert fetch.order.index("a") < fetch.order.index("a!")
+
+
+def test_each_call_runs_once_per_evaluation():
+    calls = []
+
+    async def f(x):
+        calls.append(x)
+        return x
+
+    assert _render({}, {"f": f}, {"v": "$f(1) + $f(2) + $f(3)"}) == {"v": 6}
+    assert calls == [1, 2, 3]
+
+
+def test_errors_carry_the_path():
+    async def boom():
+        raise ValueError("no")
+
+    with pytest.raises(TemplateRenderError) as info:
+        _render({}, {"boom": boom}, {"ok": 1, "rows": {"_repeat": 2, "v": "$boom()"}})
+    assert info.value.path == "/rows/0/v"
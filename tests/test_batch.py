@@ -0,0 +1,58 @@
+from itertools import count
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime, render_many
+from rjson.template_parallel import can_fork
+
+EXECUTORS = [(None, "thread"), (3, "thread")]
+if can_fork():
+    EXECUTORS.append((2, "process"))
+
+TEMPLATE = {"n": "$n", "rows": {"_repeat": "$n", "v": "$_index * $n"}, "static": {"a": [1]}}
+
+
+@pytest.mark.parametrize("workers,executor", EXECUTORS)
+def test_samples_match_baseline(sample, functions, workers, executor):
+    template, context, expected = sample
+    results = list(render_many(template, [context] * 3, workers, functions=functions, executor=executor))
+    assert results == [expected] * 3
+
+
+@pytest.mark.parametrize("workers,executor", EXECUTORS)
+def test_results_are_in_order_and_independent(workers, executor):
+    contexts = [{"n": n} for n in range(20)]
+    results = list(render_many(TEMPLATE, iter(contexts), workers, functions={}, executor=executor, batch_size=4))
+    assert results == [TemplateRuntime(c, {}).render(TEMPLATE) for c in contexts]
+    results[0]["static"]["a"].append(2)
+    assert results[1]["static"] == {"a": [1]}
+
+
+@pytest.mark.parametrize("workers,executor", EXECUTORS)
+def test_error_is_raised_at_the_failing_context(workers, executor):
+    contexts = [{"n": 1}, {"n": 2}, {"n": "x"}, {"n": 3}]
+    results = render_many(TEMPLATE, contexts, workers, functions={}, executor=executor)
+    assert next(results)["n"] == 1
+    assert next(results)["n"] == 2
+    with pytest.raises(TemplateRenderError):
+        next(results)
+
+
+def test_contexts_are_read_ahead_by_a_bounded_amount():
+    pulled = []
+
+    def contexts():
+        for n in count():
+            pulled.append(n)
+            yield {"n": n % 5}
+
+    results = render_many(TEMPLATE, contexts(), 2, functions={}, max_in_flight=3)
+    for _ in range(10):
+        next(results)
+    assert len(pulled) <= 10 + 4
+    results.close()
+
+
+def test_unknown_executor():
+    with pytest.raises(ValueError):
+        render_many(TEMPLATE, [], 2, executor="fiber")
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from rjson import TemplateRuntime, bench
+from rjson.template_runtime import INTERPRETER
+
+
+def test_complexity_labels():
+    assert bench.complexity([(n, 1e-3) for n in (10, 100, 1000)])[1] == "O(1)"
+    assert bench.complexity([(n, n * 1e-6) for n in (10, 100, 1000)])[1] == "O(n)"
+    assert bench.complexity([(n, n * n * 1e-9) for n in (10, 100, 1000)])[1] == "O(n^2)"
+    exponent, label = bench.complexity([(n, n ** 1.5) for n in (10, 100, 1000)])
+    assert label == "O(n^1.50)" and exponent == pytest.approx(1.5)
+
+
+def test_run_filters_and_reports():
+    report = bench.run(quick=True, pattern=r"^lexer\.|^e2e\.repeat\.(10|100)$", min_time=0.001, repeat=2)
+    assert set(report["results"]) == {f"lexer.{name}" for name in bench.EXPRESSIONS} | {"e2e.repeat.10", "e2e.repeat.100"}
+    assert report["curves"]["repeat"]["points"][0][0] == 10
+    assert report["meta"]["quick"] is True
+    json.dumps(report)
+
+
+@pytest.mark.parametrize("template", [
+    bench.nested_template(4), bench.repeat_template(20), bench.context_template(), bench.calls_template(5),
+])
+def test_workloads_render_the_same_on_both_backends(template):
+    context = bench.large_context(10)
+    expected = TemplateRuntime(context, bench.FUNCTIONS, backend=INTERPRETER).render(template)
+    assert TemplateRuntime(context, bench.FUNCTIONS).render(template) == expected
+
+
+def _report(medians, exponent):
+    return {"results": {name: {"median": m} for name, m in medians.items()},
+            "curves": {"repeat": {"label": "O(n)", "exponent": exponent}}}
+
+
+def test_compare(tmp_path, capsys):
+    base = _report({"a": 1.0, "b": 1.0, "c": 1.0}, 1.0)
+    new = _report({"a": 1.05, "b": 1.5, "c": 0.5}, 1.0)
+    report = bench.compare(base, new, threshold=0.1)
+    assert [row["name"] for row in report["slower"]] == ["b"]
+    assert [row["name"] for row in report["faster"]] == ["c"]
+    assert not report["curves"][0]["regressed"]
+
+    base_path, new_path = tmp_path / "base.json", tmp_path / "new.json"
+    base_path.write_text(json.dumps(base))
+    new_path.write_text(json.dumps(new))
+    assert bench.main(["compare", str(base_path), str(new_path)]) == 1
+    assert "slower" in capsys.readouterr().out
+    assert bench.main(["compare", str(base_path), str(base_path)]) == 0
+    new_path.write_text(json.dumps(_report({"a": 1.0}, 2.0)))
+    assert bench.main(["compare", str(base_path), str(new_path)]) == 1
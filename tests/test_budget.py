@@ -0,0 +1,118 @@
+import asyncio
+import pickle
+import threading
+import time
+
+import pytest
+
+from rjson import BudgetExceeded, RenderBudget, TemplateRenderError, TemplateRuntime
+from rjson import template_budget, template_columnar
+from rjson.template_budget import DEADLINE, ITERATIONS, OUTPUT
+
+
+def _stop(template, context=None, functions=None, **kwargs):
+    with pytest.raises(BudgetExceeded) as info:
+        TemplateRuntime(context or {}, functions or {}, **kwargs).render(template)
+    error = info.value
+    return error.limit, error.path, {k: v for k, v in error.stats.items() if k != "elapsed"}
+
+
+def test_samples_match_baseline_within_budget(sample, functions):
+    template, context, expected = sample
+    budget = RenderBudget(max_iterations=100, max_nodes=1000, max_output=10000, timeout=60)
+    assert TemplateRuntime(context, functions, budget=budget).render(template) == expected
+    first = budget.snapshot()
+    # the counters restart with every render
+    assert TemplateRuntime(context, functions, budget=budget).render(template) == expected
+    assert {k: v for k, v in budget.snapshot().items() if k != "elapsed"} == \
+        {k: v for k, v in first.items() if k != "elapsed"}
+
+
+def test_iterations_are_checked_before_rendering():
+    calls = []
+    limit, path, stats = _stop({"a": {"_repeat": "$n", "v": "$f($_index)"}}, {"n": 10 ** 9},
+                               {"f": calls.append}, budget=RenderBudget(max_iterations=1000))
+    assert (limit, path, stats["iterations"]) == (ITERATIONS, "/a", 10 ** 9)
+    assert calls == []
+
+
+@pytest.mark.parametrize("limits", [
+    {"max_nodes": 0}, {"max_nodes": 1}, {"max_nodes": 500}, {"max_nodes": 501},
+    {"max_output": 10 ** 5}, {"max_output": 10 ** 5 + 777}, {"max_nodes": 300, "max_output": 10 ** 5 + 777},
+])
+@pytest.mark.parametrize("body", [
+    {"v": "$_index * 2", "s": 1, "w": "$_index"},
+    {"v": "row-$_index"},
+])
+def test_column_wise_repeats_stop_where_iterations_do(monkeypatch, limits, body):
+    template = {"a": dict(body, _repeat=10 ** 5)}
+    columnar = _stop(template, budget=RenderBudget(**limits))
+    monkeypatch.setattr(template_columnar, "numpy", None)
+    monkeypatch.setattr(template_columnar, "_numpy_missing", True)
+    assert _stop(template, budget=RenderBudget(**limits)) == columnar
+    assert columnar[1].startswith("/a/")
+
+
+def test_output_counts_lengths():
+    limit, path, stats = _stop({"a": "$s", "b": "$s"}, {"s": "x" * 60}, budget=RenderBudget(max_output=100))
+    assert (limit, path, stats["output"]) == (OUTPUT, "/b", 120)
+
+
+def test_timeout_with_a_clock():
+    now = [0.0]
+
+    def clock():
+        now[0] += 1
+        return now[0]
+
+    limit, path, _ = _stop({"a": {"_repeat": 3, "v": "$_index"}, "b": {"_repeat": 3, "v": "$_index"}},
+                           budget=RenderBudget(timeout=1.5, clock=clock))
+    assert (limit, path) == (DEADLINE, "/b")
+
+
+def test_clock_is_read_every_interval(monkeypatch):
+    monkeypatch.setattr(template_budget, "CLOCK_INTERVAL", 10)
+    reads = []
+
+    def clock():
+        reads.append(1)
+        return 0.0
+
+    budget = RenderBudget(timeout=1, clock=clock)
+    TemplateRuntime({}, {}, budget=budget).render({f"k{i}": "$x" for i in range(45)})
+    # the start (when created and when the render starts), then every 10 expressions
+    assert len(reads) == 2 + 4
+
+
+def test_blocking_calls_stop_at_the_deadline():
+    release = threading.Event()
+
+    def hang(x):
+        release.wait(5)
+        return x
+
+    async def ahang(x):
+        await asyncio.sleep(5)
+        return x
+
+    try:
+        started = time.monotonic()
+        limit, path, _ = _stop({"a": "$hang(1)", "b": "$hang(2)"}, {}, {"hang": hang}, threads=2,
+                               budget=RenderBudget(timeout=0.1))
+        assert limit == DEADLINE and path in ("/a", "/b")
+        rt = TemplateRuntime({}, {"ahang": ahang}, budget=RenderBudget(timeout=0.1))
+        with pytest.raises(BudgetExceeded) as info:
+            asyncio.run(rt.render_async({"a": "$ahang(1)"}))
+        assert info.value.limit == DEADLINE
+        assert time.monotonic() - started < 3
+    finally:
+        release.set()
+
+
+def test_error_type_and_pickling():
+    with pytest.raises(TemplateRenderError) as info:
+        TemplateRuntime({}, {}, budget=RenderBudget(max_nodes=1)).render({"a": {"b": ["$x", "$y"]}})
+    error = info.value
+    assert str(error).startswith("Render budget exceeded (nodes) at /a/b/1: iterations=0, nodes=2")
+    copy = pickle.loads(pickle.dumps(error))
+    assert (copy.limit, copy.path, copy.stats) == (error.limit, error.path, error.stats)
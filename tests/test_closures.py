@@ -0,0 +1,52 @@
+import pytest
+
+from rjson import TemplateRuntime
+from rjson.template_cache import parse_template_string
+from rjson.template_closures import compile_ast
+from rjson.template_evaluator import TemplateEvaluator
+from rjson.template_runtime import COMPILED, INTERPRETER
+
+EXPRESSIONS = [
+    "$a", "$a + 1", "$a * $x", "$a / 0", "$'a' + 1", "$'1e3' * 2", "$'abc' - 1", "$a > 'b'",
+    "$[1, 2] < [1, 3]", "$b[$x]", "$b[0]", "$b.k", "$_set.total", "$_set", "$x ? $a : $b",
+    "$pair(1, 2)[0]", "$pair($a, $x)[1.5]", "$up($a)", "$len($b)", "pre $a mid $x!", "$missing",
+    "$(2 * 3) + $a", "$a == 1", "$a != 'x'", "$x <= 2",
+]
+
+CONTEXTS = [
+    {"a": 1, "b": [1, 2, 3], "x": 1},
+    {"a": "s", "x": "2", "b": {"k": 1}, "_set": {"total": 3}},
+    {"a": None, "b": [], "x": None},
+]
+
+
+def _outcome(fn):
+    try:
+        return "ok", fn()
+    except Exception as e:
+        return "error", type(e)
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_closures_match_interpreter(source, functions):
+    ast = parse_template_string(source)
+    fn = compile_ast(ast)
+    for context in CONTEXTS:
+        expected = _outcome(lambda: TemplateEvaluator(context, functions).evaluate(ast))
+        assert _outcome(lambda: fn(context, functions)) == expected
+
+
+def test_backends_match_baseline(sample, functions):
+    template, context, expected = sample
+    assert TemplateRuntime(context, functions, backend=COMPILED).render(template) == expected
+    assert TemplateRuntime(context, functions, backend=INTERPRETER).render(template) == expected
+
+
+def test_literal_asts_compile_to_constants():
+    assert compile_ast(3)({}, {}) == 3
+    assert compile_ast(None)({}, {}) is None
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        TemplateRuntime({}, backend="jit")
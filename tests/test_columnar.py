@@ -0,0 +1,105 @@
+import json
+import math
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime
+from rjson import template_columnar, template_runtime
+from rjson.template_compiler import compile_node
+
+pytest.importorskip("numpy")
+
+CONTEXT = {"k": 7, "f": 1.5, "nan": math.nan, "inf": math.inf, "negz": -0.0, "big": 2 ** 52, "huge": 2 ** 60}
+
+# every one of these bodies is planned column-wise
+COLUMNAR = [
+    "$_index + 1", "$_index / 2", "$_index * 0.5", "$_index + $f", "$k * $_index - $_repeat",
+    "$_index == 2.0", "$_index > 3", "$_index % 3", "$_index * 0.1 + 0.2",
+    "$nan + $_index", "$nan == $nan", "$nan > $_index", "$nan ? 1 : 2", "$inf - $inf", "$negz * $_index",
+    "$_index > 40 ? $_index * 1.5 : $_index", "$_index > 40 ? 'high' : $_index",
+    "row-$_index", "id-$($_index * 0.1)% x", "$k-$($_index / 4)", "$'a' + $_index",
+    "$_index == 70 ? 0 : 100 / ($_index - 70)",
+]
+
+# planned, but a block needs the per-iteration path (or the constants are not plain numbers)
+FALLBACK = [
+    "$10 / ($_index - 70)", "$_index == 63 ? 1 / 0 : 1", "$big * $_index", "$big + $big + $_index",
+    "$huge + $_index", "$_index * 'x'", "$'a' - $_index",
+]
+
+
+def _dump(value):
+    # json keeps 1 and 1.0 apart and writes NaN, Infinity and -0.0
+    return json.dumps(value, sort_keys=True)
+
+
+def _render(template, context=CONTEXT):
+    try:
+        return _dump(TemplateRuntime(dict(context), {}).render(template))
+    except TemplateRenderError as e:
+        return "error", e.path, type(e.cause)
+
+
+@pytest.fixture
+def blocks(monkeypatch):
+    seen = []
+
+    def counting(*args, **kwargs):
+        for rows in template_columnar.iter_columnar(*args, **kwargs):
+            seen.append(len(rows))
+            yield rows
+    monkeypatch.setattr(template_runtime, "iter_columnar", counting)
+    return seen
+
+
+def _without_numpy(monkeypatch):
+    monkeypatch.setattr(template_columnar, "numpy", None)
+    monkeypatch.setattr(template_columnar, "_numpy_missing", True)
+
+
+@pytest.mark.parametrize("expression", COLUMNAR + FALLBACK)
+@pytest.mark.parametrize("count", [64, 200])
+def test_same_output_with_and_without_numpy(monkeypatch, blocks, expression, count):
+    template = {"rows": {"_repeat": count, "v": expression, "s": "static", "i": "$_index"}, "after": "$rows[3]"}
+    columnar = _render(template)
+    assert bool(blocks) == (expression in COLUMNAR)
+    _without_numpy(monkeypatch)
+    assert _render(template) == columnar
+
+
+def test_block_boundaries(monkeypatch, blocks):
+    monkeypatch.setattr(template_columnar, "BLOCK_SIZE", 50)
+    template = {"rows": {"_repeat": 120, "v": "$_index == 110 ? 1 / 0 : $_index / 3"}}
+    error = _render(template)
+    assert error[:2] == ("error", "/rows/110/v") and blocks == [50, 50]
+    template = {"rows": {"_repeat": 120, "v": "$_index * 0.5"}}
+    columnar = _render(template)
+    _without_numpy(monkeypatch)
+    assert _render(template) == columnar
+
+
+def test_int_float_coercion():
+    rows = TemplateRuntime(CONTEXT, {}).render({"rows": {"_repeat": 64, "a": "$_index + 1", "b": "$_index / 1",
+                                                "c": "$_index * 1.0", "d": "$_index > 2"}})["rows"]
+    assert [type(rows[5][key]) for key in "abcd"] == [int, float, float, bool]
+    assert rows[5] == {"a": 6, "b": 5.0, "c": 5.0, "d": True}
+
+
+@pytest.mark.parametrize("body,planned", [
+    ({"v": "$_index"}, True),
+    ({"v": "$f($_index)"}, False),
+    ({"v": "$rows[0]"}, False),
+    ({"a": 1, "v": "$a + 1"}, False),
+    ({"v": "$_set.x"}, False),
+    ({"_set.x": 1, "v": 2}, False),
+])
+def test_plan(body, planned):
+    node = compile_node({"r": dict(body, _repeat=64)}).entries[0].node
+    assert bool(template_columnar.columnar_plan(node)) == planned
+
+
+def test_samples_match_baseline(sample, functions, monkeypatch):
+    # short repeats go column-wise too
+    monkeypatch.setattr(template_columnar, "COLUMNAR_THRESHOLD", 1)
+    template, context, expected = sample
+    assert TemplateRuntime(context, functions).render(template) == expected
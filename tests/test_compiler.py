@@ -0,0 +1,47 @@
+import copy
+
+import pytest
+
+from rjson import CompiledTemplate, TemplateRenderError, TemplateRuntime, compile_template
+from rjson.template_compiler import DictNode, RepeatNode, StaticNode, StringNode, KEY, SET, REPEAT
+
+
+def test_compiled_template_matches_baseline(sample, functions):
+    template, context, expected = sample
+    original = copy.deepcopy(template)
+    compiled = compile_template(template)
+    assert compiled.render(context, functions) == expected
+    assert compiled.render(context, functions) == expected
+    assert TemplateRuntime(context, functions).render(compiled) == expected
+    assert template == original
+
+
+def test_compile_template_returns_compiled_templates_unchanged():
+    compiled = compile_template({"a": "$x"})
+    assert compile_template(compiled) is compiled
+    assert isinstance(compiled, CompiledTemplate)
+
+
+def test_entries_and_static_branches():
+    compiled = compile_template({"a": "$x", "_set.b": 1, "c": {"_repeat": 2, "i": "$_index"}, "d": {"e": [1, "f"]}})
+    root = compiled.root
+    assert isinstance(root, DictNode)
+    assert [(e.kind, e.name) for e in root.entries] == [(KEY, "a"), (SET, "b"), (REPEAT, "c"), (KEY, "d")]
+    assert isinstance(root.entries[0].node, StringNode)
+    assert isinstance(root.entries[2].node, RepeatNode)
+    assert isinstance(root.entries[3].node, StaticNode)
+    assert compile_template({"a": [1, "plain"]}).static
+
+
+def test_static_results_are_independent():
+    compiled = compile_template({"a": {"b": [1, 2]}, "c": "$x"})
+    first = compiled.render({"x": 1})
+    first["a"]["b"].append(3)
+    assert compiled.render({"x": 2}) == {"a": {"b": [1, 2]}, "c": 2}
+
+
+def test_parse_errors_surface_only_when_the_branch_renders():
+    compiled = compile_template({"_repeat": "$n", "bad": "$(1 +"})
+    assert compiled.render({"n": 0}) == []
+    with pytest.raises(TemplateRenderError):
+        compiled.render({"n": 1})
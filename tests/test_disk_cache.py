@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import yaml
+
+from rjson import DiskCache, compile_file, load_and_render_file
+from rjson.template_files import _MAGIC
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("suffix", [".json", ".yaml"])
+def test_samples_match_baseline_through_the_cache(sample, functions, tmp_path, suffix):
+    template, context, expected = sample
+    path = tmp_path / ("template" + suffix)
+    path.write_text(json.dumps(template) if suffix == ".json" else yaml.safe_dump(template, sort_keys=False))
+    cache = DiskCache(tmp_path / "cache")
+    assert compile_file(path, cache).render(context, functions) == expected
+    assert compile_file(path, cache).render(context, functions) == expected
+    assert cache.stats() == {"hits": 1, "misses": 1, "rebuilds": 0}
+
+
+def test_entries_are_keyed_by_contents_and_format(tmp_path):
+    cache = DiskCache(tmp_path)
+    data = b'{"a": "$x"}'
+    assert cache.key(data, "json") != cache.key(data, "yaml")
+    assert cache.key(data, "json") != cache.key(data + b" ", "json")
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    a.write_bytes(data)
+    b.write_bytes(data)
+    compile_file(a, cache)
+    assert compile_file(b, cache).render({"x": 1}) == {"a": 1}
+    assert cache.hits == 1
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:len(data) // 2],
+    lambda data: b"garbage",
+    lambda data: _MAGIC + b"not a pickle",
+])
+def test_bad_entries_are_rebuilt(tmp_path, damage):
+    path = tmp_path / "t.json"
+    path.write_text('{"v": "$n * 2"}')
+    cache = DiskCache(tmp_path / "cache")
+    compile_file(path, cache)
+    entry = cache.path(cache.key(path.read_bytes(), "json"))
+    with open(entry, "rb") as f:
+        data = f.read()
+    with open(entry, "wb") as f:
+        f.write(damage(data))
+    assert compile_file(path, cache).render({"n": 4}) == {"v": 8}
+    assert cache.rebuilds == 1
+    assert compile_file(path, cache).render({"n": 5}) == {"v": 10}
+    assert cache.hits == 1
+
+
+def test_entry_written_for_another_key_is_rejected(tmp_path):
+    cache = DiskCache(tmp_path)
+    first = tmp_path / "first.json"
+    first.write_text('{"v": 1}')
+    key, other = "ab" + "0" * 62, "ab" + "1" * 62
+    cache.put(key, compile_file(first))
+    os.replace(cache.path(key), cache.path(other))
+    assert cache.get(other) is None
+    assert cache.rebuilds == 1 and not os.path.exists(cache.path(other))
+
+
+def test_unwritable_directory_still_compiles(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    path = tmp_path / "t.json"
+    path.write_text('{"v": "$n"}')
+    cache = DiskCache(blocker / "cache")
+    assert compile_file(path, cache).render({"n": 1}) == {"v": 1}
+    assert not cache.put("ab" * 32, compile_file(path))
+
+
+def test_another_process_reuses_the_entry(tmp_path):
+    path = tmp_path / "t.yaml"
+    path.write_text("rows:\n  _repeat: 2\n  v: $_index * $n\n")
+    cache_dir = tmp_path / "cache"
+    assert load_and_render_file(path, {"n": 3}, cache_dir) == {"rows": [{"v": 0}, {"v": 3}]}
+    code = ("import sys, rjson; from rjson.template_files import disk_cache; "
+            "print(rjson.load_and_render_file(sys.argv[1], {'n': 3}, sys.argv[2]), disk_cache(sys.argv[2]).stats())")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, "-c", code, str(path), str(cache_dir)], env=env,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "{'rows': [{'v': 0}, {'v': 3}]} {'hits': 1, 'misses': 0, 'rebuilds': 0}"
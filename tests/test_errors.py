@@ -0,0 +1,67 @@
+import pickle
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime
+
+
+def _error(template, context=None, functions=None):
+    with pytest.raises(TemplateRenderError) as info:
+        TemplateRuntime(context or {}, functions or {}).render(template)
+    return info.value
+
+
+@pytest.mark.parametrize("template,path,expression", [
+    ({"a": {"b": [1, {"c": "$x / 0"}]}}, "/a/b/1/c", "$x / 0"),
+    ({"rows": {"_repeat": 5, "v": "$_index == 3 ? $x / 0 : 1"}}, "/rows/3/v", "$_index == 3 ? $x / 0 : 1"),
+    ({"_set.hidden": "$x / 0"}, "/_set.hidden", "$x / 0"),
+    ({"a/b": {"c~d": "$x / 0"}}, "/a~1b/c~0d", "$x / 0"),
+    (["ok", "$x / 0"], "/1", "$x / 0"),
+    ("$x / 0", "", "$x / 0"),
+])
+def test_path_points_at_the_failing_value(template, path, expression):
+    error = _error(template, {"x": 1})
+    assert error.path == path
+    assert error.expression == expression and error.source == expression
+    assert isinstance(error.cause, ZeroDivisionError) and error.__cause__ is error.cause
+
+
+def test_errors_are_runtime_errors():
+    # code written against the original renderer caught RuntimeError
+    with pytest.raises(RuntimeError):
+        TemplateRuntime({}).render({"a": "$x / 0"})
+
+
+def test_syntax_error_position():
+    error = _error({"a": "$a + (1 *"})
+    assert error.position == 9
+    assert _error({"a": "$f()"}).position is None
+
+
+def test_function_errors():
+    def boom(x):
+        raise ValueError(f"bad {x}")
+
+    error = _error({"k": {"v": "$boom(2)"}}, functions={"boom": boom})
+    assert error.path == "/k/v"
+    assert "bad 2" in str(error.cause)
+
+
+def test_message_is_built_once():
+    error = _error({"a": {"b": "$x / 0"}}, {"x": 1})
+    message = str(error)
+    assert message.startswith('Error during rendering template at /a/b: "$x / 0"')
+    assert str(error) is message
+
+
+def test_non_expression_sources():
+    error = _error({"rows": {"_repeat": "$n"}}, {"n": "x"})
+    assert error.path == "/rows" and error.expression is None
+    assert isinstance(error.cause, ValueError)
+
+
+def test_pickle_keeps_the_path():
+    error = _error({"a": ["$x / 0"]}, {"x": 1})
+    copy = pickle.loads(pickle.dumps(error))
+    assert copy.path == "/a/0" and copy.source == "$x / 0"
+    assert isinstance(copy.cause, ZeroDivisionError)
@@ -0,0 +1,66 @@
+from rjson import ExpressionCache, TemplateRuntime
+from rjson.template_cache import LRUCache, TTLCache, parse_template_string
+from rjson.template_optimizer import fold_constants
+
+
+def test_render_matches_baseline_with_a_private_cache(sample, functions):
+    template, context, expected = sample
+    cache = ExpressionCache()
+    assert TemplateRuntime(context, functions, expression_cache=cache).render(template) == expected
+    # rendering again only hits
+    misses = cache.stats()["misses"]
+    assert TemplateRuntime(context, functions, expression_cache=cache).render(template) == expected
+    assert cache.stats()["misses"] == misses
+
+
+def test_repeat_body_is_parsed_once():
+    cache = ExpressionCache()
+    out = TemplateRuntime({}, expression_cache=cache).render({"_repeat": 50, "v": "$_index * 2"})
+    assert out[49] == {"v": 98}
+    assert cache.stats()["misses"] == 1
+
+
+def test_lookup_returns_the_parsed_ast():
+    cache = ExpressionCache()
+    assert cache.parse("$a + 1") == fold_constants(parse_template_string("$a + 1"))
+    assert cache.lookup("$a + 1") is cache.lookup("$a + 1")
+    assert cache.compile("$a + 1")({"a": 2}, {}) == 3
+
+
+def test_lru_eviction_and_resize():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    cache.resize(1)
+    assert len(cache) == 1 and "c" in cache
+    stats = cache.stats()
+    assert (stats["hits"], stats["evictions"], stats["maxsize"]) == (1, 2, 1)
+
+
+def test_maxsize_zero_disables_storage():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_get_or_load_computes_once():
+    calls = []
+    cache = LRUCache()
+    load = lambda key: calls.append(key) or key * 2
+    assert cache.get_or_load(3, load) == 6
+    assert cache.get_or_load(3, load) == 6
+    assert calls == [3]
+
+
+def test_ttl_expiry():
+    now = [0.0]
+    cache = TTLCache(maxsize=10, ttl=5, timer=lambda: now[0])
+    cache.put("a", 1)
+    now[0] = 4.9
+    assert cache.get("a") == 1
+    now[0] = 5.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,108 @@
+import asyncio
+
+from rjson import TemplateRuntime, cacheable, function_cache_stats, load_addon
+from rjson.helpers import is_pure, memoize
+
+
+def _counted(fn):
+    calls = []
+
+    def counted(*args):
+        calls.append(args)
+        return fn(*args)
+    return counted, calls
+
+
+def test_memoized_function_is_called_once_per_argument():
+    fn, calls = _counted(lambda x: x * 2)
+    memoized = memoize("double", fn)
+    out = TemplateRuntime({}, {"double": memoized}).render({"_repeat": 20, "v": "$double(2)"})
+    assert out == [{"v": 4}] * 20 and len(calls) == 1
+    assert [memoized(3), memoized(3), memoized(3.0), memoized(True)] == [6, 6, 6.0, 2]
+    # 3, 3.0 and True are different keys
+    assert [type(args[0]) for args in calls] == [int, int, float, bool]
+    assert is_pure(memoized)
+
+
+def test_unhashable_arguments_and_errors_are_not_cached():
+    fn, calls = _counted(lambda xs: len(xs) if xs else 1 / 0)
+    memoized = memoize("size", fn)
+    assert memoized([1, 2]) == memoized([1, 2]) == 2
+    assert len(calls) == 2
+    for _ in range(2):
+        try:
+            memoized(())
+        except ZeroDivisionError:
+            pass
+    assert calls.count(((),)) == 2
+
+
+def test_lru_and_ttl_eviction():
+    fn, calls = _counted(lambda x: x)
+    memoized = memoize("ident", fn, maxsize=2)
+    for x in (1, 2, 3, 1):
+        memoized(x)
+    assert calls == [(1,), (2,), (3,), (1,)]
+    stats = function_cache_stats()["ident"]
+    assert stats["evictions"] == 2 and stats["size"] == 2
+
+    now = [0.0]
+    timed = memoize("timed", _counted(lambda: now[0])[0], ttl=10)
+    timed.cache._timer = lambda: now[0]
+    assert timed() == 0.0
+    now[0] = 5.0
+    assert timed() == 0.0
+    now[0] = 10.0
+    assert timed() == 10.0
+    assert function_cache_stats()["timed"]["expirations"] == 1
+
+
+def test_async_functions_are_memoized():
+    calls = []
+
+    async def fetch(x):
+        calls.append(x)
+        return x
+
+    memoized = memoize("fetch", fetch)
+    out = asyncio.run(TemplateRuntime({}, {"fetch": memoized}).render_async({"_repeat": 5, "v": "$fetch(1)"}))
+    assert out == [{"v": 1}] * 5 and calls == [1]
+
+
+def test_load_addon_memoizes_marked_functions(tmp_path, registry):
+    addon = tmp_path / "addon.py"
+    addon.write_text(
+        "from rjson import cacheable\n"
+        "calls = []\n"
+        "@cacheable(maxsize=8)\n"
+        "def slow(x):\n"
+        "    calls.append(x)\n"
+        "    return x + 1\n"
+        "def listed(x):\n"
+        "    calls.append(('listed', x))\n"
+        "    return x\n"
+        "def plain(x):\n"
+        "    return x\n"
+        "pure_functions = ['listed']\n"
+        "functions = {'slow': slow, 'listed': listed, 'plain': plain}\n"
+    )
+    load_addon(str(addon))
+    assert is_pure(registry["slow"]) and is_pure(registry["listed"]) and not is_pure(registry["plain"])
+    template = {"_repeat": 3, "a": "$slow(1)", "b": "$listed(2)"}
+    assert TemplateRuntime({}, registry).render(template) == [{"a": 2, "b": 2}] * 3
+    stats = function_cache_stats()
+    assert stats["slow"]["misses"] == 1 and stats["slow"]["hits"] == 2 and stats["slow"]["maxsize"] == 8
+    assert stats["listed"]["hits"] == 2
+
+
+def test_cacheable_marks_functions():
+    @cacheable
+    def f(x):
+        return x
+
+    @cacheable(ttl=5)
+    def g(x):
+        return x
+
+    assert f.rjson_cache == {"maxsize": 1024, "ttl": None}
+    assert g.rjson_cache == {"maxsize": 1024, "ttl": 5}
@@ -0,0 +1,42 @@
+import pytest
+
+from rjson import TemplateRuntime
+from rjson.template_scope import GrowingListView
+
+
+def test_view_is_a_fixed_prefix():
+    items = [1, 2, 3]
+    view = GrowingListView(items, 2)
+    items.append(4)
+    assert len(view) == 2 and list(view) == [1, 2]
+    assert view[-1] == 2 and view[0:5] == [1, 2]
+    with pytest.raises(IndexError):
+        view[2]
+    assert view == [1, 2] and view != [1, 2, 3] and view < [1, 3]
+    assert view + [9] == [1, 2, 9] and [0] + view == [0, 1, 2] and view * 2 == [1, 2, 1, 2]
+    assert repr(view) == "[1, 2]" and view.to_list() == [1, 2]
+
+
+def test_repeat_reads_the_items_built_so_far():
+    template = {"items": {"_repeat": 4, "n": "$len($items)", "prev": "$_index > 0 ? $items[$_index - 1].n : 0 - 1",
+                          "so_far": "$items"}}
+    out = TemplateRuntime({}, {"len": len}).render(template)["items"]
+    assert [item["n"] for item in out] == [0, 1, 2, 3]
+    assert [item["prev"] for item in out] == [-1, 0, 1, 2]
+    assert out[2]["so_far"] == out[:2] and type(out[2]["so_far"]) is list
+
+
+def test_functions_receive_real_lists():
+    seen = []
+    functions = {"keep": lambda xs: seen.append(xs) or isinstance(xs, list)}
+    out = TemplateRuntime({}, functions).render({"items": {"_repeat": 3, "ok": "$keep($items)"}})
+    assert all(item["ok"] for item in out["items"])
+    assert [len(xs) for xs in seen] == [0, 1, 2]
+    # a function may modify its own argument without touching the items
+    seen[2].append("x")
+    assert len(out["items"]) == 3
+
+
+def test_large_repeat_reading_its_items(functions):
+    out = TemplateRuntime({}, functions).render({"items": {"_repeat": 5000, "n": "$len($items)"}})
+    assert out["items"][-1] == {"n": 4999}
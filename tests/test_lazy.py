@@ -0,0 +1,78 @@
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime, render_lazy
+from rjson.template_lazy import LazyDict, LazyList, materialize_lazy
+
+
+def _read(value, reverse):
+    """Read every key and item of a proxy, innermost last, in the given order."""
+    if isinstance(value, LazyDict):
+        keys = list(value)
+        return {key: _read(value[key], reverse) for key in (reversed(keys) if reverse else keys)}
+    if isinstance(value, LazyList):
+        indexes = range(len(value) - 1, -1, -1) if reverse else range(len(value))
+        items = {i: _read(value[i], reverse) for i in indexes}
+        return [items[i] for i in range(len(value))]
+    return value
+
+
+def test_samples_match_baseline(sample, functions):
+    template, context, expected = sample
+    assert TemplateRuntime(context, functions).render_lazy(template).materialize() == expected
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_access_order_does_not_matter(sample, functions, reverse):
+    template, context, expected = sample
+    assert _read(TemplateRuntime(context, functions).render_lazy(template), reverse) == expected
+
+
+def test_keys_render_on_first_access():
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x
+
+    proxy = TemplateRuntime({"n": 1}, {"f": f}).render_lazy(
+        {"a": "$f($n)", "b": {"c": "$f('c')", "d": "$f('d')"}, "rows": {"_repeat": 5, "v": "$f($_index)"}})
+    assert calls == [] and list(proxy) == ["a", "b", "rows"] and "b" in proxy
+    assert proxy["b"]["d"] == "d" and calls == ["d"]
+    assert proxy["a"] == 1 and proxy["a"] == 1 and calls == ["d", 1]
+    assert proxy["rows"][2] == {"v": 2} and calls == ["d", 1, 0, 1, 2]
+    assert len(proxy["rows"]) == 5 and calls[-2:] == [3, 4]
+    assert repr(proxy["b"]) == "LazyDict({'c': ..., 'd': 'd'})"
+
+
+def test_values_are_captured_at_their_position():
+    template = {"_set.t": 1, "early": "$_set.t", "_set.t2": "$_set.t + 1", "later": "$_set.t2",
+                "sum": "$early + $later"}
+    proxy = render_lazy(template, {}, {})
+    assert proxy["sum"] == 3
+    assert proxy["later"] == 2 and proxy["early"] == 1
+    assert proxy.materialize() == TemplateRuntime({}, {}).render(template)
+
+
+def test_errors_are_raised_on_access():
+    proxy = TemplateRuntime({"x": 1}, {}).render_lazy({"ok": "$x", "bad": "$x / 0", "rows": {"_repeat": 3,
+                                                       "v": "$_index == 1 ? $x / 0 : $_index"}})
+    assert proxy["ok"] == 1
+    with pytest.raises(TemplateRenderError) as info:
+        proxy["bad"]
+    assert info.value.path == "/bad"
+    rows = proxy["rows"]
+    assert rows[0] == {"v": 0}
+    for _ in range(2):
+        with pytest.raises(TemplateRenderError) as info:
+            rows[2]
+        assert info.value.path == "/rows/1/v"
+    with pytest.raises(TemplateRenderError):
+        materialize_lazy(proxy)
+
+
+def test_proxies_do_not_share_with_the_context():
+    context = {"items": [{"k": 1}]}
+    proxy = render_lazy({"a": "$items"}, context, {})
+    proxy["a"][0]["k"] = 2
+    assert context["items"] == [{"k": 1}]
+    assert render_lazy({"a": "$items"}, context, {})["a"] == [{"k": 1}]
@@ -0,0 +1,75 @@
+import pytest
+
+from rjson.template_lexer import Token, TemplateLexer, TokenType, token_repr
+
+# tokens the original character-by-character lexer produced: (type name, value, pos)
+BASELINE = [
+    ('',
+     [('EOF', None, 0)]),
+    ('plain text',
+     [('STRING', 'plain text', 0), ('EOF', None, 10)]),
+    ('Hello $user.name!',
+     [('STRING', 'Hello ', 0), ('DOLLAR', '$', 6), ('IDENTIFIER', 'user', 7), ('DOT', '.', 11), ('IDENTIFIER', 'name', 12), ('IDENTIFIER', '!', 16), ('EOF', None, 17)]),
+    ('$a + 1.5e3',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'a', 1), ('PLUS', '+', 3), ('NUMBER', '1.5e3', 10), ('EOF', None, 10)]),
+    ('$f(1, \'x\', "y")',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'f', 1), ('LPAREN', '(', 2), ('NUMBER', '1', 4), ('COMMA', ',', 4), ('STRING', 'x', 9), ('COMMA', ',', 9), ('STRING', 'y', 14), ('RPAREN', ')', 14), ('EOF', None, 15)]),
+    ('$items[$_index - 1].v',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'items', 1), ('LBRACKET', '[', 6), ('DOLLAR', '$', 7), ('IDENTIFIER', '_index', 8), ('MINUS', '-', 15), ('NUMBER', '1', 18), ('RBRACKET', ']', 18), ('DOT', '.', 19), ('IDENTIFIER', 'v', 20), ('EOF', None, 21)]),
+    ("$a >= 2 ? 'big' : 'small'",
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'a', 1), ('GE', '>=', 3), ('NUMBER', '2', 7), ('QUESTION', '?', 8), ('STRING', 'big', 15), ('COLON', ':', 16), ('STRING', 'small', 25), ('EOF', None, 25)]),
+    ('$x != $y == $z <= 1',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'x', 1), ('NE', '!=', 3), ('DOLLAR', '$', 6), ('IDENTIFIER', 'y', 7), ('EQ', '==', 9), ('DOLLAR', '$', 12), ('IDENTIFIER', 'z', 13), ('LE', '<=', 15), ('NUMBER', '1', 19), ('EOF', None, 19)]),
+    ('pre $a mid $b!',
+     [('STRING', 'pre ', 0), ('DOLLAR', '$', 4), ('IDENTIFIER', 'a', 5), ('IDENTIFIER', 'mid', 7), ('DOLLAR', '$', 11), ('IDENTIFIER', 'b', 12), ('IDENTIFIER', '!', 13), ('EOF', None, 14)]),
+    ('$\'it\\\'s\' + "a\\"b\\n"',
+     [('DOLLAR', '$', 0), ('STRING', "it's", 8), ('PLUS', '+', 9), ('STRING', 'a"b\n', 19), ('EOF', None, 19)]),
+    ("$'unterminated",
+     [('DOLLAR', '$', 0), ('STRING', 'unterminated', 14), ('EOF', None, 14)]),
+    ('cost: $$price',
+     [('STRING', 'cost: ', 0), ('DOLLAR', '$', 6), ('IDENTIFIER', '$price', 7), ('EOF', None, 13)]),
+    ('$a\t+\n$b',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'a', 1), ('PLUS', '+', 3), ('DOLLAR', '$', 5), ('IDENTIFIER', 'b', 6), ('EOF', None, 7)]),
+    ('$²3 + ①',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', '²3', 1), ('PLUS', '+', 4), ('NUMBER', '①', 7), ('EOF', None, 7)]),
+    ('$é.ü',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'é', 1), ('DOT', '.', 2), ('IDENTIFIER', 'ü', 3), ('EOF', None, 4)]),
+    ('$a = 1',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'a', 1), ('EQ', '=', 3), ('NUMBER', '1', 6), ('EOF', None, 6)]),
+    ('$5 items',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', '5', 1), ('IDENTIFIER', 'items', 3), ('EOF', None, 8)]),
+    ('$[1, 2][0]',
+     [('DOLLAR', '$', 0), ('LBRACKET', '[', 1), ('NUMBER', '1', 3), ('COMMA', ',', 3), ('NUMBER', '2', 6), ('RBRACKET', ']', 6), ('LBRACKET', '[', 7), ('NUMBER', '0', 9), ('RBRACKET', ']', 9), ('EOF', None, 10)]),
+    ('trailing $',
+     [('STRING', 'trailing ', 0), ('DOLLAR', '$', 9), ('EOF', None, 10)]),
+    ('$a.b.c[0][1]',
+     [('DOLLAR', '$', 0), ('IDENTIFIER', 'a', 1), ('DOT', '.', 2), ('IDENTIFIER', 'b', 3), ('DOT', '.', 4), ('IDENTIFIER', 'c', 5), ('LBRACKET', '[', 6), ('NUMBER', '0', 8), ('RBRACKET', ']', 8), ('LBRACKET', '[', 9), ('NUMBER', '1', 11), ('RBRACKET', ']', 11), ('EOF', None, 12)]),
+    ('100% $rate% #tag',
+     [('STRING', '100% ', 0), ('DOLLAR', '$', 5), ('IDENTIFIER', 'rate', 6), ('STRING', '% #tag', 10), ('EOF', None, 16)]),
+]
+
+
+@pytest.mark.parametrize("source,expected", BASELINE)
+def test_tokens_match_baseline(source, expected):
+    tokens = TemplateLexer(source).tokenize()
+    assert [(t[0].name, t[1], t[2]) for t in tokens] == expected
+
+
+def test_tokens_are_plain_tuples():
+    lexer = TemplateLexer("$a + 1")
+    tokens = lexer.tokenize()
+    assert Token is tuple and all(type(t) is tuple for t in tokens)
+    assert tokens[-1] == (TokenType.EOF, None, 6)
+    assert lexer.eof()
+
+
+def test_token_repr():
+    assert token_repr((TokenType.PLUS, "+", 3)) == "Token(PLUS, '+')"
+    assert token_repr((TokenType.EOF, None, 0)) == "Token(EOF)"
+
+
+def test_long_template_tokenizes_in_order():
+    source = " ".join(f"$v{i}" for i in range(2000))
+    tokens = TemplateLexer(source).tokenize()
+    names = [t[1] for t in tokens if t[0] is TokenType.IDENTIFIER]
+    assert names == [f"v{i}" for i in range(2000)]
@@ -0,0 +1,134 @@
+import math
+import random
+
+import pytest
+
+from rjson import TemplateRuntime
+from rjson.builtins import numeric
+
+try:
+    import numpy as np
+except ImportError:  # the pure-Python paths are still tested
+    np = None
+
+needs_numpy = pytest.mark.skipif(np is None, reason="numpy is not installed")
+
+NAMES = ["sum", "mean", "min", "max", "cumsum"]
+
+
+@pytest.fixture
+def no_numpy(monkeypatch):
+    monkeypatch.setattr(numeric, "numpy", None)
+    monkeypatch.setattr(numeric, "_numpy_missing", True)
+
+
+def _key(value):
+    # floats by repr so that NaN, -0.0 and int/float differences count
+    if isinstance(value, list):
+        return [_key(v) for v in value]
+    return type(value).__name__, repr(value)
+
+
+def _call(fn, *args):
+    try:
+        return _key(fn(*args))
+    except Exception as e:
+        return "error", type(e)
+
+
+def _inputs():
+    r = random.Random(0)
+    for n in (0, 1, 5, 63, 64, 200):
+        yield [r.randint(-10 ** 6, 10 ** 6) for _ in range(n)]
+        yield [r.uniform(-1e6, 1e6) for _ in range(n)]
+        yield [r.choice([1, 2.5, True, None, "3", "x", "4.5", -0.0]) for _ in range(n)]
+        yield tuple(r.choice([2 ** 62, -2 ** 62, 2 ** 70, 1]) for _ in range(n))
+    yield [1.0, math.nan, 0.0] * 30
+    yield [math.inf, -math.inf, 1.0] * 30
+    yield [0.0, -0.0] * 40
+
+
+INPUTS = list(_inputs())
+
+
+def _results(xs):
+    ys = [1.5] * len(xs)
+    out = [_call(numeric.functions[name], xs) for name in NAMES]
+    out.append(_call(numeric.percentile, xs, 25))
+    out.append(_call(numeric.dot, xs, ys))
+    return out
+
+
+def _fits_array(xs):
+    # all ints or all floats, and ints within int64
+    kinds = set(map(type, xs))
+    return kinds == {float} or kinds == {int} and all(abs(x) < 2 ** 63 for x in xs)
+
+
+@needs_numpy
+def test_results_do_not_depend_on_numpy(monkeypatch):
+    with_numpy = [_results(xs) for xs in INPUTS]
+    arrays = [_results(np.array(xs)) for xs in INPUTS if _fits_array(xs)]
+    monkeypatch.setattr(numeric, "numpy", None)
+    monkeypatch.setattr(numeric, "_numpy_missing", True)
+    assert [_results(xs) for xs in INPUTS] == with_numpy
+    assert [_results(list(xs)) for xs in INPUTS if _fits_array(xs)] == arrays
+
+
+@pytest.mark.parametrize("pure", [False, True])
+def test_coercion_and_edge_cases(request, pure):
+    if pure:
+        request.getfixturevalue("no_numpy")
+    n = numeric.NUMPY_MIN_SIZE
+    assert _key(numeric.sum_([1, 2.5, "3", None, True])) == _key(7.5)
+    assert _key(numeric.sum_(["1", "2"])) == _key(3)
+    assert _key(numeric.sum_([1, 2.0])) == _key(3.0)
+    assert numeric.sum_([0.1] * 10) == 1.0
+    assert numeric.sum_([2 ** 62] * n) == 2 ** 62 * n
+    assert numeric.sum_([1e308, 1e308]) == math.inf
+    assert math.isnan(numeric.sum_([math.inf, -math.inf]))
+    assert math.isnan(numeric.min_([1, math.nan, 0])) and math.isnan(numeric.max_([math.nan] + [1.0] * n))
+    assert numeric.max_(["a", 2]) == 2
+    assert _key(numeric.mean([1, 2])) == _key(1.5)
+    assert _key(numeric.percentile([3, 1, 2], 50)) == _key(2)
+    assert numeric.percentile(list(range(n * 2)), 50) == n - 0.5
+    assert _key(numeric.percentile([-0.0, 0.0] * n, 50)) == _key(0.0)
+    assert numeric.cumsum([1, "2", 0.5]) == [1, 3, 3.5]
+    assert numeric.dot([2 ** 40] * n, [2 ** 40] * n) == 2 ** 80 * n
+    for fn, args in [(numeric.mean, ([],)), (numeric.min_, ([],)), (numeric.percentile, ([1], 101)),
+                     (numeric.dot, ([1], [1, 2])), (numeric.range_, (0, 1, 0))]:
+        with pytest.raises(ValueError):
+            fn(*args)
+
+
+@pytest.mark.parametrize("pure", [False, True])
+def test_range(request, pure):
+    if pure:
+        request.getfixturevalue("no_numpy")
+    assert numeric.range_(5) == [0, 1, 2, 3, 4]
+    assert numeric.range_("3") == [0, 1, 2]
+    assert numeric.range_(0, 1, 0.25) == [0.0, 0.25, 0.5, 0.75]
+    assert numeric.range_(3, 0, -1) == [3, 2, 1]
+    assert _key(numeric.range_(1, 2.0, 0.5)) == _key([1.0, 1.5])
+    assert numeric.range_(0, 100, 0.5) == [i * 0.5 for i in range(200)]
+
+
+@needs_numpy
+def test_numpy_arrays():
+    assert _key(numeric.sum_(np.array([1, 2]))) == _key(3)
+    assert numeric.sum_(np.array([2 ** 62, 2 ** 62])) == 2 ** 63
+    assert numeric.sum_(np.array([2 ** 64 - 1, 1], dtype=np.uint64)) == 2 ** 64
+    assert numeric.sum_(np.array([True, True, False])) == 2
+    assert numeric.max_(np.arange(10).reshape(2, 5)) == 9
+    assert math.isnan(numeric.min_(np.array([1.0, np.nan])))
+    assert numeric.dot(np.array([1, 2]), [3, 4]) == 11
+
+
+def test_templates_use_the_builtins():
+    functions = {}
+    assert numeric.register(functions) == list(numeric.functions)
+    context = {"xs": [3, "1", 2.5, None]}
+    template = {"total": "$sum($xs)", "top": "$max($xs)", "steps": "$cumsum($range(4))",
+                "mid": "$percentile($xs, 50)"}
+    assert TemplateRuntime(context, functions).render(template) == {
+        "total": 6.5, "top": 3, "steps": [0, 1, 3, 6], "mid": 1.75}
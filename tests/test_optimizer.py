@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime, compile_template
+from rjson.template_cache import parse_template_string
+from rjson.template_evaluator import TemplateEvaluator
+from rjson.template_optimizer import fold_constants, is_constant
+from rjson.template_parser import BinaryOpNode, VariableNode
+
+EXPRESSIONS = [
+    "$(1024 * 1024)", "$'a' + 'b'", "$(1 + 2) * $x", "$(1 > 2) ? $x : $y", "$(2 > 1) ? 'yes' : $y",
+    "$(1 / 0)", "$'3' * 2", "$'abc' - 1", "pre $(1 + 1) mid $x post", "$[1, $(2 * 3), $x]",
+    "$f($(1 + 1), $x)", "$x[$(0 + 1)]", "$'1e3' * 2", "$(1 == 1.0)", "$('b' > 'a')", "$(0 * 1.0e999)",
+    "a $('b')% c", "$1024 * 1024",
+]
+
+
+def _outcome(fn):
+    try:
+        value = fn()
+    except Exception as e:
+        return "error", type(e)
+    if isinstance(value, float) and math.isnan(value):
+        return "nan", None
+    return "ok", value
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_folding_keeps_the_value(source):
+    context = {"x": [5, 6], "y": 2, "1024": 3}
+    functions = {"f": lambda *args: list(args)}
+    ast = parse_template_string(source)
+    folded = fold_constants(ast)
+    expected = _outcome(lambda: TemplateEvaluator(context, functions).evaluate(ast))
+    assert _outcome(lambda: TemplateEvaluator(context, functions).evaluate(folded)) == expected
+
+
+def test_constant_expressions_fold_to_literals():
+    assert fold_constants(parse_template_string("$(1024 * 1024)")) == 1048576
+    assert fold_constants(parse_template_string("$'a' + 'b'")) == "ab"
+    assert fold_constants(parse_template_string("a $(1 + 1)% b")) == "a 2% b"
+    assert fold_constants(parse_template_string("$(1 > 2) ? $x : $y")) == VariableNode("y")
+    assert is_constant(fold_constants(parse_template_string("$(2 > 1)")))
+
+
+def test_failing_and_non_constant_operations_are_kept():
+    assert isinstance(fold_constants(parse_template_string("$(1 / 0)")), BinaryOpNode)
+    # `$1024` is the variable named 1024
+    assert isinstance(fold_constants(parse_template_string("$1024 * 1024")), BinaryOpNode)
+    # NaN never equals itself, so it is not stored in the AST
+    assert isinstance(fold_constants(parse_template_string("$(0 * 1.0e999)")), BinaryOpNode)
+
+
+def test_folded_strings_are_static():
+    compiled = compile_template({"a": "$(2 * 3)", "b": "size $(1024 * 1024)% more"})
+    assert compiled.static
+    assert compiled.render() == {"a": 6, "b": "size 1048576% more"}
+    with pytest.raises(TemplateRenderError):
+        TemplateRuntime({}).render({"a": "$(1 / 0)"})
+
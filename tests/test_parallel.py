@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from rjson import TemplateRuntime, cacheable
+from rjson.template_compiler import compile_template
+from rjson.template_parallel import can_fork, iterations_independent
+from rjson.template_scope import Scope
+
+pytestmark = pytest.mark.skipif(not can_fork(), reason="needs the fork start method")
+
+
+def _pid():
+    return os.getpid()
+
+
+def _pure_pid():
+    # `cacheable` marks the function itself, so _pid stays unmarked
+    return cacheable(lambda: os.getpid())
+
+
+def test_samples_match_baseline_with_workers(sample, functions):
+    template, context, expected = sample
+    rt = TemplateRuntime(context, functions, workers=2, parallel_threshold=2)
+    assert rt.render(template) == expected
+
+
+def test_pure_repeat_renders_in_workers_like_sequential():
+    functions = {"pid": _pure_pid(), "sq": cacheable(lambda x: x * x)}
+    template = {"rows": {"_repeat": 40, "i": "$_index", "sq": "$sq($_index)", "pid": "$pid()",
+                         "_set.last": "$_index"},
+                "last": "$_set.last"}
+    out = TemplateRuntime({}, functions, workers=2, parallel_threshold=10).render(template)
+    sequential = TemplateRuntime({}, functions).render(template)
+    assert [(r["i"], r["sq"]) for r in out["rows"]] == [(r["i"], r["sq"]) for r in sequential["rows"]]
+    assert out["last"] == sequential["last"] == 39
+    assert os.getpid() not in {r["pid"] for r in out["rows"]}
+
+
+def test_impure_functions_keep_the_repeat_sequential():
+    template = {"_repeat": 40, "pid": "$pid()"}
+    out = TemplateRuntime({}, {"pid": _pid}, workers=2, parallel_threshold=10).render(template)
+    assert {r["pid"] for r in out} == {os.getpid()}
+
+
+def test_repeat_parallel_hint():
+    functions = {"pid": _pid}
+    forced = TemplateRuntime({}, functions, workers=2).render({"_repeat": 8, "_repeat_parallel": True, "pid": "$pid()"})
+    assert os.getpid() not in {r["pid"] for r in forced}
+    off = TemplateRuntime({}, {"pid": _pure_pid()}, workers=2, parallel_threshold=2).render(
+        {"_repeat": 8, "_repeat_parallel": False, "pid": "$pid()"})
+    assert {r["pid"] for r in off} == {os.getpid()}
+    # only `_repeat*` keys are directives
+    assert TemplateRuntime({}).render({"_repeat": 1, "_parallel": False}) == [{"_parallel": False}]
+
+
+def test_dependent_iterations_are_not_independent():
+    pure = {"f": cacheable(lambda x: x)}
+
+    def independent(body, name="rows", ctx=None):
+        node = compile_template({"_repeat": 3, **body}).root
+        return iterations_independent(node, name, ctx or Scope({}), pure)
+
+    assert independent({"v": "$f($_index)"})
+    assert not independent({"v": "$len($rows)"})
+    assert not independent({"_set.t": "$_set.t + 1"})
+    assert not independent({"v": "$g($_index)"})
+    assert not independent({"v": "$t"}, ctx=Scope({"_set": {"t": 1}}))
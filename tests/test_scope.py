@@ -0,0 +1,80 @@
+import copy
+
+import rjson
+from rjson import TemplateRuntime, render_template_obj
+from rjson.template_scope import Scope, detach
+
+
+def test_child_writes_do_not_reach_parent():
+    root = Scope({"a": 1})
+    child = root.child()
+    child["a"] = 2
+    child["b"] = 3
+    assert root["a"] == 1 and "b" not in root
+    assert child["a"] == 2 and child.to_dict() == {"a": 2, "b": 3}
+
+
+def test_set_entries_are_layered():
+    root = Scope({"_set": {"x": 1}})
+    child = root.child()
+    child.set_entry("y", 2)
+    assert dict(child["_set"]) == {"x": 1, "y": 2}
+    assert dict(root["_set"]) == {"x": 1}
+
+
+def test_samples_match_baseline_and_leave_context_untouched(sample, functions):
+    template, context, expected = sample
+    original = copy.deepcopy(context)
+    assert TemplateRuntime(context, functions).render(template) == expected
+    assert context == original
+
+
+def test_render_does_not_modify_context():
+    ctx = {"user": {"name": "a", "tags": ["x"]}, "n": 2}
+    orig = copy.deepcopy(ctx)
+    template = {"u": "$user", "_set.s": "$user", "s": "$s", "r": {"_repeat": 2, "t": "$user.tags"}}
+    render_template_obj(template, ctx)
+    assert ctx == orig
+
+
+def test_output_does_not_alias_context():
+    ctx = {"user": {"name": "a", "tags": ["x"]}, "rows": [{"k": 1}]}
+    orig = copy.deepcopy(ctx)
+    template = {"u": "$user", "t": "$user.tags", "r": {"_repeat": 2, "row": "$rows[0]", "all": "$rows"}}
+    for rt in (TemplateRuntime(ctx, rjson.functions), TemplateRuntime(ctx, rjson.functions, threads=2)):
+        out = rt.render(template)
+        out["u"]["name"] = "b"
+        out["t"].append("y")
+        out["r"][0]["row"]["k"] = 5
+        out["r"][1]["all"].append(None)
+        assert ctx == orig
+
+
+def test_large_list_is_copied_once_per_render():
+    catalog = list(range(10000))
+    ctx = {"catalog": catalog}
+    out = render_template_obj({"r": {"_repeat": 50, "items": "$catalog"}}, ctx)
+    first = out["r"][0]["items"]
+    assert first == catalog and first is not catalog
+    assert all(item["items"] is first for item in out["r"])
+    # a second render gets copies of its own
+    again = render_template_obj({"r": {"_repeat": 2, "items": "$catalog"}}, ctx)
+    assert again["r"][0]["items"] is not first
+
+
+def test_functions_receive_context_values_uncopied():
+    catalog = [1, 2, 3]
+    seen = []
+    functions = dict(rjson.functions, keep=lambda xs: seen.append(xs) or len(xs))
+    out = TemplateRuntime({"catalog": catalog}, functions).render({"_repeat": 3, "n": "$keep($catalog)"})
+    assert out == [{"n": 3}] * 3
+    assert all(xs is catalog for xs in seen)
+
+
+def test_detach_copies_containers():
+    value = {"a": [1, {"b": 2}]}
+    copied = detach(value)
+    assert copied == value
+    assert copied is not value and copied["a"] is not value["a"] and copied["a"][1] is not value["a"][1]
+    copies = {}
+    assert detach(value, copies) is detach(value, copies)
@@ -0,0 +1,83 @@
+import copy
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime
+from rjson.template_session import RenderSession
+
+
+def _full(template, context, functions):
+    return TemplateRuntime(copy.deepcopy(context), functions).render(copy.deepcopy(template))
+
+
+def test_samples_match_baseline(sample, functions):
+    template, context, expected = sample
+    session = RenderSession(template, context, functions)
+    assert session.result == expected
+    assert session.render() == expected
+
+
+@pytest.mark.parametrize("changes", [
+    [{"n": 5}, {"user": {"name": "Cy"}}, {"n": 5}],
+    [{"rows": [{"k": 9}, {"k": 8}]}, {"n": 0}],
+    [{"unused": 1}, {"n": 2}],
+])
+def test_updates_match_a_full_render(sample, functions, changes):
+    template, context, _ = sample
+    session = RenderSession(template, context, functions)
+    context = dict(context)
+    for change in changes:
+        context.update(change)
+        try:
+            expected = _full(template, context, functions)
+        except TemplateRenderError:
+            with pytest.raises(TemplateRenderError):
+                session.update(change)
+            return
+        session.update(change)
+        assert session.result == expected
+
+
+def test_only_affected_entries_are_rendered():
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x
+
+    template = {"a": "$f($x)", "b": "$f($y)", "nested": {"c": "$f($x + 1)", "d": "$f('d')"},
+                "static": {"s": [1, 2]}}
+    session = RenderSession(template, {"x": 1, "y": 2}, {"f": f})
+    before = session.result
+    calls.clear()
+    assert session.update({"x": 10}) == ["/a", "/nested/c"]
+    assert calls == [10, 11]
+    assert session.result == {"a": 10, "b": 2, "nested": {"c": 11, "d": "d"}, "static": {"s": [1, 2]}}
+    assert session.result["static"] is before["static"]
+    assert before["a"] == 1
+    calls.clear()
+    assert session.update({"x": 10, "y": 2}) == []
+    assert calls == []
+
+
+def test_set_writes_propagate():
+    template = {"_set.total": "$n * 2", "v": "$_set.total + 1", "w": "$m",
+                "rows": {"_repeat": 2, "i": "$_index + $_set.total"}}
+    session = RenderSession(template, {"n": 1, "m": 0}, {})
+    assert session.update({"n": 3}) == ["/v", "/rows"]
+    assert session.result == {"v": 7, "w": 0, "rows": [{"i": 6}, {"i": 7}]}
+    # 6.0 is not the same value as 6
+    assert session.update({"n": 3.0}) == ["/v", "/rows"]
+    assert session.update({"m": 1}) == ["/w"]
+    session.update({"_set": {"total": 1}})
+    assert session.result == _full(template, session.context, {})
+
+
+def test_failed_update_keeps_the_session():
+    session = RenderSession({"v": "$t / $n", "w": "$n"}, {"t": 10, "n": 2}, {})
+    with pytest.raises(TemplateRenderError) as info:
+        session.update({"n": 0})
+    assert info.value.path == "/v"
+    assert session.result == {"v": 5.0, "w": 2} and session.context == {"t": 10, "n": 2}
+    assert session.update({"n": 4}) == ["/v", "/w"]
+    assert session.result == {"v": 2.5, "w": 4}
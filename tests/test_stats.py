@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from rjson import ExpressionCache, RenderStats, TemplateRenderError, TemplateRuntime
+
+
+def test_samples_match_baseline_with_stats(sample, functions):
+    template, context, expected = sample
+    assert TemplateRuntime(context, functions, stats=RenderStats()).render(template) == expected
+
+
+def test_function_calls_and_repeats_are_counted():
+    stats = RenderStats()
+    functions = {"f": lambda x: x, "boom": lambda: 1 / 0}
+    template = {"rows": {"_repeat": 3, "v": "$f($_index)", "sub": {"_repeat": 2, "w": "$f(1)"}}, "x": "$f(0)"}
+    TemplateRuntime({}, functions, stats=stats).render(template)
+    snap = stats.snapshot()
+    assert snap["functions"]["f"]["calls"] == 3 + 6 + 1
+    assert snap["repeats"] == {"/rows": {"renders": 1, "iterations": 3},
+                               "/rows/*/sub": {"renders": 3, "iterations": 6}}
+    assert snap["phases"]["evaluate"]["count"] == 10
+    with pytest.raises(TemplateRenderError):
+        TemplateRuntime({}, functions, stats=stats).render({"a": "$boom()"})
+    assert stats.snapshot()["functions"]["boom"] == {"calls": 1, "seconds": pytest.approx(0, abs=1), "errors": 1}
+
+
+def test_parse_phases_are_timed_on_cache_misses_only():
+    stats = RenderStats()
+    cache = ExpressionCache()
+    for _ in range(2):
+        TemplateRuntime({"a": 1}, {}, expression_cache=cache, stats=stats).render({"v": "$a + 1"})
+    phases = stats.snapshot()["phases"]
+    assert phases["tokenize"]["count"] == 1 and phases["parse"]["count"] == 1
+    assert phases["evaluate"]["count"] == 2
+
+
+def test_async_calls_are_counted():
+    stats = RenderStats()
+
+    async def fetch(x):
+        await asyncio.sleep(0)
+        return x
+
+    rt = TemplateRuntime({}, {"fetch": fetch}, stats=stats)
+    assert asyncio.run(rt.render_async({"a": "$fetch(1)", "b": "$fetch(2)"})) == {"a": 1, "b": 2}
+    assert stats.snapshot()["functions"]["fetch"]["calls"] == 2
+
+
+def test_prometheus_output():
+    stats = RenderStats()
+    TemplateRuntime({}, {"f": lambda: 1}, stats=stats).render({'k"1': {"_repeat": 2, "v": "$f()"}})
+    text = stats.to_prometheus(prefix="app")
+    assert "# TYPE app_function_calls_total counter" in text
+    assert 'app_function_calls_total{function="f"} 2' in text
+    assert 'app_repeat_iterations_total{path="/k\\"1"} 2' in text
+    stats.reset()
+    assert stats.snapshot()["functions"] == {}
+
+
+def test_subclasses_receive_events():
+    events = []
+
+    class Forward(RenderStats):
+        def function_call(self, name, seconds, error=False):
+            events.append((name, error))
+
+    TemplateRuntime({}, {"f": lambda: 1}, stats=Forward()).render({"a": "$f()"})
+    assert events == [("f", False)]
@@ -0,0 +1,51 @@
+import io
+import json
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime, iter_render, render_to_stream
+
+
+def test_iter_render_matches_baseline_json(sample, functions):
+    template, context, expected = sample
+    assert "".join(iter_render(template, context, functions)) == json.dumps(expected)
+    compact = "".join(iter_render(template, context, functions, separators=(",", ":")))
+    assert compact == json.dumps(expected, separators=(",", ":"))
+
+
+def test_render_to_stream_writes_in_buffered_chunks():
+    template = {"rows": {"_repeat": 200, "i": "$_index", "label": "row-$_index"}, "n": "$len($rows)"}
+    expected = json.dumps(TemplateRuntime({}, {"len": len}).render(template))
+    writes = []
+
+    class Recorder(io.StringIO):
+        def write(self, s):
+            writes.append(len(s))
+            return super().write(s)
+
+    fp = Recorder()
+    assert render_to_stream(template, fp, {}, {"len": len}, buffer_size=256) == len(expected)
+    assert fp.getvalue() == expected
+    assert len(writes) > 1 and all(n >= 256 for n in writes[:-1])
+
+
+def test_repeat_items_are_encoded_as_they_render():
+    calls = []
+    functions = {"f": lambda i: calls.append(i) or i}
+    chunks = iter_render({"rows": {"_repeat": 1000, "v": "$f($_index)"}}, {}, functions)
+    head = "".join(next(chunks) for _ in range(5))
+    assert head.startswith('{"rows": [{"v": 0}')
+    assert len(calls) < 1000
+
+
+def test_ensure_ascii_and_default():
+    assert "".join(iter_render({"s": "$x"}, {"x": "é"}, ensure_ascii=False)) == '{"s": "é"}'
+    out = "".join(iter_render({"s": "$x"}, {"x": {1, 2}}, default=sorted))
+    assert out == '{"s": [1, 2]}'
+
+
+def test_errors_carry_the_path():
+    chunks = iter_render({"ok": 1, "rows": {"_repeat": 3, "v": "$_index == 2 ? $f() : 1"}}, {}, {})
+    with pytest.raises(TemplateRenderError) as info:
+        "".join(chunks)
+    assert info.value.path == "/rows/2/v"
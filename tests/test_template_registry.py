@@ -0,0 +1,100 @@
+import os
+
+import pytest
+import yaml
+
+from rjson import TemplateRegistry, load_and_render_file, load_and_render_yaml
+from rjson.template_files import disk_cache
+
+
+def _write(path, text, mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_samples_match_baseline(sample, functions, registry, tmp_path):
+    # `registry` here is the global function registry the loaders render with
+    registry.update(functions)
+    template, context, expected = sample
+    path = _write(tmp_path / "t.yaml", yaml.safe_dump(template, sort_keys=False))
+    templates = TemplateRegistry()
+    assert load_and_render_yaml(path, context, registry=templates) == expected
+    assert load_and_render_file(path, context, registry=templates) == expected
+    assert load_and_render_yaml(path, context) == expected
+    assert templates.stats()["hits"] == 1 and templates.reloads == 0
+
+
+def test_reload_on_mtime_change(tmp_path):
+    path = _write(tmp_path / "t.yaml", "v: $n + 1\n", mtime_ns=1_000_000_000)
+    templates = TemplateRegistry()
+    first = templates.get(path)
+    assert templates.get(path) is first
+    # same size and mtime: the change is not seen
+    _write(path, "v: $n + 2\n", mtime_ns=1_000_000_000)
+    assert templates.render(path, {"n": 1}) == {"v": 2}
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert templates.render(path, {"n": 1}) == {"v": 3}
+    assert templates.reloads == 1
+
+
+def test_reload_on_size_change(tmp_path):
+    path = _write(tmp_path / "t.json", '{"v": "$n"}', mtime_ns=1_000_000_000)
+    templates = TemplateRegistry()
+    assert templates.render(path, {"n": 1}) == {"v": 1}
+    _write(path, '{"v": "$n * 10"}', mtime_ns=1_000_000_000)
+    assert templates.render(path, {"n": 1}) == {"v": 10}
+    assert templates.reloads == 1
+
+
+def test_check_interval_skips_stat(tmp_path):
+    now = [0.0]
+    path = _write(tmp_path / "t.yaml", "v: 1\n", mtime_ns=1_000_000_000)
+    templates = TemplateRegistry(check_interval=5, timer=lambda: now[0])
+    assert templates.render(path) == {"v": 1}
+    _write(path, "v: 2\n", mtime_ns=2_000_000_000)
+    now[0] = 4.0
+    assert templates.render(path) == {"v": 1}
+    now[0] = 5.0
+    assert templates.render(path) == {"v": 2}
+    os.unlink(path)
+    now[0] = 9.0
+    assert templates.render(path) == {"v": 2}
+    now[0] = 10.0
+    with pytest.raises(FileNotFoundError):
+        templates.get(path)
+
+
+def test_lru_eviction_and_invalidate(tmp_path):
+    paths = [_write(tmp_path / f"t{i}.yaml", f"v: {i}\n") for i in range(3)]
+    templates = TemplateRegistry(maxsize=2)
+    for path in paths:
+        templates.get(path)
+    assert len(templates) == 2 and paths[0] not in templates and paths[2] in templates
+    assert templates.stats()["evictions"] == 1
+    templates.invalidate(str(paths[2]))
+    assert paths[2] not in templates
+    templates.invalidate()
+    assert len(templates) == 0
+    templates.resize(1)
+    templates.get(paths[0])
+    templates.get(paths[1])
+    assert len(templates) == 1
+
+
+def test_relative_and_absolute_paths_share_an_entry(tmp_path, monkeypatch):
+    path = _write(tmp_path / "t.yaml", "v: 1\n")
+    monkeypatch.chdir(tmp_path)
+    templates = TemplateRegistry()
+    assert templates.get("t.yaml") is templates.get(path)
+    assert len(templates) == 1
+
+
+def test_reloads_go_through_the_disk_cache(tmp_path):
+    path = _write(tmp_path / "t.yaml", "v: $n\n", mtime_ns=1_000_000_000)
+    cache_dir = tmp_path / "cache"
+    TemplateRegistry(cache_dir=cache_dir).get(path)
+    templates = TemplateRegistry(cache_dir=cache_dir)
+    assert templates.render(path, {"n": 7}) == {"v": 7}
+    assert disk_cache(cache_dir).stats()["hits"] == 1
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from rjson import TemplateRenderError, TemplateRuntime
+
+
+def test_samples_match_baseline(sample, functions):
+    template, context, expected = sample
+    assert TemplateRuntime(context, functions, threads=4).render(template) == expected
+
+
+def test_independent_calls_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def meet(x):
+        # each call waits for the other two: this only returns if all three run at once
+        barrier.wait()
+        return x
+
+    template = {"a": "$meet(1)", "nested": {"b": "$meet(2)"}, "c": "$meet(3)"}
+    assert TemplateRuntime({}, {"meet": meet}, threads=3).render(template) == {"a": 1, "nested": {"b": 2}, "c": 3}
+
+
+def test_dependent_entries_wait():
+    events = []
+    lock = threading.Lock()
+
+    def step(name, delay=0):
+        time.sleep(delay)
+        with lock:
+            events.append(name)
+        return name
+
+    template = {"a": "$step('a', 0.05)", "b": "$step($a + 'b')", "c": "$step('c')"}
+    out = TemplateRuntime({}, {"step": step}, threads=4).render(template)
+    assert out == {"a": "a", "b": "ab", "c": "c"}
+    assert events.index("a") < events.index("ab")
+    assert events.index("c") < events.index("a")
+
+
+def test_peak_concurrency_is_bounded():
+    active = [0, 0]
+    lock = threading.Lock()
+
+    def work(x):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return x
+
+    template = {f"k{i}": f"$work({i})" for i in range(8)}
+    out = TemplateRuntime({}, {"work": work}, threads=3).render(template)
+    assert list(out) == [f"k{i}" for i in range(8)] and out["k7"] == 7
+    assert 1 < active[1] <= 3
+
+
+def test_set_order_is_sequential():
+    def slow(x, delay):
+        time.sleep(delay)
+        return x
+
+    template = {
+        "_set.total": "$slow(1, 0.05)",
+        "first": "$_set.total",
+        "_set.total2": "$slow($_set.total + 1, 0)",
+        "second": "$_set.total2",
+        "rows": {"_repeat": 3, "_set.total": "$slow($_set.total + $_index, 0.01)", "v": "$_set.total"},
+        "final": "$_set.total",
+    }
+    expected = TemplateRuntime({}, {"slow": slow}).render(template)
+    assert TemplateRuntime({}, {"slow": slow}, threads=4).render(template) == expected
+
+
+def test_first_error_in_template_order():
+    def fail(delay):
+        time.sleep(delay)
+        raise ValueError(delay)
+
+    template = {"a": "$fail(0.05)", "b": "$fail(0)"}
+    with pytest.raises(TemplateRenderError) as sequential:
+        TemplateRuntime({}, {"fail": fail}).render(template)
+    with pytest.raises(TemplateRenderError) as threaded:
+        TemplateRuntime({}, {"fail": fail}, threads=2).render(template)
+    assert threaded.value.path == sequential.value.path == "/a"